@@ -0,0 +1,148 @@
+"""
+Python source graph extraction for GraphBuilder
+
+Holds the per-AST-node loop of the graph builder as plain, fully typed
+synchronous functions. The module can be compiled ahead of time with mypyc
+(``mypyc src/cgm_mcp/components/_graph_build_fast.py``); the resulting
+extension module takes precedence over this file on import, so no fallback
+import is needed.
+"""
+
+import ast
+from typing import List
+
+from ..utils.graph_arrays import GraphArrays
+
+
+def add_python_nodes(
+    tree: ast.AST, file_path: str, file_node: str, graph: GraphArrays
+) -> None:
+    """Add classes, functions, methods and imports of a parsed module to the graph"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            add_class_node(node, file_path, file_node, graph)
+        elif isinstance(node, ast.FunctionDef):
+            add_function_node(node, file_path, file_node, graph)
+        elif isinstance(node, ast.Import):
+            add_import_edges(node, file_node, graph)
+        elif isinstance(node, ast.ImportFrom):
+            add_import_from_edges(node, file_node, graph)
+
+
+def add_class_node(
+    node: ast.ClassDef, file_path: str, file_node: str, graph: GraphArrays
+) -> None:
+    """Add class node to graph"""
+    class_node: str = f"class:{file_path}:{node.name}"
+
+    # Get docstring
+    docstring: str = ast.get_docstring(node) or ""
+
+    # Get base classes
+    bases: List[str] = [get_name(base) for base in node.bases]
+
+    graph.add_node(
+        class_node,
+        type="class",
+        name=node.name,
+        file_path=file_path,
+        docstring=docstring,
+        bases=bases,
+        line_start=node.lineno,
+        line_end=getattr(node, "end_lineno", node.lineno),
+    )
+
+    # Connect to file
+    graph.add_edge(file_node, class_node, type="contains")
+
+    # Add methods
+    for item in node.body:
+        if isinstance(item, ast.FunctionDef):
+            add_method_node(item, file_path, class_node, graph)
+
+
+def add_function_node(
+    node: ast.FunctionDef, file_path: str, parent_node: str, graph: GraphArrays
+) -> None:
+    """Add function node to graph"""
+    func_node: str = f"function:{file_path}:{node.name}"
+
+    # Get docstring
+    docstring: str = ast.get_docstring(node) or ""
+
+    # Get arguments
+    args: List[str] = [arg.arg for arg in node.args.args]
+
+    graph.add_node(
+        func_node,
+        type="function",
+        name=node.name,
+        file_path=file_path,
+        docstring=docstring,
+        args=args,
+        line_start=node.lineno,
+        line_end=getattr(node, "end_lineno", node.lineno),
+    )
+
+    # Connect to parent (file or class)
+    graph.add_edge(parent_node, func_node, type="contains")
+
+
+def add_method_node(
+    node: ast.FunctionDef, file_path: str, class_node: str, graph: GraphArrays
+) -> None:
+    """Add method node to graph"""
+    method_node: str = f"method:{file_path}:{node.name}"
+
+    # Get docstring
+    docstring: str = ast.get_docstring(node) or ""
+
+    # Get arguments
+    args: List[str] = [arg.arg for arg in node.args.args]
+
+    graph.add_node(
+        method_node,
+        type="method",
+        name=node.name,
+        file_path=file_path,
+        docstring=docstring,
+        args=args,
+        line_start=node.lineno,
+        line_end=getattr(node, "end_lineno", node.lineno),
+    )
+
+    # Connect to class
+    graph.add_edge(class_node, method_node, type="contains")
+
+
+def add_import_edges(node: ast.Import, file_node: str, graph: GraphArrays) -> None:
+    """Add import relationships"""
+    for alias in node.names:
+        import_node: str = f"import:{alias.name}"
+        if not graph.has_node(import_node):
+            graph.add_node(import_node, type="import", name=alias.name)
+        graph.add_edge(file_node, import_node, type="imports")
+
+
+def add_import_from_edges(
+    node: ast.ImportFrom, file_node: str, graph: GraphArrays
+) -> None:
+    """Add import from relationships"""
+    if node.module:
+        for alias in node.names:
+            import_node: str = f"import:{node.module}.{alias.name}"
+            if not graph.has_node(import_node):
+                graph.add_node(
+                    import_node, type="import", name=f"{node.module}.{alias.name}"
+                )
+            graph.add_edge(file_node, import_node, type="imports")
+
+
+def get_name(node: ast.AST) -> str:
+    """Get name from AST node"""
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute):
+        return f"{get_name(node.value)}.{node.attr}"
+    else:
+        return str(node)
@@ -6,12 +6,31 @@ Builds repository-level code graphs from source code
 
 import ast
 import os
-from pathlib import Path
 from typing import Any, Dict, List, Optional, Set
 
-import networkx as nx
 from loguru import logger
 
+from ..utils.graph_arrays import GraphArrays
+from ._graph_build_fast import add_python_nodes
+
+
+def read_file_preview(repo_path: str, file_path: str, size: int = 1000) -> str:
+    """
+    The first ``size`` characters of a repository file, as file nodes
+    used to store them in their ``content`` attribute
+    """
+    try:
+        # A UTF-8 character takes at most 4 bytes
+        with open(os.path.join(repo_path, file_path), "rb") as f:
+            text = f.read(size * 4).decode("utf-8", errors="ignore")
+    except OSError as e:
+        logger.warning(f"Failed to read preview for {file_path}: {e}")
+        return ""
+    # Universal newlines, as text mode reads them
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text[:size]
+
 
 class GraphBuilder:
     """
@@ -21,6 +40,8 @@ class GraphBuilder:
 
     def __init__(self):
         self.supported_extensions = {".py", ".js", ".ts", ".java", ".cpp", ".c", ".h"}
+        # str.endswith accepts a tuple and checks every suffix in C
+        self._supported_suffixes = tuple(self.supported_extensions)
 
     async def build_graph(
         self, repository_name: str, repository_context: Optional[Dict[str, Any]] = None
@@ -30,7 +51,7 @@ class GraphBuilder:
             logger.info(f"Building code graph for repository: {repository_name}")
 
             # Initialize graph
-            graph = nx.DiGraph()
+            graph = GraphArrays()
 
             # Get repository path from context or use default
             repo_path = self._get_repository_path(repository_name, repository_context)
@@ -43,7 +64,7 @@ class GraphBuilder:
             await self._analyze_repository(repo_path, graph)
 
             # Convert to serializable format
-            return self._graph_to_dict(graph)
+            return self._graph_to_dict(graph, repo_path)
 
         except Exception as e:
             logger.error(f"Error building code graph: {e}")
@@ -71,8 +92,14 @@ class GraphBuilder:
 
         return None
 
-    async def _analyze_repository(self, repo_path: str, graph: nx.DiGraph):
+    async def _analyze_repository(self, repo_path: str, graph: GraphArrays):
         """Analyze all source files in the repository"""
+        # Every walked root starts with repo_path, so relative paths can be
+        # sliced off instead of going through os.path.join/relpath per file.
+        # Joining "" adds a separator only where one is missing, e.g. not to "/"
+        repo_path = os.path.normpath(repo_path)
+        repo_prefix_len = len(os.path.join(repo_path, ""))
+
         for root, dirs, files in os.walk(repo_path):
             # Skip common non-source directories
             dirs[:] = [
@@ -82,41 +109,63 @@ class GraphBuilder:
                 and d not in {"node_modules", "__pycache__", "build", "dist"}
             ]
 
+            root_prefix = os.path.join(root, "")
             for file in files:
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, repo_path)
+                # Check the bare file name before building any paths
+                if not self._should_analyze_file(file):
+                    continue
 
-                if self._should_analyze_file(file_path):
-                    await self._analyze_file(file_path, relative_path, graph)
+                file_path = root_prefix + file
+                relative_path = file_path[repo_prefix_len:]
+                await self._analyze_file(file_path, relative_path, graph)
 
     def _should_analyze_file(self, file_path: str) -> bool:
         """Check if file should be analyzed"""
-        ext = Path(file_path).suffix.lower()
-        return ext in self.supported_extensions
+        return file_path.lower().endswith(self._supported_suffixes)
 
     async def _analyze_file(
-        self, file_path: str, relative_path: str, graph: nx.DiGraph
+        self, file_path: str, relative_path: str, graph: GraphArrays
     ):
         """Analyze a single source file"""
         try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read()
-
             if file_path.endswith(".py"):
+                # ast.parse accepts bytes directly and lets the C tokenizer
+                # handle decoding, so skip the text-mode decode
+                with open(file_path, "rb") as f:
+                    content = f.read()
                 await self._analyze_python_file(content, relative_path, graph)
             else:
-                # For other languages, do basic analysis
-                await self._analyze_generic_file(content, relative_path, graph)
+                # Generic files only get a file node, no need to read them
+                await self._analyze_generic_file(relative_path, graph)
 
         except Exception as e:
             logger.warning(f"Failed to analyze file {file_path}: {e}")
 
     async def _analyze_python_file(
-        self, content: str, file_path: str, graph: nx.DiGraph
+        self, content: bytes, file_path: str, graph: GraphArrays
     ):
         """Analyze Python file using AST"""
         try:
-            tree = ast.parse(content)
+            # Call the C parser directly; type comments are not requested and
+            # lineno/end_lineno are still populated on every node
+            try:
+                tree = compile(
+                    content,
+                    file_path,
+                    "exec",
+                    flags=ast.PyCF_ONLY_AST,
+                    dont_inherit=True,
+                )
+            except (SyntaxError, UnicodeDecodeError):
+                # The bytes parse decodes strictly; retry on the text with
+                # undecodable bytes dropped, as the file used to be read
+                tree = compile(
+                    content.decode("utf-8", errors="ignore"),
+                    file_path,
+                    "exec",
+                    flags=ast.PyCF_ONLY_AST,
+                    dont_inherit=True,
+                )
 
             # Add file node
             file_node = f"file:{file_path}"
@@ -125,143 +174,17 @@ class GraphBuilder:
                 type="file",
                 name=os.path.basename(file_path),
                 file_path=file_path,
-                content=content[:1000],
-            )  # First 1000 chars
+            )
 
             # Analyze AST nodes
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    await self._add_class_node(node, file_path, file_node, graph)
-                elif isinstance(node, ast.FunctionDef):
-                    await self._add_function_node(node, file_path, file_node, graph)
-                elif isinstance(node, ast.Import):
-                    await self._add_import_edges(node, file_node, graph)
-                elif isinstance(node, ast.ImportFrom):
-                    await self._add_import_from_edges(node, file_node, graph)
+            add_python_nodes(tree, file_path, file_node, graph)
 
         except SyntaxError as e:
             logger.warning(f"Syntax error in {file_path}: {e}")
         except Exception as e:
             logger.warning(f"Error analyzing Python file {file_path}: {e}")
 
-    async def _add_class_node(
-        self, node: ast.ClassDef, file_path: str, file_node: str, graph: nx.DiGraph
-    ):
-        """Add class node to graph"""
-        class_node = f"class:{file_path}:{node.name}"
-
-        # Get docstring
-        docstring = ast.get_docstring(node) or ""
-
-        # Get base classes
-        bases = [self._get_name(base) for base in node.bases]
-
-        graph.add_node(
-            class_node,
-            type="class",
-            name=node.name,
-            file_path=file_path,
-            docstring=docstring,
-            bases=bases,
-            line_start=node.lineno,
-            line_end=getattr(node, "end_lineno", node.lineno),
-        )
-
-        # Connect to file
-        graph.add_edge(file_node, class_node, type="contains")
-
-        # Add methods
-        for item in node.body:
-            if isinstance(item, ast.FunctionDef):
-                await self._add_method_node(item, file_path, class_node, graph)
-
-    async def _add_function_node(
-        self, node: ast.FunctionDef, file_path: str, parent_node: str, graph: nx.DiGraph
-    ):
-        """Add function node to graph"""
-        func_node = f"function:{file_path}:{node.name}"
-
-        # Get docstring
-        docstring = ast.get_docstring(node) or ""
-
-        # Get arguments
-        args = [arg.arg for arg in node.args.args]
-
-        graph.add_node(
-            func_node,
-            type="function",
-            name=node.name,
-            file_path=file_path,
-            docstring=docstring,
-            args=args,
-            line_start=node.lineno,
-            line_end=getattr(node, "end_lineno", node.lineno),
-        )
-
-        # Connect to parent (file or class)
-        graph.add_edge(parent_node, func_node, type="contains")
-
-    async def _add_method_node(
-        self, node: ast.FunctionDef, file_path: str, class_node: str, graph: nx.DiGraph
-    ):
-        """Add method node to graph"""
-        method_node = f"method:{file_path}:{node.name}"
-
-        # Get docstring
-        docstring = ast.get_docstring(node) or ""
-
-        # Get arguments
-        args = [arg.arg for arg in node.args.args]
-
-        graph.add_node(
-            method_node,
-            type="method",
-            name=node.name,
-            file_path=file_path,
-            docstring=docstring,
-            args=args,
-            line_start=node.lineno,
-            line_end=getattr(node, "end_lineno", node.lineno),
-        )
-
-        # Connect to class
-        graph.add_edge(class_node, method_node, type="contains")
-
-    async def _add_import_edges(
-        self, node: ast.Import, file_node: str, graph: nx.DiGraph
-    ):
-        """Add import relationships"""
-        for alias in node.names:
-            import_node = f"import:{alias.name}"
-            if not graph.has_node(import_node):
-                graph.add_node(import_node, type="import", name=alias.name)
-            graph.add_edge(file_node, import_node, type="imports")
-
-    async def _add_import_from_edges(
-        self, node: ast.ImportFrom, file_node: str, graph: nx.DiGraph
-    ):
-        """Add import from relationships"""
-        if node.module:
-            for alias in node.names:
-                import_node = f"import:{node.module}.{alias.name}"
-                if not graph.has_node(import_node):
-                    graph.add_node(
-                        import_node, type="import", name=f"{node.module}.{alias.name}"
-                    )
-                graph.add_edge(file_node, import_node, type="imports")
-
-    def _get_name(self, node: ast.AST) -> str:
-        """Get name from AST node"""
-        if isinstance(node, ast.Name):
-            return node.id
-        elif isinstance(node, ast.Attribute):
-            return f"{self._get_name(node.value)}.{node.attr}"
-        else:
-            return str(node)
-
-    async def _analyze_generic_file(
-        self, content: str, file_path: str, graph: nx.DiGraph
-    ):
+    async def _analyze_generic_file(self, file_path: str, graph: GraphArrays):
         """Basic analysis for non-Python files"""
         file_node = f"file:{file_path}"
         graph.add_node(
@@ -269,28 +192,23 @@ class GraphBuilder:
             type="file",
             name=os.path.basename(file_path),
             file_path=file_path,
-            content=content[:1000],
-        )  # First 1000 chars
-
-    def _graph_to_dict(self, graph: nx.DiGraph) -> Dict[str, Any]:
-        """Convert NetworkX graph to dictionary format"""
-        nodes_data = []
-        for node in graph.nodes():
-            node_data = dict(graph.nodes[node])
-            node_data["id"] = node
-            nodes_data.append(node_data)
-
-        edges_data = []
-        for edge in graph.edges():
-            edge_data = dict(graph.edges[edge])
-            edge_data["source"] = edge[0]
-            edge_data["target"] = edge[1]
-            edges_data.append(edge_data)
+        )
+
+    def get_file_preview(self, repo_path: str, file_path: str, size: int = 1000) -> str:
+        """Read the beginning of a file on demand instead of storing it in the graph"""
+        return read_file_preview(repo_path, file_path, size)
+
+    def _graph_to_dict(self, graph: GraphArrays, repo_path: str) -> Dict[str, Any]:
+        """Convert graph arrays to dictionary format"""
+        graph_data = graph.to_dict()
+        nodes_data = graph_data["nodes"]
+        edges_data = graph_data["edges"]
 
         return {
             "nodes": nodes_data,
             "edges": edges_data,
             "metadata": {
+                "repository_path": repo_path,
                 "total_nodes": len(nodes_data),
                 "total_edges": len(edges_data),
                 "node_types": list(
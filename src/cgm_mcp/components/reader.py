@@ -4,58 +4,35 @@ Reader Component for CGM
 Generates code patches based on subgraph and ranked files
 """
 
+import asyncio
 import re
-from typing import Any, Dict, List, Optional
+from string import Template
+from typing import Any, Dict, List, Optional, Tuple
 
 from loguru import logger
 
 from ..models import CodePatch, ReaderRequest, ReaderResponse
 from ..utils.llm_client import LLMClient
 
-
-class ReaderComponent:
-    """
-    Reader component that generates code patches to resolve issues
-    based on the retrieved subgraph and top-ranked files
-    """
-
-    def __init__(self, llm_client: LLMClient):
-        self.llm_client = llm_client
-
-    def generate_patch_prompt(
-        self,
-        problem_statement: str,
-        subgraph: Dict[str, Any],
-        top_files: List[str],
-        repository_context: Dict[str, Any],
-    ) -> str:
-        """Generate prompt for code patch generation"""
-
-        # Extract relevant information from subgraph
-        subgraph_summary = self._summarize_subgraph(subgraph)
-
-        # Format top files information
-        files_info = "\n".join([f"- {file}" for file in top_files])
-
-        prompt = f"""
+_PATCH_PROMPT_TEMPLATE = Template("""
 You are an expert software engineer tasked with generating code patches to resolve repository issues.
 
 <issue>
-{problem_statement}
+$problem_statement
 </issue>
 
 <repository_context>
-Repository: {repository_context.get('name', 'Unknown')}
-Language: {repository_context.get('language', 'Python')}
-Framework: {repository_context.get('framework', 'N/A')}
+Repository: $repository_name
+Language: $language
+Framework: $framework
 </repository_context>
 
 <code_graph_context>
-{subgraph_summary}
+$subgraph_summary
 </code_graph_context>
 
 <top_relevant_files>
-{files_info}
+$files_info
 </top_relevant_files>
 
 Task:
@@ -111,9 +88,41 @@ Notes:
 - Ensure code follows the project's existing style and conventions
 - Consider error handling and edge cases
 - Provide complete, working code blocks
-"""
+""")
+
+
+class ReaderComponent:
+    """
+    Reader component that generates code patches to resolve issues
+    based on the retrieved subgraph and top-ranked files
+    """
+
+    def __init__(self, llm_client: LLMClient):
+        self.llm_client = llm_client
 
-        return prompt
+    def generate_patch_prompt(
+        self,
+        problem_statement: str,
+        subgraph: Dict[str, Any],
+        top_files: List[str],
+        repository_context: Dict[str, Any],
+    ) -> str:
+        """Generate prompt for code patch generation"""
+
+        # Extract relevant information from subgraph
+        subgraph_summary = self._summarize_subgraph(subgraph)
+
+        # Format top files information
+        files_info = "\n".join(f"- {file}" for file in top_files)
+
+        return _PATCH_PROMPT_TEMPLATE.substitute(
+            problem_statement=problem_statement,
+            repository_name=repository_context.get("name", "Unknown"),
+            language=repository_context.get("language", "Python"),
+            framework=repository_context.get("framework", "N/A"),
+            subgraph_summary=subgraph_summary,
+            files_info=files_info,
+        )
 
     def _summarize_subgraph(self, subgraph: Dict[str, Any]) -> str:
         """Create a summary of the code subgraph"""
@@ -265,8 +274,22 @@ Notes:
 
         return None
 
-    def calculate_confidence(self, patches: List[CodePatch], analysis: str) -> float:
-        """Calculate confidence score for the generated patches"""
+    def calculate_confidence(
+        self,
+        patches: List[CodePatch],
+        analysis: str,
+        n_explained: Optional[int] = None,
+        n_unique_files: Optional[int] = None,
+    ) -> float:
+        """
+        Calculate confidence score for the generated patches
+
+        ``n_explained`` and ``n_unique_files`` can be passed in when they were
+        already counted while parsing, which avoids another pass over patches.
+        """
+        if n_explained is None or n_unique_files is None:
+            n_explained, n_unique_files = self._count_patch_aggregates(patches)
+
         confidence = 0.5  # Base confidence
 
         # Increase confidence based on number of patches
@@ -278,38 +301,101 @@ Notes:
             confidence += 0.1
 
         # Increase confidence if patches have explanations
-        explained_patches = sum(1 for p in patches if p.explanation)
-        if explained_patches > 0:
-            confidence += 0.1 * (explained_patches / len(patches))
+        if n_explained > 0:
+            confidence += 0.1 * (n_explained / len(patches))
 
         # Increase confidence if patches modify different files
-        unique_files = len(set(p.file_path for p in patches))
-        if unique_files > 1:
+        if n_unique_files > 1:
             confidence += 0.1
 
         return min(1.0, confidence)
 
-    async def process(self, request: ReaderRequest) -> ReaderResponse:
-        """Process a reader request to generate code patches"""
-        try:
-            logger.info("Processing reader request")
-
-            # Generate patch prompt
-            prompt = self.generate_patch_prompt(
+    def _count_patch_aggregates(self, patches: List[CodePatch]) -> Tuple[int, int]:
+        """Count explained patches and distinct files in a single pass"""
+        n_explained = 0
+        seen_files = set()
+        for patch in patches:
+            if patch.explanation:
+                n_explained += 1
+            seen_files.add(patch.file_path)
+        return n_explained, len(seen_files)
+
+    def _build_prompts(self, request: ReaderRequest) -> List[str]:
+        """Build the LLM prompts needed for a reader request"""
+        return [
+            self.generate_patch_prompt(
                 request.problem_statement,
                 request.subgraph,
                 request.top_files,
                 request.repository_context,
             )
+        ]
+
+    async def _parse_all(
+        self, responses: List[str]
+    ) -> Tuple[str, List[CodePatch], str, int, int]:
+        """
+        Parse LLM responses off the event loop and merge the results
+
+        Returns the merged analysis, patches and summary, plus the number of
+        explained patches and distinct patched files counted while merging.
+        """
+        loop = asyncio.get_event_loop()
+        parsed = await asyncio.gather(
+            *(
+                loop.run_in_executor(None, self.parse_patch_response, response)
+                for response in responses
+            )
+        )
 
-            # Generate patches using LLM
-            response = await self.llm_client.generate(prompt)
+        analyses = []
+        patches = []
+        summaries = []
+        n_explained = 0
+        seen_files = set()
+        for analysis, response_patches, summary in parsed:
+            if analysis:
+                analyses.append(analysis)
+            for patch in response_patches:
+                patches.append(patch)
+                if patch.explanation:
+                    n_explained += 1
+                seen_files.add(patch.file_path)
+            if summary:
+                summaries.append(summary)
+
+        return (
+            "\n\n".join(analyses),
+            patches,
+            "\n\n".join(summaries),
+            n_explained,
+            len(seen_files),
+        )
 
-            # Parse response
-            analysis, patches, summary = self.parse_patch_response(response)
+    async def process(self, request: ReaderRequest) -> ReaderResponse:
+        """Process a reader request to generate code patches"""
+        try:
+            logger.info("Processing reader request")
+
+            # Generate patch prompts
+            prompts = self._build_prompts(request)
+
+            # Generate patches using LLM, running independent prompts concurrently
+            responses = await self.llm_client.batch_generate(prompts)
+
+            # Parse responses
+            (
+                analysis,
+                patches,
+                summary,
+                n_explained,
+                n_unique_files,
+            ) = await self._parse_all(responses)
 
             # Calculate confidence
-            confidence = self.calculate_confidence(patches, analysis)
+            confidence = self.calculate_confidence(
+                patches, analysis, n_explained, n_unique_files
+            )
 
             logger.info(
                 f"Reader generated {len(patches)} patches with confidence {confidence:.2f}"
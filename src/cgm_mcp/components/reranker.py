@@ -4,34 +4,84 @@ Reranker Component for CGM
 Ranks files by relevance to the issue for focused analysis
 """
 
+import ast
+import asyncio
+import hashlib
 import re
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+from cachetools import LRUCache
 from loguru import logger
 
 from ..models import FileScore, RerankerRequest, RerankerResponse
 from ..utils.llm_client import LLMClient
-
-
-class RerankerComponent:
-    """
-    Reranker component that identifies the most relevant files
-    for issue resolution using a two-stage ranking process
-    """
-
-    def __init__(self, llm_client: LLMClient):
-        self.llm_client = llm_client
-
-    def generate_prompt_for_stage_1(
-        self,
-        problem_statement: str,
-        repo_name: str,
-        py_files: List[str],
-        other_files: List[str],
-    ) -> Tuple[str, str]:
-        """Generate prompt for stage 1 reranking (file selection)"""
-
-        system_prompt = """
+from ..utils.llm_response import load_json_object, section_text
+
+# Score value inside the [start_of_score] block, compiled once at import time
+_RE_SCORE_VALUE = re.compile(r"Score\s+(\d+)", re.IGNORECASE)
+
+# JSON schemas for LLM providers that support constrained decoding; the
+# tagged text format is still parsed when a response is not JSON
+_STAGE_1_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "relevant_files",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "analysis": {"type": "string"},
+                "files": {"type": "array", "items": {"type": "string"}, "maxItems": 5},
+            },
+            "required": ["analysis", "files"],
+            "additionalProperties": False,
+        },
+    },
+}
+_STAGE_2_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "file_score",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "analysis": {"type": "string"},
+                "score": {"type": "integer", "minimum": 1, "maximum": 5},
+            },
+            "required": ["analysis", "score"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_STAGE_2_BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "file_scores",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "scores": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "file": {"type": "string"},
+                            "analysis": {"type": "string"},
+                            "score": {"type": "integer", "minimum": 1, "maximum": 5},
+                        },
+                        "required": ["file", "analysis", "score"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["scores"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Static system prompts, built and stripped once at import time
+_STAGE_1_SYSTEM_PROMPT = """
 You are an experienced software developer who specializes in extracting the most relevant files for solving issues from many reference files.
 Task:
 Based on the information received about the issue from a repository, find the most likely few files from among those that may be able to resolve the issue.
@@ -63,31 +113,7 @@ Preferred extraction Examples of Related Files:
 2. core/services/service_manager.py
 3. ...
 """.strip()
-
-        user_prompt = f"""
-<repository>
-{repo_name}
-</repository>
-<issue>
-{problem_statement}
-</issue>
- 
-<reference_python_file_list>
-{chr(10).join(py_files)}
-</reference_python_file_list>
-<other_reference_file_list>
-{chr(10).join(other_files)}
-</other_reference_file_list>
-"""
-
-        return system_prompt, user_prompt
-
-    def generate_prompt_for_stage_2(
-        self, problem_statement: str, repo_name: str, file_name: str, file_content: str
-    ) -> Tuple[str, str]:
-        """Generate prompt for stage 2 reranking (file scoring)"""
-
-        system_prompt = """
+_STAGE_2_SYSTEM_PROMPT = """
 You are an experienced software developer who specializes in assessing the relevance of the file for solving the issue in software repositories.
 Task:
 For a file provided, evaluate the likelihood that modifying this file would resolve the given issue, and assign a score based on specific criteria.
@@ -115,6 +141,151 @@ Notes:
 - The content of the file shows only the structure of this file, including the names of the classes and functions defined in this file.
 - You can refer to to the information in the error logs (if exists).
 """.strip()
+_STAGE_2_BATCH_SYSTEM_PROMPT = """
+You are an experienced software developer who specializes in assessing the relevance of files for solving the issue in software repositories.
+Task:
+For each file provided, evaluate the likelihood that modifying this file would resolve the given issue, and assign a score based on specific criteria.
+Instructions:
+1. Analysis:
+- Analyze the provided issue description and the content of each relevant file, pay attention to any keywords, error messages, or specific functionalities mentioned that relate to the file.
+- Determine how closely the contents and functionality of each file are tied to the problem or error described in the issue.
+- Consider the role of each file in the overall project structure (e.g., configuration files, core logic files versus test files, or utility scripts).
+2. Scoring:
+- Based on your analysis, assign each file a score from 1 to 5 that represents the relevance of modifying that file in order to solve the issue.
+Score Specifications:
+1. **Score 1**: The file is almost certainly unrelated to the issue, with no apparent connection to the functionality or error described in the issue.
+2. **Score 2**: The file may be tangentially related, but modifying it is unlikely to resolve the issue directly; possible in rare edge cases.
+3. **Score 3**: The file has some relevance to the issue; it might interact with the affected functionality indirectly and tweaking it could be part of a broader fix.
+4. **Score 4**: The file is likely related to the issue; it includes code that interacts directly with the functionality in question and could plausibly contain bugs that lead to the issue.
+5. **Score 5**: The file is very likely the root cause or heavily involved in the issue and modifying it should directly address the error or problem mentioned.
+Respond with a single JSON object in the following format:
+{"scores": [{"file": "<file_name>", "analysis": "<detailed_analysis>", "score": <number>}, ...]}
+Notes:
+- Score every provided file exactly once and copy its file name unchanged.
+- The content of each file shows only the structure of this file, including the names of the classes and functions defined in this file.
+- You can refer to to the information in the error logs (if exists).
+""".strip()
+
+
+def _strip_number_prefix(line: str) -> str:
+    """Remove a leading list number such as "1. " from a line"""
+    # Equivalent to matching r"^\d+\.\s*": everything before the first dot
+    # must be decimal digits, and whitespace after the dot is dropped
+    number, dot, rest = line.partition(".")
+    if dot and number.isdecimal():
+        return rest.lstrip()
+    return line
+
+
+def _format_arguments(args: ast.arguments) -> str:
+    """Format a function's parameter names as they appear in its signature"""
+    names = [arg.arg for arg in args.posonlyargs]
+    names.extend(arg.arg for arg in args.args)
+    if args.vararg:
+        names.append(f"*{args.vararg.arg}")
+    elif args.kwonlyargs:
+        names.append("*")
+    names.extend(arg.arg for arg in args.kwonlyargs)
+    if args.kwarg:
+        names.append(f"**{args.kwarg.arg}")
+    return ", ".join(names)
+
+
+def _format_base(node: ast.expr) -> Optional[str]:
+    """Get the dotted name of a base class, if it has one"""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _format_base(node.value)
+        return f"{value}.{node.attr}" if value else None
+    return None
+
+
+class _StructureVisitor(ast.NodeVisitor):
+    """Collect class and function signatures in source order"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        bases = [base for base in map(_format_base, node.bases) if base]
+        if bases:
+            self.lines.append(f"class {node.name}({', '.join(bases)}):")
+        else:
+            self.lines.append(f"class {node.name}:")
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self.lines.append(f"def {node.name}({_format_arguments(node.args)}):")
+        self.generic_visit(node)
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef):
+        self.lines.append(f"async def {node.name}({_format_arguments(node.args)}):")
+        self.generic_visit(node)
+
+
+class RerankerComponent:
+    """
+    Reranker component that identifies the most relevant files
+    for issue resolution using a two-stage ranking process
+    """
+
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        max_workers: Optional[int] = None,
+        structured_output: bool = False,
+        score_cache_size: int = 2048,
+        batch_stage_2: bool = False,
+    ):
+        self.llm_client = llm_client
+        # Optional cap on concurrent stage 2 LLM calls
+        self.max_workers = max_workers
+        # Ask the LLM for schema-constrained JSON instead of tagged text
+        self.structured_output = structured_output
+        # Stage 2 (analysis, score) results, keyed by repository, file,
+        # file structure and issue, so unchanged files are not re-scored
+        self.score_cache = LRUCache(maxsize=score_cache_size)
+        # Score all stage 1 files in one LLM call, per-file calls as fallback
+        self.batch_stage_2 = batch_stage_2
+
+    def _generate_kwargs(self, response_format: Dict[str, Any]) -> Dict[str, Any]:
+        """Extra LLM call arguments for a stage"""
+        if self.structured_output:
+            return {"response_format": response_format}
+        return {}
+
+    def generate_prompt_for_stage_1(
+        self,
+        problem_statement: str,
+        repo_name: str,
+        py_files: List[str],
+        other_files: List[str],
+    ) -> Tuple[str, str]:
+        """Generate prompt for stage 1 reranking (file selection)"""
+
+        user_prompt = f"""
+<repository>
+{repo_name}
+</repository>
+<issue>
+{problem_statement}
+</issue>
+ 
+<reference_python_file_list>
+{chr(10).join(py_files)}
+</reference_python_file_list>
+<other_reference_file_list>
+{chr(10).join(other_files)}
+</other_reference_file_list>
+"""
+
+        return _STAGE_1_SYSTEM_PROMPT, user_prompt
+
+    def generate_prompt_for_stage_2(
+        self, problem_statement: str, repo_name: str, file_name: str, file_content: str
+    ) -> Tuple[str, str]:
+        """Generate prompt for stage 2 reranking (file scoring)"""
 
         user_prompt = f"""
 <repository>
@@ -131,24 +302,26 @@ Notes:
 </file_content>
 """
 
-        return system_prompt, user_prompt
+        return _STAGE_2_SYSTEM_PROMPT, user_prompt
 
     def parse_stage_1_response(self, response: str) -> Tuple[str, List[str]]:
         """Parse the response from stage 1 reranking"""
         try:
+            # Structured responses decode directly
+            data = load_json_object(response)
+            if data is not None:
+                files = [str(f).strip() for f in data.get("files", [])]
+                return str(data.get("analysis", "")).strip(), [f for f in files if f]
+
             # Extract analysis
-            analysis_match = re.search(
-                r"\[start_of_analysis\](.*?)\[end_of_analysis\]", response, re.DOTALL
-            )
-            analysis = analysis_match.group(1).strip() if analysis_match else ""
+            analysis = section_text(
+                response, "[start_of_analysis]", "[end_of_analysis]"
+            ).strip()
 
             # Extract files
-            files_match = re.search(
-                r"\[start_of_relevant_files\](.*?)\[end_of_relevant_files\]",
-                response,
-                re.DOTALL,
-            )
-            files_text = files_match.group(1).strip() if files_match else ""
+            files_text = section_text(
+                response, "[start_of_relevant_files]", "[end_of_relevant_files]"
+            ).strip()
 
             # Parse numbered list
             files = []
@@ -156,7 +329,7 @@ Notes:
                 line = line.strip()
                 if line:
                     # Remove numbering (e.g., "1. ", "2. ")
-                    file_path = re.sub(r"^\d+\.\s*", "", line)
+                    file_path = _strip_number_prefix(line)
                     if file_path:
                         files.append(file_path)
 
@@ -168,44 +341,203 @@ Notes:
 
     def parse_stage_2_response(self, response: str) -> Tuple[str, int]:
         """Parse the response from stage 2 reranking"""
+        analysis, score = self._parse_stage_2_score(response)
+        return analysis, 3 if score is None else score  # Default to middle score
+
+    def _parse_stage_2_score(self, response: str) -> Tuple[str, Optional[int]]:
+        """Analysis and score of a stage 2 response, score None if missing"""
         try:
+            # Structured responses decode directly
+            data = load_json_object(response)
+            if data is not None and "score" in data:
+                analysis = str(data.get("analysis", "")).strip()
+                return analysis, max(1, min(5, int(data["score"])))
+
             # Extract analysis
-            analysis_match = re.search(
-                r"\[start_of_analysis\](.*?)\[end_of_analysis\]", response, re.DOTALL
-            )
-            analysis = analysis_match.group(1).strip() if analysis_match else ""
+            analysis = section_text(
+                response, "[start_of_analysis]", "[end_of_analysis]"
+            ).strip()
 
             # Extract score
-            score_match = re.search(
-                r"\[start_of_score\].*?Score\s+(\d+).*?\[end_of_score\]",
-                response,
-                re.DOTALL | re.IGNORECASE,
+            score_match = _RE_SCORE_VALUE.search(
+                section_text(response, "[start_of_score]", "[end_of_score]")
             )
-            score = (
-                int(score_match.group(1)) if score_match else 3
-            )  # Default to middle score
+            if not score_match:
+                return analysis, None
 
             # Ensure score is in valid range
-            score = max(1, min(5, score))
-
-            return analysis, score
+            return analysis, max(1, min(5, int(score_match.group(1))))
 
         except Exception as e:
             logger.error(f"Error parsing stage 2 response: {e}")
-            return "", 3
+            return "", None
 
     def get_file_structure(self, file_content: str) -> str:
         """Extract file structure (classes and functions) from file content"""
-        # This is a simplified version - in practice, you'd use AST parsing
-        structure_lines = []
-
-        for line in file_content.split("\n"):
-            line = line.strip()
-            if line.startswith("class ") or line.startswith("def "):
-                structure_lines.append(line)
+        try:
+            tree = ast.parse(file_content)
+        except (SyntaxError, ValueError):
+            # Not Python (or not valid Python), fall back to a line scan
+            structure_lines = []
+            for line in file_content.split("\n"):
+                line = line.strip()
+                if line.startswith("class ") or line.startswith("def "):
+                    structure_lines.append(line)
+        else:
+            visitor = _StructureVisitor()
+            visitor.visit(tree)
+            structure_lines = visitor.lines
 
         return "\n".join(structure_lines) if structure_lines else file_content[:500]
 
+    def generate_prompt_for_stage_2_batch(
+        self, problem_statement: str, repo_name: str, files: List[Tuple[str, str]]
+    ) -> Tuple[str, str]:
+        """Generate prompt for batched stage 2 reranking of (name, content) pairs"""
+        files_info = "\n".join(
+            f"<file>\n<file_name>\n{file_name}\n</file_name>\n"
+            f"<file_content>\n{file_content}\n</file_content>\n</file>"
+            for file_name, file_content in files
+        )
+
+        user_prompt = f"""
+<repository>
+{repo_name}
+</repository>
+<issue>
+{problem_statement}
+</issue>
+<files>
+{files_info}
+</files>
+"""
+
+        return _STAGE_2_BATCH_SYSTEM_PROMPT, user_prompt
+
+    def parse_stage_2_batch_response(
+        self, response: str, file_paths: List[str]
+    ) -> Dict[str, Tuple[str, int]]:
+        """Parse a batched stage 2 response into (analysis, score) per file"""
+        data = load_json_object(response)
+        if data is None or not isinstance(data.get("scores"), list):
+            return {}
+
+        expected = set(file_paths)
+        scores = {}
+        for entry in data["scores"]:
+            try:
+                file_path = str(entry["file"]).strip()
+                if file_path in expected:
+                    score = max(1, min(5, int(entry["score"])))
+                    scores[file_path] = (str(entry.get("analysis", "")).strip(), score)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Skipping malformed stage 2 batch entry: {e}")
+
+        return scores
+
+    def _score_cache_key(
+        self, request: RerankerRequest, file_path: str, file_structure: str
+    ) -> Tuple[str, str, str, str]:
+        """Key stage 2 results by repository, file, structure and issue"""
+        return (
+            request.repo_name,
+            file_path,
+            hashlib.sha256(file_structure.encode()).hexdigest(),
+            hashlib.sha256(request.problem_statement.encode()).hexdigest(),
+        )
+
+    async def _score_files_batch(
+        self, request: RerankerRequest, file_paths: List[str]
+    ) -> Dict[str, FileScore]:
+        """Score files with one stage 2 LLM call; files it misses are left out"""
+        file_scores = {}
+        pending = []
+        for file_path in file_paths:
+            file_structure = self.get_file_structure(
+                request.file_contents.get(file_path, "")
+            )
+            cache_key = self._score_cache_key(request, file_path, file_structure)
+            cached = self.score_cache.get(cache_key)
+            if cached is not None:
+                file_analysis, score = cached
+                file_scores[file_path] = FileScore(
+                    file_path=file_path, score=score, analysis=file_analysis
+                )
+            else:
+                pending.append((file_path, file_structure, cache_key))
+
+        if not pending:
+            return file_scores
+
+        system_prompt, user_prompt = self.generate_prompt_for_stage_2_batch(
+            request.problem_statement,
+            request.repo_name,
+            [(file_path, file_structure) for file_path, file_structure, _ in pending],
+        )
+
+        try:
+            response = await self.llm_client.generate(
+                f"{system_prompt}\n\n{user_prompt}",
+                **self._generate_kwargs(_STAGE_2_BATCH_RESPONSE_FORMAT),
+            )
+        except Exception as e:
+            logger.warning(f"Batched stage 2 scoring failed: {e}")
+            return file_scores
+
+        parsed = self.parse_stage_2_batch_response(
+            response, [file_path for file_path, _, _ in pending]
+        )
+        for file_path, _, cache_key in pending:
+            if file_path in parsed:
+                file_analysis, score = parsed[file_path]
+                self.score_cache[cache_key] = (file_analysis, score)
+                file_scores[file_path] = FileScore(
+                    file_path=file_path, score=score, analysis=file_analysis
+                )
+
+        return file_scores
+
+    async def _score_file(
+        self,
+        request: RerankerRequest,
+        file_path: str,
+        semaphore: asyncio.Semaphore,
+    ) -> FileScore:
+        """Score a single file with a stage 2 LLM call"""
+        file_content = request.file_contents.get(file_path, "")
+
+        # Get file structure for scoring
+        file_structure = self.get_file_structure(file_content)
+
+        cache_key = self._score_cache_key(request, file_path, file_structure)
+        cached = self.score_cache.get(cache_key)
+        if cached is not None:
+            file_analysis, score = cached
+            return FileScore(file_path=file_path, score=score, analysis=file_analysis)
+
+        system_prompt, user_prompt = self.generate_prompt_for_stage_2(
+            request.problem_statement,
+            request.repo_name,
+            file_path,
+            file_structure,
+        )
+
+        async with semaphore:
+            stage_2_response = await self.llm_client.generate(
+                f"{system_prompt}\n\n{user_prompt}",
+                **self._generate_kwargs(_STAGE_2_RESPONSE_FORMAT),
+            )
+
+        file_analysis, score = self._parse_stage_2_score(stage_2_response)
+        if score is None:
+            # Unparsed replies get the middle score but are not cached, so
+            # the file is scored again on the next request
+            score = 3
+        else:
+            self.score_cache[cache_key] = (file_analysis, score)
+
+        return FileScore(file_path=file_path, score=score, analysis=file_analysis)
+
     async def process(self, request: RerankerRequest) -> RerankerResponse:
         """Process a reranker request"""
         try:
@@ -225,7 +557,8 @@ Notes:
             )
 
             stage_1_response = await self.llm_client.generate(
-                f"{system_prompt}\n\n{user_prompt}"
+                f"{system_prompt}\n\n{user_prompt}",
+                **self._generate_kwargs(_STAGE_1_RESPONSE_FORMAT),
             )
 
             analysis, top_files = self.parse_stage_1_response(stage_1_response)
@@ -235,31 +568,32 @@ Notes:
 
             logger.info(f"Stage 1 selected {len(valid_top_files)} files")
 
-            # Stage 2: Score each selected file
-            file_scores = []
-
-            for file_path in valid_top_files:
-                file_content = request.file_contents.get(file_path, "")
-
-                # Get file structure for scoring
-                file_structure = self.get_file_structure(file_content)
-
-                system_prompt, user_prompt = self.generate_prompt_for_stage_2(
-                    request.problem_statement,
-                    request.repo_name,
-                    file_path,
-                    file_structure,
-                )
+            # Stage 2: Score the selected files, in a single call if batching
+            batch_scores = {}
+            if self.batch_stage_2 and len(valid_top_files) > 1:
+                batch_scores = await self._score_files_batch(request, valid_top_files)
 
-                stage_2_response = await self.llm_client.generate(
-                    f"{system_prompt}\n\n{user_prompt}"
-                )
+            # Score the rest concurrently, one call per file
+            remaining_files = [f for f in valid_top_files if f not in batch_scores]
+            semaphore = asyncio.Semaphore(
+                self.max_workers or max(1, len(remaining_files))
+            )
+            results = await asyncio.gather(
+                *(
+                    self._score_file(request, file_path, semaphore)
+                    for file_path in remaining_files
+                ),
+                return_exceptions=True,
+            )
 
-                file_analysis, score = self.parse_stage_2_response(stage_2_response)
+            for file_path, result in zip(remaining_files, results):
+                if isinstance(result, Exception):
+                    # One failed call should not abort the whole batch
+                    logger.warning(f"Stage 2 scoring failed for {file_path}: {result}")
+                    result = FileScore(file_path=file_path, score=3, analysis="")
+                batch_scores[file_path] = result
 
-                file_scores.append(
-                    FileScore(file_path=file_path, score=score, analysis=file_analysis)
-                )
+            file_scores = [batch_scores[file_path] for file_path in valid_top_files]
 
             # Sort by score (highest first)
             file_scores.sort(key=lambda x: x.score, reverse=True)
@@ -4,13 +4,349 @@ Retriever Component for CGM
 Retrieves relevant code subgraphs based on anchor nodes
 """
 
-from typing import Any, Dict, List, Set, Tuple
+import hashlib
+import heapq
+import json
+from bisect import bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import networkx as nx
-from fuzzywuzzy import fuzz
+import numpy as np
+from cachetools import LRUCache
 from loguru import logger
+from rapidfuzz import fuzz
+from rapidfuzz import process as fuzz_process
+
+try:
+    import ahocorasick
+
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
 
 from ..models import RetrieverRequest, RetrieverResponse
+from .graph_builder import read_file_preview
+
+# Distinct search terms from which one Aho-Corasick pass beats per-term scans
+_MULTI_PATTERN_MIN_TERMS = 24
+
+# Node and edge attributes copied into a serialized subgraph; bulky source
+# text is only included on request
+SERIALIZE_NODE_KEYS = ("name", "file_path", "class_name", "function_name", "type")
+SERIALIZE_CONTENT_KEYS = ("content", "docstring")
+SERIALIZE_EDGE_KEYS = ("type",)
+
+
+def _lower_all(values: List[str]) -> List[str]:
+    """Lowercase a column, converting each distinct value only once"""
+    lowered = {value: value.lower() for value in set(values)}
+    return [lowered[value] for value in values]
+
+
+_STOP_WORDS = frozenset(
+    {
+        "the",
+        "a",
+        "an",
+        "and",
+        "or",
+        "but",
+        "in",
+        "on",
+        "at",
+        "to",
+        "for",
+        "of",
+        "with",
+        "by",
+        "is",
+        "are",
+        "was",
+        "were",
+        "be",
+        "been",
+        "being",
+        "have",
+        "has",
+        "had",
+        "do",
+        "does",
+        "did",
+        "will",
+        "would",
+        "could",
+        "should",
+        "may",
+        "might",
+        "must",
+        "can",
+        "this",
+        "that",
+        "these",
+        "those",
+    }
+)
+_KEY_TERM_PUNCTUATION = '.,!?;:"()[]{}'
+
+
+@lru_cache(maxsize=4096)
+def _extract_key_terms_cached(query: str) -> Tuple[str, ...]:
+    """Key terms of a query; queries repeat across requests, so memoize"""
+    return tuple(
+        word.strip(_KEY_TERM_PUNCTUATION)
+        for word in query.lower().split()
+        if word not in _STOP_WORDS and len(word) > 2
+    )
+
+
+class TextColumn:
+    """
+    One string per node, joined into a single buffer
+
+    Substring search runs ``str.find`` over the whole buffer in C and maps
+    each hit back to its node position, instead of testing every node's
+    string in a Python loop.
+    """
+
+    __slots__ = ("text", "starts")
+
+    _SEPARATOR = "\0"
+
+    def __init__(self, values: List[str]):
+        starts = []
+        offset = 0
+        for value in values:
+            starts.append(offset)
+            offset += len(value) + 1
+        self.starts = starts
+        self.text = self._SEPARATOR.join(values)
+
+    def find(self, needle: str) -> np.ndarray:
+        """Return the positions of all values containing ``needle``, in order"""
+        starts = self.starts
+        if not needle:
+            return np.arange(len(starts))
+        if self._SEPARATOR in needle:
+            # The needle could straddle two values, check them one by one
+            values = self.text.split(self._SEPARATOR)
+            return np.array(
+                [i for i, value in enumerate(values) if needle in value], dtype=np.intp
+            )
+
+        text = self.text
+        last = len(starts) - 1
+        positions = []
+        hit = text.find(needle)
+        while hit != -1:
+            position = bisect_right(starts, hit) - 1
+            positions.append(position)
+            if position == last:
+                break
+            # One hit per value is enough, resume at the next value
+            hit = text.find(needle, starts[position + 1])
+        return np.array(positions, dtype=np.intp)
+
+    def find_all(self, automaton: "ahocorasick.Automaton") -> Dict[str, np.ndarray]:
+        """Return, per word of ``automaton``, the positions of values containing it"""
+        starts = self.starts
+        found: Dict[str, List[int]] = defaultdict(list)
+        for end, word in automaton.iter(self.text):
+            position = bisect_right(starts, end - len(word) + 1) - 1
+            positions = found[word]
+            if not positions or positions[-1] != position:
+                positions.append(position)
+        return {
+            word: np.array(positions, dtype=np.intp)
+            for word, positions in found.items()
+        }
+
+
+class ValueIndex:
+    """
+    Inverted index from distinct lowercased values to node positions
+
+    Values are kept sorted by length so fuzzy matching can skip every value
+    whose length alone rules out a high enough score.
+    """
+
+    __slots__ = ("values", "positions", "lengths")
+
+    def __init__(self, values: Iterable[str]):
+        index: Dict[str, List[int]] = defaultdict(list)
+        for position, value in enumerate(values):
+            if value:
+                index[value].append(position)
+        self.values = sorted(index, key=len)
+        self.positions = [
+            np.array(index[value], dtype=np.intp) for value in self.values
+        ]
+        self.lengths = np.array([len(value) for value in self.values], dtype=np.intp)
+
+    def fuzzy_match(self, queries: List[str], threshold: float) -> np.ndarray:
+        """Return node positions whose value scores above ``threshold`` for any query"""
+        if not queries or not self.values:
+            return np.empty(0, dtype=np.intp)
+
+        # fuzz.ratio of strings of lengths a and b is at most
+        # 200 * min(a, b) / (a + b), so only values with lengths inside this
+        # window can beat the threshold for at least one query
+        first, last = 0, len(self.values)
+        if 0 < threshold < 100:
+            shortest = min(len(query) for query in queries)
+            longest = max(len(query) for query in queries)
+            slack = 1 + 1e-9
+            first = np.searchsorted(
+                self.lengths, shortest * threshold / (200 - threshold) / slack, "right"
+            )
+            last = np.searchsorted(
+                self.lengths, longest * (200 - threshold) / threshold * slack, "left"
+            )
+            if first >= last:
+                return np.empty(0, dtype=np.intp)
+
+        # Score every query against every remaining value in one call, spread
+        # across all cores; scores under the cutoff come back as 0
+        scores = fuzz_process.cdist(
+            queries,
+            self.values[first:last],
+            scorer=fuzz.ratio,
+            score_cutoff=threshold,
+            dtype=np.float64,
+            workers=-1,
+        )
+
+        # score_cutoff is inclusive, matching needs a strictly higher score
+        matched = np.flatnonzero((scores > threshold).any(axis=0)) + first
+        if not len(matched):
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([self.positions[position] for position in matched])
+
+
+class GraphIndex:
+    """
+    Lookup structures over the node attributes of a retriever graph
+
+    Attributes are read out of the graph once and stored column-wise, so
+    anchor lookups no longer walk every node's attribute dict per entity,
+    keyword and query. Lookups work on arrays of node positions, which are
+    mapped back to ids with a single fancy index into ``node_ids``.
+    """
+
+    def __init__(self, graph: nx.Graph):
+        node_ids = list(graph.nodes())
+        names = []
+        file_paths = []
+        class_names = []
+        function_names = []
+        keyword_texts = []
+        # File nodes of built graphs no longer store their text; it is read
+        # from the repository instead
+        repository_path = graph.graph.get("repository_path")
+        for node, node_data in graph.nodes(data=True):
+            names.append(node_data.get("name", node) or "")
+            file_paths.append(node_data.get("file_path", "") or "")
+            class_names.append(node_data.get("class_name", "") or "")
+            function_names.append(node_data.get("function_name", "") or "")
+            content = node_data.get("content")
+            file_path = node_data.get("file_path")
+            if (
+                not content
+                and repository_path
+                and file_path
+                and node_data.get("type") == "file"
+            ):
+                content = read_file_preview(repository_path, file_path)
+            keyword_texts.append(
+                (
+                    (content or "")
+                    + TextColumn._SEPARATOR
+                    + (node_data.get("docstring", "") or "")
+                    + TextColumn._SEPARATOR
+                    + node
+                ).lower()
+            )
+
+        self.node_ids: np.ndarray = np.array(node_ids, dtype=object)
+
+        # Case-sensitive substring columns for entity matching
+        self.node_ids_text = TextColumn(node_ids)
+        self.file_paths = TextColumn(file_paths)
+        self.class_names = TextColumn(class_names)
+        self.function_names = TextColumn(function_names)
+
+        # Every attribute is lowercased exactly once here, so lookups only
+        # lowercase their own entity, keyword or query
+        names_lc = _lower_all(names)
+
+        # Lowercased columns for keyword and query matching
+        self.keyword_text = TextColumn(keyword_texts)
+        self.names_text = TextColumn(names_lc)
+
+        # Distinct lowercased names for fuzzy matching
+        self.name_index = ValueIndex(names_lc)
+        self.class_name_index = ValueIndex(_lower_all(class_names))
+        self.function_name_index = ValueIndex(_lower_all(function_names))
+
+    def find_terms(self, terms: List[str]) -> Dict[str, np.ndarray]:
+        """Find the node positions for every distinct term in ``terms``"""
+        distinct = list(dict.fromkeys(terms))
+        searchable = [
+            term for term in distinct if term and TextColumn._SEPARATOR not in term
+        ]
+
+        # A single automaton pass only beats one str.find scan per term
+        # once there are enough terms to search for
+        if not AHOCORASICK_AVAILABLE or len(searchable) < _MULTI_PATTERN_MIN_TERMS:
+            return {term: self.term_positions(term) for term in distinct}
+
+        automaton = ahocorasick.Automaton()
+        for term in searchable:
+            automaton.add_word(term, term)
+        automaton.make_automaton()
+
+        keyword_hits = self.keyword_text.find_all(automaton)
+        name_hits = self.names_text.find_all(automaton)
+        empty = np.empty(0, dtype=np.intp)
+
+        term_hits = {
+            term: np.union1d(keyword_hits.get(term, empty), name_hits.get(term, empty))
+            for term in searchable
+        }
+        for term in distinct:
+            if term not in term_hits:
+                term_hits[term] = self.term_positions(term)
+        return term_hits
+
+    def term_positions(self, term: str) -> np.ndarray:
+        """Positions of nodes whose content, docstring, name or id contain ``term``"""
+        return np.union1d(self.keyword_text.find(term), self.names_text.find(term))
+
+    def count_term_hits(
+        self, terms: List[str], term_hits: Optional[Dict[str, np.ndarray]] = None
+    ) -> np.ndarray:
+        """
+        Count, per node, how many of ``terms`` it contains
+
+        ``term_hits`` can hold positions already found with ``find_terms``;
+        repeated terms are searched once but still counted every time.
+        """
+        node_count = len(self.node_ids)
+        if not terms:
+            return np.zeros(node_count, dtype=np.intp)
+
+        if term_hits is None:
+            term_hits = self.find_terms(terms)
+
+        # Accumulate all per-term hits in a single vectorized pass
+        hits = [term_hits[term] for term in terms]
+        return np.bincount(np.concatenate(hits), minlength=node_count)
+
+    def ids_for(self, positions: np.ndarray) -> List[str]:
+        """Map node positions back to node ids, in graph order"""
+        return self.node_ids[np.unique(positions)].tolist()
 
 
 class RetrieverComponent:
@@ -19,245 +355,198 @@ class RetrieverComponent:
     relevant subgraphs from the repository code graph
     """
 
-    def __init__(self):
+    def __init__(self, graph_cache_size: int = 8):
         self.similarity_threshold = 70  # Fuzzy matching threshold
 
+        # Built graphs and indices, keyed by repository graph fingerprint
+        self.graph_cache = LRUCache(maxsize=graph_cache_size)
+
     def locate_anchor_nodes(
         self,
         entities: List[str],
         keywords: List[str],
         queries: List[str],
         graph: nx.Graph,
-    ) -> List[str]:
+        index: Optional[GraphIndex] = None,
+    ) -> Set[str]:
         """
         Locate anchor nodes in the code graph based on entities, keywords, and queries
         """
-        anchor_nodes = set()
+        if index is None:
+            index = self._build_indices(graph)
 
-        # Direct entity matching
-        for entity in entities:
-            matching_nodes = self._find_matching_nodes(entity, graph)
-            anchor_nodes.update(matching_nodes)
+        # Direct entity matching, all entities at once
+        anchor_nodes = set(index.ids_for(self._match_entities(entities, index)))
 
         # Keyword-based matching
         for keyword in keywords:
-            matching_nodes = self._find_nodes_by_keyword(keyword, graph)
+            matching_nodes = self._find_nodes_by_keyword(keyword, index)
             anchor_nodes.update(matching_nodes)
 
         # Query-based matching (if available)
         if queries:
+            # Search the key terms of all queries together, once per distinct term
+            term_hits = index.find_terms(
+                [term for query in queries for term in self._extract_key_terms(query)]
+            )
             for query in queries:
-                matching_nodes = self._find_nodes_by_query(query, graph)
+                matching_nodes = self._find_nodes_by_query(query, index, term_hits)
                 anchor_nodes.update(matching_nodes)
 
-        return list(anchor_nodes)
-
-    def _find_matching_nodes(self, entity: str, graph: nx.Graph) -> List[str]:
-        """Find nodes that match the given entity"""
-        matching_nodes = []
+        return anchor_nodes
+
+    def _get_graph(
+        self, graph_dict: Dict[str, Any], force_refresh: bool = False
+    ) -> Tuple[nx.Graph, GraphIndex]:
+        """Get the NetworkX graph and its indices, building them on a cache miss"""
+        cache_key = self._graph_cache_key(graph_dict)
+
+        if not force_refresh:
+            cached = self.graph_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        graph = self._dict_to_networkx(graph_dict)
+        cached = (graph, self._build_indices(graph))
+        self.graph_cache[cache_key] = cached
+        return cached
+
+    def _graph_cache_key(self, graph_dict: Dict[str, Any]) -> str:
+        """Fingerprint a repository graph from all of its nodes and edges"""
+        # Any edited node, edge or attribute must change the key, or a stale
+        # graph and index would be served
+        key_data = json.dumps(
+            [
+                (graph_dict.get("metadata") or {}).get("repository_path"),
+                graph_dict.get("nodes", []),
+                graph_dict.get("edges", []),
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.blake2b(key_data.encode(), digest_size=16).hexdigest()
 
-        for node in graph.nodes():
-            node_data = graph.nodes[node]
+    def _build_indices(self, graph: nx.Graph) -> GraphIndex:
+        """Build the node attribute indices used for anchor lookups"""
+        return GraphIndex(graph)
 
-            # Direct name matching
-            if entity in node:
-                matching_nodes.append(node)
-                continue
+    def _find_matching_nodes(self, entity: str, index: GraphIndex) -> List[str]:
+        """Find nodes that match the given entity"""
+        return index.ids_for(self._match_entities([entity], index))
 
-            # Fuzzy matching with node attributes
-            node_name = node_data.get("name", node)
-            if (
-                fuzz.ratio(entity.lower(), node_name.lower())
-                > self.similarity_threshold
-            ):
-                matching_nodes.append(node)
-                continue
+    def _match_entities(self, entities: List[str], index: GraphIndex) -> np.ndarray:
+        """Find positions of nodes that match any of the given entities"""
+        hits = []
 
-            # Check file path matching
-            file_path = node_data.get("file_path", "")
-            if entity in file_path:
-                matching_nodes.append(node)
-                continue
+        # Direct name, file path and class/function name matching
+        for entity in entities:
+            hits.append(index.node_ids_text.find(entity))
+            hits.append(index.file_paths.find(entity))
+            hits.append(index.class_names.find(entity))
+            hits.append(index.function_names.find(entity))
 
-            # Check class/function name matching
-            class_name = node_data.get("class_name", "")
-            function_name = node_data.get("function_name", "")
+        # Fuzzy matching of every entity against each distinct lowercased name
+        entities_lower = [entity.lower() for entity in entities]
+        threshold = self.similarity_threshold
+        hits.append(index.name_index.fuzzy_match(entities_lower, threshold))
+        hits.append(index.class_name_index.fuzzy_match(entities_lower, threshold))
+        hits.append(index.function_name_index.fuzzy_match(entities_lower, threshold))
 
-            if (
-                entity in class_name
-                or entity in function_name
-                or fuzz.ratio(entity.lower(), class_name.lower())
-                > self.similarity_threshold
-                or fuzz.ratio(entity.lower(), function_name.lower())
-                > self.similarity_threshold
-            ):
-                matching_nodes.append(node)
-
-        return matching_nodes
+        return np.concatenate(hits)
 
-    def _find_nodes_by_keyword(self, keyword: str, graph: nx.Graph) -> List[str]:
+    def _find_nodes_by_keyword(self, keyword: str, index: GraphIndex) -> List[str]:
         """Find nodes that contain the given keyword"""
-        matching_nodes = []
-
-        for node in graph.nodes():
-            node_data = graph.nodes[node]
-
-            # Check in node content/docstring
-            content = node_data.get("content", "").lower()
-            docstring = node_data.get("docstring", "").lower()
-
-            if (
-                keyword.lower() in content
-                or keyword.lower() in docstring
-                or keyword.lower() in node.lower()
-            ):
-                matching_nodes.append(node)
-
-        return matching_nodes
+        # Content, docstring and node id are searched in one lowercased column
+        return index.ids_for(index.keyword_text.find(keyword.lower()))
 
-    def _find_nodes_by_query(self, query: str, graph: nx.Graph) -> List[str]:
+    def _find_nodes_by_query(
+        self,
+        query: str,
+        index: GraphIndex,
+        term_hits: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[str]:
         """Find nodes based on natural language query"""
-        matching_nodes = []
-        query_lower = query.lower()
-
         # Extract key terms from query
         key_terms = self._extract_key_terms(query)
 
-        for node in graph.nodes():
-            node_data = graph.nodes[node]
-            score = 0
+        # Score based on key terms presence in content, docstring, name and id
+        scores = index.count_term_hits(key_terms, term_hits)
 
-            # Score based on key terms presence
-            content = (
-                node_data.get("content", "")
-                + " "
-                + node_data.get("docstring", "")
-                + " "
-                + node_data.get("name", "")
-                + " "
-                + node
-            ).lower()
-
-            for term in key_terms:
-                if term in content:
-                    score += 1
-
-            # If enough terms match, consider it relevant
-            if score >= len(key_terms) * 0.3:  # At least 30% of terms match
-                matching_nodes.append(node)
-
-        return matching_nodes
+        # If enough terms match, consider it relevant
+        min_score = len(key_terms) * 0.3  # At least 30% of terms match
+        return index.node_ids[scores >= min_score].tolist()
 
     def _extract_key_terms(self, query: str) -> List[str]:
         """Extract key terms from a natural language query"""
         # Simple keyword extraction - can be enhanced with NLP
-        stop_words = {
-            "the",
-            "a",
-            "an",
-            "and",
-            "or",
-            "but",
-            "in",
-            "on",
-            "at",
-            "to",
-            "for",
-            "of",
-            "with",
-            "by",
-            "is",
-            "are",
-            "was",
-            "were",
-            "be",
-            "been",
-            "being",
-            "have",
-            "has",
-            "had",
-            "do",
-            "does",
-            "did",
-            "will",
-            "would",
-            "could",
-            "should",
-            "may",
-            "might",
-            "must",
-            "can",
-            "this",
-            "that",
-            "these",
-            "those",
-        }
-
-        words = query.lower().split()
-        key_terms = [
-            word.strip('.,!?;:"()[]{}')
-            for word in words
-            if word.lower() not in stop_words and len(word) > 2
-        ]
-
-        return key_terms
+        return list(_extract_key_terms_cached(query))
 
     def extract_subgraph(
         self,
-        anchor_nodes: List[str],
+        anchor_nodes: Set[str],
         graph: nx.Graph,
         max_depth: int = 2,
         max_nodes: int = 100,
+        include_content: bool = False,
     ) -> Dict[str, Any]:
         """
         Extract a relevant subgraph around the anchor nodes
+
+        Nodes carry only the ``SERIALIZE_NODE_KEYS`` attributes, plus
+        ``content`` and ``docstring`` when ``include_content`` is set.
         """
         if not anchor_nodes:
             return {"nodes": [], "edges": [], "metadata": {}}
 
         subgraph_nodes = set(anchor_nodes)
+        frontier = {node for node in subgraph_nodes if node in graph}
 
-        # Expand around anchor nodes
-        for depth in range(max_depth):
+        # Expand around anchor nodes one depth at a time, visiting only the
+        # nodes first reached at the previous depth
+        for _ in range(max_depth):
             new_nodes = set()
-            for node in list(subgraph_nodes):
-                if node in graph:
-                    # Add neighbors
-                    neighbors = list(graph.neighbors(node))
-                    new_nodes.update(neighbors)
-
-            subgraph_nodes.update(new_nodes)
+            for node in frontier:
+                new_nodes.update(graph.neighbors(node))
+            new_nodes -= subgraph_nodes
+            if not new_nodes:
+                break
+            subgraph_nodes |= new_nodes
+            frontier = new_nodes
 
-            # Limit subgraph size
+            # Stop expanding once the size limit is passed
             if len(subgraph_nodes) > max_nodes:
-                # Keep the most connected nodes
-                subgraph_nodes = self._select_top_nodes(
-                    list(subgraph_nodes), graph, max_nodes
-                )
                 break
 
+        # Limit subgraph size on every exit path, anchors included, keeping
+        # the most connected nodes
+        subgraph_nodes = self._select_top_nodes(subgraph_nodes, graph, max_nodes)
+
         # Create subgraph
         subgraph = graph.subgraph(subgraph_nodes)
 
         # Convert to serializable format
+        node_keys = SERIALIZE_NODE_KEYS
+        if include_content:
+            node_keys += SERIALIZE_CONTENT_KEYS
+
         nodes_data = []
-        for node in subgraph.nodes():
-            node_data = dict(subgraph.nodes[node])
+        for node, attrs in subgraph.nodes(data=True):
+            node_data = {k: attrs[k] for k in node_keys if k in attrs}
             node_data["id"] = node
             nodes_data.append(node_data)
 
         edges_data = []
-        for edge in subgraph.edges():
-            edge_data = dict(subgraph.edges[edge])
-            edge_data["source"] = edge[0]
-            edge_data["target"] = edge[1]
+        for source, target, attrs in subgraph.edges(data=True):
+            edge_data = {k: attrs[k] for k in SERIALIZE_EDGE_KEYS if k in attrs}
+            edge_data["source"] = source
+            edge_data["target"] = target
             edges_data.append(edge_data)
 
         return {
             "nodes": nodes_data,
             "edges": edges_data,
             "metadata": {
-                "anchor_nodes": anchor_nodes,
+                "anchor_nodes": sorted(anchor_nodes),
                 "total_nodes": len(nodes_data),
                 "total_edges": len(edges_data),
                 "max_depth": max_depth,
@@ -265,22 +554,19 @@ class RetrieverComponent:
         }
 
     def _select_top_nodes(
-        self, nodes: List[str], graph: nx.Graph, max_nodes: int
+        self, nodes: Set[str], graph: nx.Graph, max_nodes: int
     ) -> Set[str]:
         """Select top nodes based on centrality measures"""
         if len(nodes) <= max_nodes:
             return set(nodes)
 
-        # Calculate centrality scores
+        # Rank by degree within the candidate set; degree centrality only
+        # divides this by (n - 1), so the float scores and full sort are not
+        # needed to pick the top nodes
         subgraph = graph.subgraph(nodes)
-        centrality_scores = nx.degree_centrality(subgraph)
-
-        # Sort by centrality and take top nodes
-        sorted_nodes = sorted(
-            centrality_scores.items(), key=lambda x: x[1], reverse=True
-        )
+        top_nodes = heapq.nlargest(max_nodes, subgraph.degree, key=itemgetter(1))
 
-        return set([node for node, _ in sorted_nodes[:max_nodes]])
+        return {node for node, _ in top_nodes}
 
     def get_relevant_files(self, subgraph: Dict[str, Any]) -> List[str]:
         """Extract list of relevant files from subgraph"""
@@ -298,12 +584,19 @@ class RetrieverComponent:
         try:
             logger.info("Processing retriever request")
 
-            # Convert repository graph to NetworkX graph
-            graph = self._dict_to_networkx(request.repository_graph)
+            # Convert repository graph to NetworkX graph and index node
+            # attributes, reusing both across requests on the same graph
+            graph, index = self._get_graph(
+                request.repository_graph, request.force_refresh
+            )
 
             # Locate anchor nodes
             anchor_nodes = self.locate_anchor_nodes(
-                request.entities, request.keywords, request.queries or [], graph
+                request.entities,
+                request.keywords,
+                request.queries or [],
+                graph,
+                index,
             )
 
             logger.info(f"Found {len(anchor_nodes)} anchor nodes")
@@ -315,7 +608,7 @@ class RetrieverComponent:
             relevant_files = self.get_relevant_files(subgraph)
 
             return RetrieverResponse(
-                anchor_nodes=anchor_nodes,
+                anchor_nodes=sorted(anchor_nodes),
                 subgraph=subgraph,
                 relevant_files=relevant_files,
             )
@@ -327,6 +620,10 @@ class RetrieverComponent:
     def _dict_to_networkx(self, graph_dict: Dict[str, Any]) -> nx.Graph:
         """Convert dictionary representation to NetworkX graph"""
         graph = nx.Graph()
+        # Lets the index read the text of file nodes stored without it
+        graph.graph["repository_path"] = (graph_dict.get("metadata") or {}).get(
+            "repository_path"
+        )
 
         # Add nodes
         for node_data in graph_dict.get("nodes", []):
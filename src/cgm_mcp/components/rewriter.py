@@ -4,33 +4,87 @@ Rewriter Component for CGM
 Rewrites original issues by extracting keywords and generating relevant queries
 """
 
-import re
-from typing import List, Optional, Tuple
+import asyncio
+import hashlib
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 
+import numpy as np
+from cachetools import LRUCache, TTLCache
 from loguru import logger
 
+try:
+    from sentence_transformers import SentenceTransformer
+
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
 from ..models import RewriterRequest, RewriterResponse
 from ..utils.llm_client import LLMClient
+from ..utils.llm_response import load_json_object, section_text
 
+# Section delimiters, located with str.find
+_ANALYSIS_SECTION = ("[start_of_analysis]", "[end_of_analysis]")
+_ENTITIES_SECTION = (
+    "[start_of_related_code_entities]",
+    "[end_of_related_code_entities]",
+)
+_KEYWORDS_SECTION = ("[start_of_related_keywords]", "[end_of_related_keywords]")
+_QUERIES_SECTION = ("[start_of_related_queries]", "[end_of_related_queries]")
 
-class RewriterComponent:
-    """
-    Rewriter component that processes problem statements and extracts
-    relevant information for code graph retrieval
-    """
+# Sections of each mode in their prompted order
+_EXTRACTOR_SECTIONS = (_ANALYSIS_SECTION, _ENTITIES_SECTION, _KEYWORDS_SECTION)
+_INFERER_SECTIONS = (_ANALYSIS_SECTION, _QUERIES_SECTION)
 
-    def __init__(self, llm_client: LLMClient):
-        self.llm_client = llm_client
 
-    def generate_prompt_for_extractor(
-        self, problem_statement: str, repo_name: str
-    ) -> str:
-        """Generate prompt for extraction mode"""
-        prompt = f"""
+# JSON schemas for LLM providers that support constrained decoding; the
+# delimited text format is still parsed when a response is not JSON
+_EXTRACTOR_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "issue_extraction",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "analysis": {"type": "string"},
+                "entities": {"type": "array", "items": {"type": "string"}},
+                "keywords": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["analysis", "entities", "keywords"],
+            "additionalProperties": False,
+        },
+    },
+}
+_INFERER_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "issue_queries",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "analysis": {"type": "string"},
+                "queries": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "maxItems": 5,
+                },
+            },
+            "required": ["analysis", "queries"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Prompt templates, built once at import time; only the user prompt varies
+_USER_PROMPT_TEMPLATE = """
 <issue>
 {problem_statement}
 </issue> 
 This is an issue related to repository '{repo_name}'. 
+"""
+
+_EXTRACTOR_SYSTEM_PROMPT = """
 Instructions:
 1. Analysis:
 ○ Analyze the provided issue description. Identify the relevant File, Class, or Function involved.
@@ -66,18 +120,8 @@ Unpreferred extraction Examples of keywords:
 - something wrong
 - input validation
 - TypeError
-"""
-        return prompt
-
-    def generate_prompt_for_inferer(
-        self, problem_statement: str, repo_name: str
-    ) -> str:
-        """Generate prompt for inference mode"""
-        prompt = f"""
-<issue>
-{problem_statement}
-</issue> 
-This is an issue related to repository '{repo_name}'. 
+""".strip()
+_INFERER_SYSTEM_PROMPT = """
 Task:
 Based on the issue description provided, identify the characteristics of code entities (files, functions, class) that might need to be modified. 
 For each characteristic, generate a search query that could help locate relevant code entities in a codebase.
@@ -112,105 +156,521 @@ Preferred Query Examples:
 - File name containing 'mysql.py' AND functions related to 'MySQLStatementSamples' initialization.
 - Functions or methods handling hostname resolution or encoding within 'datadog_checks' directory.
 - Find all occurrences of "early_stopping" within files that also mention "Trainer" to identify where early stopping logic is implemented and potentially needs adjustment for non-default 'val_check_interval'.
-"""
-        return prompt
+""".strip()
+
+# Follow-up prompt for a response whose sections could not be found
+_REFORMAT_PROMPT_TEMPLATE = """
+The response below does not follow the required format. Repeat its content in exactly this format, without any other text:
+{sections}
+<response>
+{response}
+</response>
+""".strip()
+
+
+@lru_cache(maxsize=1024)
+def _build_user_prompt(problem_statement: str, repo_name: str) -> str:
+    """Issue-specific prompt; the same issue is often rewritten in both modes"""
+    return _USER_PROMPT_TEMPLATE.format_map(
+        {"problem_statement": problem_statement, "repo_name": repo_name}
+    )
+
+
+def _strip_query_prefix(line: str) -> str:
+    """Remove a leading "query N:" label from a line"""
+    # Equivalent to matching r"^query\s+\d+:\s*" case-insensitively: before
+    # the first colon there must be "query", whitespace, then only digits
+    label, colon, rest = line.partition(":")
+    if colon and label[:5].lower() == "query":
+        number = label[5:].lstrip()
+        if number != label[5:] and number.isdecimal():
+            return rest.lstrip()
+    return line
+
+
+def _sections_in_order(
+    response: str, sections: Tuple[Tuple[str, str], ...]
+) -> Optional[List[str]]:
+    """
+    Return the stripped text of consecutive delimited sections
+
+    Each section is searched for after the end of the previous one, so a
+    well-formed response is scanned once. Returns None unless every
+    section is present and in order.
+    """
+    texts = []
+    position = 0
+    for start, end in sections:
+        i = response.find(start, position)
+        if i < 0:
+            return None
+        i += len(start)
+        position = response.find(end, i)
+        if position < 0:
+            return None
+        texts.append(response[i:position].strip())
+        position += len(end)
+    return texts
+
+
+def _unique_items(items: Any) -> List[str]:
+    """Non-empty stripped strings of a JSON list, first occurrences in order"""
+    if not isinstance(items, list):
+        return []
+    return list(dict.fromkeys(filter(None, (str(item).strip() for item in items))))
+
+
+def _unique_lines(text: str) -> List[str]:
+    """Non-empty stripped lines of a section, first occurrences in order"""
+    return list(dict.fromkeys(filter(None, map(str.strip, text.splitlines()))))
+
+
+def _is_empty(response: RewriterResponse) -> bool:
+    """Whether no section of an LLM response could be parsed"""
+    return not (
+        response.analysis
+        or response.related_entities
+        or response.keywords
+        or response.queries
+    )
+
+
+class SemanticCache:
+    """
+    Rewriter responses looked up by issue meaning rather than exact text
+
+    Issues are embedded with a sentence encoder; a new issue reuses the
+    response of the most similar cached issue from the same repository and
+    mode when their cosine similarity reaches ``threshold``.
+    """
+
+    DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+    def __init__(
+        self, encoder: Any = None, threshold: float = 0.92, maxsize: int = 512
+    ):
+        if encoder is None:
+            if not SENTENCE_TRANSFORMERS_AVAILABLE:
+                raise ImportError("sentence-transformers is required for SemanticCache")
+            encoder = SentenceTransformer(self.DEFAULT_MODEL)
+        self.encoder = encoder
+        self.threshold = threshold
+        self.maxsize = maxsize
+        # (repo_name, extraction_mode) -> (unit embeddings matrix, responses)
+        self.entries: Dict[
+            Tuple[str, bool], Tuple[np.ndarray, List[RewriterResponse]]
+        ] = {}
+
+    def embed(self, text: str) -> np.ndarray:
+        """Unit-length embedding of an issue"""
+        embedding = np.asarray(
+            self.encoder.encode([text], normalize_embeddings=True), dtype=np.float32
+        )
+        return embedding[0]
+
+    def lookup(
+        self, key: Tuple[str, bool], embedding: np.ndarray
+    ) -> Optional[RewriterResponse]:
+        """Response of the nearest cached issue, if it is similar enough"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        matrix, responses = entry
+        # Inner product of unit vectors is the cosine similarity
+        similarities = matrix @ embedding
+        best = int(similarities.argmax())
+        if similarities[best] >= self.threshold:
+            return responses[best]
+        return None
+
+    def add(
+        self, key: Tuple[str, bool], embedding: np.ndarray, response: RewriterResponse
+    ) -> None:
+        """Cache a response, dropping the oldest ones beyond ``maxsize``"""
+        matrix, responses = self.entries.get(
+            key, (np.empty((0, embedding.shape[0]), dtype=np.float32), [])
+        )
+        matrix = np.vstack((matrix, embedding))[-self.maxsize :]
+        responses = (responses + [response])[-self.maxsize :]
+        self.entries[key] = (matrix, responses)
+
+
+class RewriterComponent:
+    """
+    Rewriter component that processes problem statements and extracts
+    relevant information for code graph retrieval
+    """
+
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        response_cache_size: int = 512,
+        response_cache_ttl: float = 3600,
+        semantic_cache: Optional[SemanticCache] = None,
+        reformat_cache_size: int = 256,
+        structured_output: bool = False,
+    ):
+        self.llm_client = llm_client
+        # Ask the LLM for schema-constrained JSON instead of delimited text
+        self.structured_output = structured_output
+        # Parsed responses keyed by mode, repository and issue, so retried or
+        # duplicate issues do not repeat the LLM call
+        self.response_cache = TTLCache(
+            maxsize=response_cache_size, ttl=response_cache_ttl
+        )
+        # Optional fallback that also reuses responses for reworded issues
+        self.semantic_cache = semantic_cache
+        # Reformatted text of malformed LLM responses, keyed by mode and
+        # response digest, so an identical bad response is retried only once
+        self.reformat_cache = LRUCache(maxsize=reformat_cache_size)
+
+    def _generate_kwargs(self, extraction_mode: bool) -> Dict[str, Any]:
+        """Extra LLM call arguments for a mode"""
+        if self.structured_output:
+            return {
+                "response_format": (
+                    _EXTRACTOR_RESPONSE_FORMAT
+                    if extraction_mode
+                    else _INFERER_RESPONSE_FORMAT
+                )
+            }
+        return {}
+
+    def _cache_key(self, request: RewriterRequest) -> Tuple[bool, str, str]:
+        """Key a rewriter request by mode, repository and issue text"""
+        return (
+            request.extraction_mode,
+            request.repo_name,
+            hashlib.blake2b(
+                request.problem_statement.encode(), digest_size=16
+            ).hexdigest(),
+        )
+
+    def generate_prompt_for_extractor(
+        self, problem_statement: str, repo_name: str
+    ) -> Tuple[str, str]:
+        """
+        Generate prompt for extraction mode
+
+        Returns the static instructions and the issue-specific prompt
+        separately, so the instructions can be sent as a cacheable prefix.
+        """
+        user_prompt = _build_user_prompt(problem_statement, repo_name)
+
+        return _EXTRACTOR_SYSTEM_PROMPT, user_prompt
+
+    def generate_prompt_for_inferer(
+        self, problem_statement: str, repo_name: str
+    ) -> Tuple[str, str]:
+        """Generate prompt for inference mode, as (system, user) prompts"""
+        user_prompt = _build_user_prompt(problem_statement, repo_name)
+
+        return _INFERER_SYSTEM_PROMPT, user_prompt
 
     def parse_extractor_response(
         self, response: str
     ) -> Tuple[str, List[str], List[str]]:
         """Parse the response from extraction mode"""
-        try:
-            # Extract analysis
-            analysis_match = re.search(
-                r"\[start_of_analysis\](.*?)\[end_of_analysis\]", response, re.DOTALL
+        # Structured responses decode directly
+        data = load_json_object(response)
+        if data is not None:
+            return (
+                str(data.get("analysis", "")).strip(),
+                _unique_items(data.get("entities")),
+                _unique_items(data.get("keywords")),
             )
-            analysis = analysis_match.group(1).strip() if analysis_match else ""
 
-            # Extract entities
-            entities_match = re.search(
-                r"\[start_of_related_code_entities\](.*?)\[end_of_related_code_entities\]",
-                response,
-                re.DOTALL,
-            )
-            entities_text = entities_match.group(1).strip() if entities_match else ""
-            entities = [e.strip() for e in entities_text.split("\n") if e.strip()]
-
-            # Extract keywords
-            keywords_match = re.search(
-                r"\[start_of_related_keywords\](.*?)\[end_of_related_keywords\]",
-                response,
-                re.DOTALL,
+        # Extract all sections in one pass when they appear in order
+        sections = _sections_in_order(response, _EXTRACTOR_SECTIONS)
+        if sections is not None:
+            analysis, entities_text, keywords_text = sections
+        else:
+            # Missing or reordered sections, look each one up on its own
+            analysis, entities_text, keywords_text = (
+                section_text(response, start, end).strip()
+                for start, end in _EXTRACTOR_SECTIONS
             )
-            keywords_text = keywords_match.group(1).strip() if keywords_match else ""
-            keywords = [k.strip() for k in keywords_text.split("\n") if k.strip()]
 
-            return analysis, entities, keywords
+        # Split entities and keywords
+        entities = _unique_lines(entities_text)
+        keywords = _unique_lines(keywords_text)
 
-        except Exception as e:
-            logger.error(f"Error parsing extractor response: {e}")
-            return "", [], []
+        return analysis, entities, keywords
 
     def parse_inferer_response(self, response: str) -> Tuple[str, List[str]]:
         """Parse the response from inference mode"""
-        try:
-            # Extract analysis
-            analysis_match = re.search(
-                r"\[start_of_analysis\](.*?)\[end_of_analysis\]", response, re.DOTALL
+        # Structured responses decode directly
+        data = load_json_object(response)
+        if data is not None:
+            queries = (
+                _strip_query_prefix(q) for q in _unique_items(data.get("queries"))
             )
-            analysis = analysis_match.group(1).strip() if analysis_match else ""
-
-            # Extract queries
-            queries_match = re.search(
-                r"\[start_of_related_queries\](.*?)\[end_of_related_queries\]",
-                response,
-                re.DOTALL,
+            return str(data.get("analysis", "")).strip(), list(
+                dict.fromkeys(filter(None, queries))
             )
-            queries_text = queries_match.group(1).strip() if queries_match else ""
 
-            # Parse queries (remove "query N:" prefixes)
-            queries = []
-            for line in queries_text.split("\n"):
-                line = line.strip()
-                if line:
-                    # Remove "query N:" prefix if present
-                    query = re.sub(r"^query\s+\d+:\s*", "", line, flags=re.IGNORECASE)
-                    if query:
-                        queries.append(query)
+        # Extract analysis
+        analysis = section_text(response, *_ANALYSIS_SECTION).strip()
 
-            return analysis, queries
+        # Extract queries
+        queries_text = section_text(response, *_QUERIES_SECTION)
 
-        except Exception as e:
-            logger.error(f"Error parsing inferer response: {e}")
-            return "", []
+        # Parse queries (remove "query N:" prefixes)
+        queries = []
+        for line in map(str.strip, queries_text.splitlines()):
+            if line:
+                # Remove "query N:" prefix if present
+                query = _strip_query_prefix(line)
+                if query:
+                    queries.append(query)
+
+        return analysis, list(dict.fromkeys(queries))
 
     async def process(self, request: RewriterRequest) -> RewriterResponse:
         """Process a rewriter request"""
         try:
             logger.info(f"Processing rewriter request for repo: {request.repo_name}")
+            return await self._rewrite(request)
 
-            if request.extraction_mode:
-                # Use extraction mode
-                prompt = self.generate_prompt_for_extractor(
-                    request.problem_statement, request.repo_name
-                )
-                response = await self.llm_client.generate(prompt)
-                analysis, entities, keywords = self.parse_extractor_response(response)
+        except Exception as e:
+            logger.error(f"Error in rewriter processing: {e}")
+            raise
 
-                return RewriterResponse(
-                    analysis=analysis, related_entities=entities, keywords=keywords
-                )
-            else:
-                # Use inference mode
-                prompt = self.generate_prompt_for_inferer(
-                    request.problem_statement, request.repo_name
-                )
-                response = await self.llm_client.generate(prompt)
-                analysis, queries = self.parse_inferer_response(response)
+    async def process_stream(
+        self, request: RewriterRequest
+    ) -> AsyncIterator[RewriterResponse]:
+        """
+        Process a rewriter request, yielding partial responses as sections arrive
 
-                return RewriterResponse(
-                    analysis=analysis, related_entities=[], keywords=[], queries=queries
-                )
+        A snapshot is yielded each time the streamed LLM output closes another
+        section, so retrieval can start on the entities before the keywords
+        are generated. The last response yielded is the complete one, parsed,
+        reformatted and cached as by ``process``. Structured output has no
+        section markers, so it yields only the complete response.
+        """
+        try:
+            logger.info(
+                f"Processing streamed rewriter request for repo: {request.repo_name}"
+            )
+
+            cached, embedding = await self._lookup(request)
+            if cached is not None:
+                yield cached
+                return
+
+            sections = (
+                _EXTRACTOR_SECTIONS if request.extraction_mode else _INFERER_SECTIONS
+            )
+            system_prompt, user_prompt = self._generate_prompts(request)
+
+            buffer = ""
+            closed = 0  # sections closed so far, in prompted order
+            position = 0  # end of the last closed section
+            content_start = None  # start of the open section's text, if any
+            search_from = 0
+            async for chunk in self.llm_client.stream(
+                user_prompt,
+                system=system_prompt,
+                **self._generate_kwargs(request.extraction_mode),
+            ):
+                buffer += chunk
+                closed_before = closed
+
+                # Scan only the new text, backing up one marker length in
+                # case a marker straddles two chunks
+                while closed < len(sections):
+                    start, end = sections[closed]
+                    if content_start is None:
+                        i = buffer.find(start, search_from)
+                        if i < 0:
+                            search_from = max(position, len(buffer) - len(start) + 1)
+                            break
+                        content_start = search_from = i + len(start)
+                    j = buffer.find(end, search_from)
+                    if j < 0:
+                        search_from = max(content_start, len(buffer) - len(end) + 1)
+                        break
+                    position = search_from = j + len(end)
+                    content_start = None
+                    closed += 1
+
+                if closed > closed_before:
+                    yield self._parse_response(
+                        request.extraction_mode, buffer[:position]
+                    )
+
+            yield await self._finish(request, buffer, embedding)
 
         except Exception as e:
-            logger.error(f"Error in rewriter processing: {e}")
+            logger.error(f"Error in streamed rewriter processing: {e}")
             raise
+
+    async def process_both(self, request: RewriterRequest) -> RewriterResponse:
+        """
+        Run extraction and inference concurrently and merge their results
+
+        The response carries the extracted entities and keywords together
+        with the inferred queries, for the cost of one LLM round trip.
+        ``request.extraction_mode`` is ignored.
+        """
+        try:
+            logger.info(
+                f"Processing dual-mode rewriter request for repo: {request.repo_name}"
+            )
+            extracted, inferred = await asyncio.gather(
+                self._rewrite(request.model_copy(update={"extraction_mode": True})),
+                self._rewrite(request.model_copy(update={"extraction_mode": False})),
+            )
+
+            return RewriterResponse(
+                analysis="\n\n".join(
+                    analysis
+                    for analysis in (extracted.analysis, inferred.analysis)
+                    if analysis
+                ),
+                related_entities=extracted.related_entities,
+                keywords=extracted.keywords,
+                queries=inferred.queries,
+            )
+
+        except Exception as e:
+            logger.error(f"Error in dual-mode rewriter processing: {e}")
+            raise
+
+    async def process_many(
+        self, requests: List[RewriterRequest], max_inflight: int = 32
+    ) -> List[Union[RewriterResponse, BaseException]]:
+        """
+        Process many rewriter requests concurrently
+
+        At most ``max_inflight`` requests reach the LLM at once. Results are
+        in request order; a failed request yields its exception instead of
+        aborting the batch.
+        """
+        semaphore = asyncio.Semaphore(max_inflight)
+
+        async def process_one(request: RewriterRequest) -> RewriterResponse:
+            async with semaphore:
+                return await self.process(request)
+
+        return await asyncio.gather(
+            *(process_one(request) for request in requests), return_exceptions=True
+        )
+
+    def _generate_prompts(self, request: RewriterRequest) -> Tuple[str, str]:
+        """System and user prompts for the request's mode"""
+        if request.extraction_mode:
+            return self.generate_prompt_for_extractor(
+                request.problem_statement, request.repo_name
+            )
+        return self.generate_prompt_for_inferer(
+            request.problem_statement, request.repo_name
+        )
+
+    def _parse_response(self, extraction_mode: bool, response: str) -> RewriterResponse:
+        """Parse an LLM response of either mode into a rewriter response"""
+        if extraction_mode:
+            analysis, entities, keywords = self.parse_extractor_response(response)
+            return RewriterResponse(
+                analysis=analysis, related_entities=entities, keywords=keywords
+            )
+
+        analysis, queries = self.parse_inferer_response(response)
+        return RewriterResponse(
+            analysis=analysis, related_entities=[], keywords=[], queries=queries
+        )
+
+    async def _reformat(
+        self, extraction_mode: bool, response: str, result: RewriterResponse
+    ) -> RewriterResponse:
+        """Ask once for a malformed response in the expected format"""
+        cache_key = (
+            extraction_mode,
+            hashlib.blake2b(response.encode(), digest_size=16).hexdigest(),
+        )
+        reformatted = self.reformat_cache.get(cache_key)
+        if reformatted is None:
+            logger.warning("Rewriter response has no sections, asking for a reformat")
+            sections = _EXTRACTOR_SECTIONS if extraction_mode else _INFERER_SECTIONS
+            prompt = _REFORMAT_PROMPT_TEMPLATE.format_map(
+                {
+                    "sections": "\n".join(
+                        f"{start}\n...\n{end}" for start, end in sections
+                    ),
+                    "response": response,
+                }
+            )
+            try:
+                reformatted = await self.llm_client.generate(prompt)
+            except Exception as e:
+                logger.warning(f"Rewriter reformat failed: {e}")
+                return result
+            self.reformat_cache[cache_key] = reformatted
+
+        return self._parse_response(extraction_mode, reformatted)
+
+    async def _lookup(
+        self, request: RewriterRequest
+    ) -> Tuple[Optional[RewriterResponse], Optional[np.ndarray]]:
+        """
+        Cached response for a request, from the exact or the semantic cache
+
+        Also returns the issue embedding computed for the semantic lookup,
+        so a fresh response can be added under it.
+        """
+        cache_key = self._cache_key(request)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached rewriter response")
+            return cached.model_copy(deep=True), None
+
+        embedding = None
+        if self.semantic_cache is not None:
+            loop = asyncio.get_running_loop()
+            embedding = await loop.run_in_executor(
+                None, self.semantic_cache.embed, request.problem_statement
+            )
+            cached = self.semantic_cache.lookup(
+                (request.repo_name, request.extraction_mode), embedding
+            )
+            if cached is not None:
+                logger.info("Using rewriter response of a similar issue")
+                self.response_cache[cache_key] = cached
+                return cached.model_copy(deep=True), embedding
+
+        return None, embedding
+
+    async def _finish(
+        self,
+        request: RewriterRequest,
+        response: str,
+        embedding: Optional[np.ndarray],
+    ) -> RewriterResponse:
+        """Parse a complete LLM response, reformatting and caching it"""
+        result = self._parse_response(request.extraction_mode, response)
+        if _is_empty(result):
+            result = await self._reformat(request.extraction_mode, response, result)
+
+        # Responses still without sections are not cached, so the issue is
+        # retried on its next request
+        if not _is_empty(result):
+            self.response_cache[self._cache_key(request)] = result
+            if embedding is not None:
+                self.semantic_cache.add(
+                    (request.repo_name, request.extraction_mode), embedding, result
+                )
+        return result.model_copy(deep=True)
+
+    async def _rewrite(self, request: RewriterRequest) -> RewriterResponse:
+        """Rewrite an issue in the request's mode, using the response caches"""
+        cached, embedding = await self._lookup(request)
+        if cached is not None:
+            return cached
+
+        system_prompt, user_prompt = self._generate_prompts(request)
+        response = await self.llm_client.generate(
+            user_prompt,
+            system=system_prompt,
+            **self._generate_kwargs(request.extraction_mode),
+        )
+        return await self._finish(request, response, embedding)
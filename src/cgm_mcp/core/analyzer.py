@@ -6,14 +6,47 @@ It extracts code structure, builds graphs, and provides context for external mod
 """
 
 import ast
+import asyncio
+import atexit
+import hashlib
+import heapq
+import json
+import multiprocessing
 import os
+import pickle
 import re
-from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+import sqlite3
+import sys
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Match,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+    Union,
+)
 
-import networkx as nx
 from loguru import logger
 
+try:
+    import hyperscan
+
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
 from ..models import (
     CodeAnalysisRequest,
     CodeAnalysisResponse,
@@ -22,6 +55,870 @@ from ..models import (
     CodeRelation,
     FileAnalysis,
 )
+from ..utils.graph_arrays import GraphArrays
+
+
+class _PatternFilter:
+    """
+    Hyperscan database of a language's patterns, telling in one pass over a
+    file which of them match anywhere in it. Patterns that do not match need
+    no re scan; the entities themselves are still extracted with re.
+    """
+
+    def __init__(self, patterns: Tuple[Pattern[str], ...]):
+        self.patterns = patterns
+        self.database = hyperscan.Database()
+        self.database.compile(
+            expressions=[_hyperscan_expression(p.pattern) for p in patterns],
+            ids=list(range(len(patterns))),
+            elements=len(patterns),
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_MULTILINE]
+            * len(patterns),
+        )
+
+    def matching(self, content: str) -> Optional[Set[Pattern[str]]]:
+        """The patterns matching somewhere in content, or None if unknown"""
+        # \w and \s only agree with re's on ASCII text
+        if not content.isascii():
+            return None
+        found: Set[int] = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            found.add(pattern_id)
+
+        try:
+            self.database.scan(content.encode("ascii"), match_event_handler=on_match)
+        except hyperscan.error as e:
+            logger.debug(f"Hyperscan prefilter failed: {e}")
+            return None
+        return {self.patterns[pattern_id] for pattern_id in found}
+
+
+def _hyperscan_expression(pattern: str) -> bytes:
+    """A re pattern as a hyperscan expression, with re's ASCII \\s"""
+    # re's \s also matches the \x1c-\x1f separators on str input
+    expression, in_class, escaped = [], False, False
+    for char in pattern:
+        if escaped:
+            escaped = False
+            if char == "s":
+                expression.append(r"\s\x1c-\x1f" if in_class else r"[\s\x1c-\x1f]")
+                continue
+            expression.append("\\" + char)
+        elif char == "\\":
+            escaped = True
+        else:
+            if char == "[":
+                in_class = True
+            elif char == "]":
+                in_class = False
+            expression.append(char)
+    return "".join(expression).encode("ascii")
+
+
+def _pattern_filter(*patterns: Pattern[str]) -> Optional[_PatternFilter]:
+    """A hyperscan prefilter for patterns, if hyperscan is installed"""
+    if not HYPERSCAN_AVAILABLE:
+        return None
+    try:
+        return _PatternFilter(patterns)
+    except hyperscan.error as e:
+        logger.warning(f"Hyperscan could not compile analyzer patterns: {e}")
+        return None
+
+
+class _AsciiMatch:
+    """A match over ASCII bytes, read back as the str match it stands for"""
+
+    __slots__ = ("_match",)
+
+    def __init__(self, match: Match[bytes]):
+        self._match = match
+
+    def group(self, index: int = 0) -> Optional[str]:
+        value = self._match.group(index)
+        return None if value is None else value.decode("ascii")
+
+    def groups(self) -> Tuple[Optional[str], ...]:
+        return tuple(
+            None if value is None else value.decode("ascii")
+            for value in self._match.groups()
+        )
+
+    def start(self, index: int = 0) -> int:
+        return self._match.start(index)
+
+    def end(self, index: int = 0) -> int:
+        return self._match.end(index)
+
+
+# Bytes twins of the str patterns, compiled on first use
+_BYTES_PATTERNS: Dict[Pattern[str], Pattern[bytes]] = {}
+# Characters re's \s matches in str but not in bytes
+_STR_ONLY_SPACE_RE = re.compile("[\x1c-\x1f]")
+
+
+def _bytes_pattern(pattern: Pattern[str]) -> Pattern[bytes]:
+    """pattern compiled for bytes, with the same flags apart from re.UNICODE"""
+    bytes_pattern = _BYTES_PATTERNS.get(pattern)
+    if bytes_pattern is None:
+        bytes_pattern = re.compile(
+            pattern.pattern.encode("ascii"), pattern.flags & ~re.UNICODE
+        )
+        _BYTES_PATTERNS[pattern] = bytes_pattern
+    return bytes_pattern
+
+
+def _finditer(
+    content: str, pattern_filter: Optional[_PatternFilter]
+) -> Callable[[Pattern[str]], Iterable[Match[str]]]:
+    """pattern.finditer(content), skipping patterns the filter rules out"""
+    matching = pattern_filter.matching(content) if pattern_filter else None
+
+    def skipped(pattern: Pattern[str]) -> bool:
+        if matching is not None:
+            return pattern not in matching
+        # Without hyperscan, a substring search for the pattern's keywords
+        literals = _PATTERN_LITERALS.get(pattern)
+        return literals is not None and not any(
+            literal in content for literal in literals
+        )
+
+    # On ASCII text the bytes engine finds the same matches, without the
+    # Unicode character class lookups
+    if content.isascii() and not _STR_ONLY_SPACE_RE.search(content):
+        data = content.encode("ascii")
+
+        def finditer(pattern: Pattern[str]) -> Iterable[Match[str]]:
+            if skipped(pattern):
+                return ()
+            return map(_AsciiMatch, _bytes_pattern(pattern).finditer(data))
+
+        return finditer
+
+    def finditer(pattern: Pattern[str]) -> Iterable[Match[str]]:
+        if skipped(pattern):
+            return ()
+        return pattern.finditer(content)
+
+    return finditer
+
+
+# Below this many files, starting worker processes costs more than it saves
+_PARALLEL_MIN_FILES = 256
+# Files sent to a worker process at a time
+_PARALLEL_CHUNK_SIZE = 32
+# Files read concurrently when analyzing in-process
+_READ_BATCH_SIZE = 64
+# Leading bytes searched for a NUL when telling binary files from text
+_BINARY_SNIFF_SIZE = 8192
+
+# Bumped whenever analysis results change, invalidating cached entities
+_ENTITY_CACHE_VERSION = 2
+
+# Nodes other than classes and functions whose bodies hold statements; a
+# definition is never nested in anything else
+_AST_STATEMENT_CONTAINERS = frozenset(
+    getattr(ast, name)
+    for name in (
+        "AsyncFunctionDef",
+        "If",
+        "For",
+        "AsyncFor",
+        "While",
+        "With",
+        "AsyncWith",
+        "Try",
+        "TryStar",
+        "ExceptHandler",
+        "Match",
+        "match_case",
+    )
+    if hasattr(ast, name)  # TryStar and Match are newer syntax
+)
+
+# Import statements, found in the same statement bodies as definitions
+_AST_IMPORTS = frozenset({ast.Import, ast.ImportFrom})
+
+# Metadata whose values come from a fixed set of names
+_INTERNED_METADATA_VALUES = frozenset({"language", "visibility"})
+
+# File extensions the analyzer reads
+_SUPPORTED_EXTENSIONS = frozenset(
+    {
+        # Python
+        ".py",
+        ".pyx",
+        ".pyi",
+        # JavaScript/TypeScript
+        ".js",
+        ".jsx",
+        ".ts",
+        ".tsx",
+        ".mjs",
+        ".cjs",
+        # Java/Kotlin/Scala
+        ".java",
+        ".kt",
+        ".scala",
+        # C/C++
+        ".c",
+        ".cpp",
+        ".cc",
+        ".cxx",
+        ".h",
+        ".hpp",
+        ".hxx",
+        # Go
+        ".go",
+        # Rust
+        ".rs",
+        # PHP
+        ".php",
+        ".php3",
+        ".php4",
+        ".php5",
+        ".phtml",
+        # Ruby
+        ".rb",
+        ".rbw",
+        # C#
+        ".cs",
+        # Swift
+        ".swift",
+        # Objective-C
+        ".m",
+        ".mm",
+        # Dart
+        ".dart",
+        # Lua
+        ".lua",
+        # Shell
+        ".sh",
+        ".bash",
+        ".zsh",
+        ".fish",
+        # SQL
+        ".sql",
+        # R
+        ".r",
+        ".R",
+        # MATLAB
+        ".m",
+        # Perl
+        ".pl",
+        ".pm",
+        # Haskell
+        ".hs",
+        # Erlang/Elixir
+        ".erl",
+        ".ex",
+        ".exs",
+        # Clojure
+        ".clj",
+        ".cljs",
+        ".cljc",
+        # F#
+        ".fs",
+        ".fsx",
+        # Visual Basic
+        ".vb",
+        # PowerShell
+        ".ps1",
+        ".psm1",
+    }
+)
+
+# Language of each file extension
+_LANGUAGE_MAP = {
+    # Python
+    ".py": "python",
+    ".pyx": "python",
+    ".pyi": "python",
+    # JavaScript/TypeScript
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    # Java/Kotlin/Scala
+    ".java": "java",
+    ".kt": "kotlin",
+    ".scala": "scala",
+    # C/C++
+    ".c": "c",
+    ".h": "c",
+    ".cpp": "cpp",
+    ".cc": "cpp",
+    ".cxx": "cpp",
+    ".hpp": "cpp",
+    ".hxx": "cpp",
+    # Go
+    ".go": "go",
+    # Rust
+    ".rs": "rust",
+    # PHP
+    ".php": "php",
+    ".php3": "php",
+    ".php4": "php",
+    ".php5": "php",
+    ".phtml": "php",
+    # Ruby
+    ".rb": "ruby",
+    ".rbw": "ruby",
+    # C#
+    ".cs": "csharp",
+    # Swift
+    ".swift": "swift",
+    # Objective-C
+    ".m": "objective-c",
+    ".mm": "objective-c",
+    # Dart
+    ".dart": "dart",
+    # Lua
+    ".lua": "lua",
+    # Shell
+    ".sh": "shell",
+    ".bash": "shell",
+    ".zsh": "shell",
+    ".fish": "shell",
+    # SQL
+    ".sql": "sql",
+    # R
+    ".r": "r",
+    ".R": "r",
+    # Perl
+    ".pl": "perl",
+    ".pm": "perl",
+    # Haskell
+    ".hs": "haskell",
+    # Erlang/Elixir
+    ".erl": "erlang",
+    ".ex": "elixir",
+    ".exs": "elixir",
+    # Clojure
+    ".clj": "clojure",
+    ".cljs": "clojure",
+    ".cljc": "clojure",
+    # F#
+    ".fs": "fsharp",
+    ".fsx": "fsharp",
+    # Visual Basic
+    ".vb": "vb",
+    # PowerShell
+    ".ps1": "powershell",
+    ".psm1": "powershell",
+}
+
+# Directories that never hold analyzable source
+_SKIP_DIRS = frozenset({"node_modules", "__pycache__", "build", "dist", "target"})
+
+# Language patterns, compiled once at import time
+_NEWLINE_RE = re.compile("\n")
+_WORD_RE = re.compile(r"\b\w+\b")
+
+# Common words dropped from query keywords
+_STOP_WORDS = frozenset(
+    {
+        "the",
+        "a",
+        "an",
+        "and",
+        "or",
+        "but",
+        "in",
+        "on",
+        "at",
+        "to",
+        "for",
+        "of",
+        "with",
+        "by",
+    }
+)
+
+# PHP
+_PHP_CLASS_RE = re.compile(
+    r"(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+(\w+))?(?:\s+implements\s+([\w,\s]+))?\s*\{",
+    re.MULTILINE,
+)
+_PHP_FUNC_RE = re.compile(
+    r"(?:public\s+|private\s+|protected\s+)?function\s+(\w+)\s*\([^)]*\)",
+    re.MULTILINE,
+)
+_PHP_IFACE_RE = re.compile(
+    r"interface\s+(\w+)(?:\s+extends\s+([\w,\s]+))?\s*\{",
+    re.MULTILINE,
+)
+_PHP_TRAIT_RE = re.compile(r"trait\s+(\w+)\s*\{", re.MULTILINE)
+_PHP_METHOD_RE = re.compile(
+    r"(?:public\s+|private\s+|protected\s+|static\s+)*function\s+(\w+)\s*\(",
+    re.MULTILINE,
+)
+_BRACE_RE = re.compile(r"[{}]")
+
+# JavaScript/TypeScript
+_JS_CLASS_RES = (
+    re.compile(
+        r"class\s+(\w+)(?:\s+extends\s+(\w+))?\s*\{", re.MULTILINE
+    ),  # ES6 classes
+    re.compile(
+        r"(\w+)\s*=\s*class(?:\s+extends\s+(\w+))?\s*\{", re.MULTILINE
+    ),  # Class expressions
+)
+_JS_FUNC_RES = (
+    re.compile(r"function\s+(\w+)\s*\(", re.MULTILINE),  # Function declarations
+    re.compile(r"(\w+)\s*:\s*function\s*\(", re.MULTILINE),  # Object method
+    re.compile(r"(\w+)\s*=\s*function\s*\(", re.MULTILINE),  # Function expressions
+    re.compile(r"(\w+)\s*=\s*\([^)]*\)\s*=>", re.MULTILINE),  # Arrow functions
+    re.compile(r"async\s+function\s+(\w+)\s*\(", re.MULTILINE),  # Async functions
+)
+_TS_IFACE_RE = re.compile(
+    r"interface\s+(\w+)(?:\s+extends\s+([\w,\s]+))?\s*\{",
+    re.MULTILINE,
+)
+
+# Java/Kotlin/Scala
+_JAVA_CLASS_RES = (
+    re.compile(
+        r"(?:public\s+|private\s+|protected\s+)?(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+(\w+))?(?:\s+implements\s+([\w,\s]+))?\s*\{",
+        re.MULTILINE,
+    ),
+    re.compile(
+        r"(?:public\s+|private\s+|protected\s+)?interface\s+(\w+)(?:\s+extends\s+([\w,\s]+))?\s*\{",
+        re.MULTILINE,
+    ),
+    re.compile(
+        r"(?:public\s+|private\s+|protected\s+)?enum\s+(\w+)\s*\{", re.MULTILINE
+    ),
+)
+_JAVA_METHOD_RE = re.compile(
+    r"(?:public\s+|private\s+|protected\s+|static\s+)*(?:\w+\s+)*(\w+)\s*\([^)]*\)\s*\{",
+    re.MULTILINE,
+)
+
+# C/C++
+_C_FUNC_RE = re.compile(
+    r"(?:static\s+|inline\s+|extern\s+)*(?:\w+\s+\*?\s*)+(\w+)\s*\([^)]*\)\s*\{",
+    re.MULTILINE,
+)
+_CPP_CLASS_RE = re.compile(
+    r"(?:class|struct)\s+(\w+)(?:\s*:\s*(?:public|private|protected)\s+(\w+))?\s*\{",
+    re.MULTILINE,
+)
+_C_STRUCT_RE = re.compile(
+    r"typedef\s+struct\s+(?:\w+\s+)?\{[^}]*\}\s*(\w+);|struct\s+(\w+)\s*\{",
+    re.MULTILINE,
+)
+
+# Go
+_GO_FUNC_RE = re.compile(
+    r"func\s+(?:\([^)]*\)\s+)?(\w+)\s*\([^)]*\)(?:\s*\([^)]*\))?\s*\{",
+    re.MULTILINE,
+)
+_GO_STRUCT_RE = re.compile(r"type\s+(\w+)\s+struct\s*\{", re.MULTILINE)
+_GO_IFACE_RE = re.compile(r"type\s+(\w+)\s+interface\s*\{", re.MULTILINE)
+
+# Rust
+_RUST_FN_RE = re.compile(
+    r"(?:pub\s+)?(?:async\s+)?fn\s+(\w+)\s*\([^)]*\)(?:\s*->\s*[^{]+)?\s*\{",
+    re.MULTILINE,
+)
+_RUST_STRUCT_RE = re.compile(
+    r"(?:pub\s+)?struct\s+(\w+)(?:<[^>]*>)?\s*\{",
+    re.MULTILINE,
+)
+_RUST_ENUM_RE = re.compile(r"(?:pub\s+)?enum\s+(\w+)(?:<[^>]*>)?\s*\{", re.MULTILINE)
+_RUST_TRAIT_RE = re.compile(
+    r"(?:pub\s+)?trait\s+(\w+)(?:<[^>]*>)?\s*\{",
+    re.MULTILINE,
+)
+
+# Ruby
+_RUBY_CLASS_RE = re.compile(r"class\s+(\w+)(?:\s*<\s*(\w+))?\s*$", re.MULTILINE)
+_RUBY_MODULE_RE = re.compile(r"module\s+(\w+)\s*$", re.MULTILINE)
+_RUBY_METHOD_RE = re.compile(r"def\s+(\w+)(?:\([^)]*\))?\s*$", re.MULTILINE)
+
+# C#
+_CS_CLASS_RE = re.compile(
+    r"(?:public\s+|private\s+|protected\s+|internal\s+)?(?:abstract\s+|sealed\s+)?class\s+(\w+)(?:\s*:\s*([\w,\s]+))?\s*\{",
+    re.MULTILINE,
+)
+_CS_IFACE_RE = re.compile(
+    r"(?:public\s+|private\s+|protected\s+|internal\s+)?interface\s+(\w+)(?:\s*:\s*([\w,\s]+))?\s*\{",
+    re.MULTILINE,
+)
+_CS_METHOD_RE = re.compile(
+    r"(?:public\s+|private\s+|protected\s+|internal\s+)?(?:static\s+|virtual\s+|override\s+|abstract\s+)*(?:\w+\s+)+(\w+)\s*\([^)]*\)\s*\{",
+    re.MULTILINE,
+)
+# Statement keywords the method pattern also matches, e.g. "else if (x) {"
+_CS_KEYWORDS = frozenset({"if", "for", "while", "switch", "using", "return"})
+
+# Hyperscan prefilters, one per analyzer (None without hyperscan)
+_PHP_FILTER = _pattern_filter(_PHP_CLASS_RE, _PHP_FUNC_RE, _PHP_IFACE_RE, _PHP_TRAIT_RE)
+_JS_FILTER = _pattern_filter(*_JS_CLASS_RES, *_JS_FUNC_RES, _TS_IFACE_RE)
+_JAVA_FILTER = _pattern_filter(*_JAVA_CLASS_RES, _JAVA_METHOD_RE)
+_C_FILTER = _pattern_filter(_C_FUNC_RE, _CPP_CLASS_RE, _C_STRUCT_RE)
+_GO_FILTER = _pattern_filter(_GO_FUNC_RE, _GO_STRUCT_RE, _GO_IFACE_RE)
+_RUST_FILTER = _pattern_filter(
+    _RUST_FN_RE, _RUST_STRUCT_RE, _RUST_ENUM_RE, _RUST_TRAIT_RE
+)
+_RUBY_FILTER = _pattern_filter(_RUBY_CLASS_RE, _RUBY_MODULE_RE, _RUBY_METHOD_RE)
+_CS_FILTER = _pattern_filter(_CS_CLASS_RE, _CS_IFACE_RE, _CS_METHOD_RE)
+
+# Keywords of which every match of a pattern contains one
+_PATTERN_LITERALS: Dict[Pattern[str], Tuple[str, ...]] = {
+    _PHP_CLASS_RE: ("class",),
+    _PHP_FUNC_RE: ("function",),
+    _PHP_IFACE_RE: ("interface",),
+    _PHP_TRAIT_RE: ("trait",),
+    _JS_CLASS_RES[0]: ("class",),
+    _JS_CLASS_RES[1]: ("class",),
+    _JS_FUNC_RES[0]: ("function",),
+    _JS_FUNC_RES[1]: ("function",),
+    _JS_FUNC_RES[2]: ("function",),
+    _JS_FUNC_RES[3]: ("=>",),
+    _JS_FUNC_RES[4]: ("async",),
+    _TS_IFACE_RE: ("interface",),
+    _JAVA_CLASS_RES[0]: ("class",),
+    _JAVA_CLASS_RES[1]: ("interface",),
+    _JAVA_CLASS_RES[2]: ("enum",),
+    _CPP_CLASS_RE: ("class", "struct"),
+    _C_STRUCT_RE: ("struct",),
+    _GO_FUNC_RE: ("func",),
+    _GO_STRUCT_RE: ("struct",),
+    _GO_IFACE_RE: ("interface",),
+    _RUST_FN_RE: ("fn",),
+    _RUST_STRUCT_RE: ("struct",),
+    _RUST_ENUM_RE: ("enum",),
+    _RUST_TRAIT_RE: ("trait",),
+    _RUBY_CLASS_RE: ("class",),
+    _RUBY_MODULE_RE: ("module",),
+    _RUBY_METHOD_RE: ("def",),
+    _CS_CLASS_RE: ("class",),
+    _CS_IFACE_RE: ("interface",),
+}
+
+# Function/class/method patterns for languages without a dedicated analyzer
+_BASIC_PATTERNS = {
+    "function": [
+        re.compile(r"function\s+(\w+)\s*\(", re.MULTILINE),  # JavaScript
+        re.compile(r"def\s+(\w+)\s*\(", re.MULTILINE),  # Python, Ruby
+        re.compile(r"func\s+(?:\([^)]*\)\s+)?(\w+)\s*\(", re.MULTILINE),  # Go
+        re.compile(r"fn\s+(\w+)\s*\(", re.MULTILINE),  # Rust
+        re.compile(
+            r"(?:public\s+|private\s+|protected\s+)?function\s+(\w+)\s*\(", re.MULTILINE
+        ),  # PHP
+        re.compile(
+            r"(?:public\s+|private\s+|protected\s+|static\s+)*(?:\w+\s+)+(\w+)\s*\([^)]*\)\s*\{",
+            re.MULTILINE,
+        ),  # Java, C#, C++
+        re.compile(
+            r"(?:static\s+|inline\s+|extern\s+)*(?:\w+\s+\*?\s*)+(\w+)\s*\([^)]*\)\s*\{",
+            re.MULTILINE,
+        ),  # C/C++
+        re.compile(r"sub\s+(\w+)\s*\{", re.MULTILINE),  # Perl
+        re.compile(r"(\w+)\s*::\s*proc\s*\{", re.MULTILINE),  # Tcl
+    ],
+    "class": [
+        re.compile(
+            r"class\s+(\w+)", re.MULTILINE
+        ),  # Python, JavaScript, Java, C#, PHP, Ruby
+        re.compile(r"struct\s+(\w+)", re.MULTILINE),  # Go, Rust, C++, C
+        re.compile(r"interface\s+(\w+)", re.MULTILINE),  # Go, TypeScript, Java, C#
+        re.compile(r"trait\s+(\w+)", re.MULTILINE),  # Rust, PHP
+        re.compile(r"enum\s+(\w+)", re.MULTILINE),  # Java, C#, Rust, Swift
+        re.compile(r"module\s+(\w+)", re.MULTILINE),  # Ruby, Elixir
+        re.compile(r"namespace\s+(\w+)", re.MULTILINE),  # C#, C++
+        re.compile(r"package\s+(\w+)", re.MULTILINE),  # Java, Go
+        re.compile(r"type\s+(\w+)\s+(?:struct|interface)", re.MULTILINE),  # Go
+        re.compile(r"(?:abstract\s+)?class\s+(\w+)", re.MULTILINE),  # PHP, Java
+    ],
+    "method": [
+        re.compile(
+            r"(?:public\s+|private\s+|protected\s+)?(?:static\s+)?(?:function\s+)?(\w+)\s*\([^)]*\)\s*\{",
+            re.MULTILINE,
+        ),  # General
+        re.compile(
+            r"(\w+)\s*:\s*function\s*\(", re.MULTILINE
+        ),  # JavaScript object methods
+        re.compile(r"(\w+)\s*=\s*\([^)]*\)\s*=>", re.MULTILINE),  # Arrow functions
+    ],
+}
+
+_PATTERN_LITERALS.update(
+    {
+        _BASIC_PATTERNS["function"][0]: ("function",),
+        _BASIC_PATTERNS["function"][1]: ("def",),
+        _BASIC_PATTERNS["function"][2]: ("func",),
+        _BASIC_PATTERNS["function"][3]: ("fn",),
+        _BASIC_PATTERNS["function"][4]: ("function",),
+        _BASIC_PATTERNS["function"][7]: ("sub",),
+        _BASIC_PATTERNS["function"][8]: ("proc",),
+        _BASIC_PATTERNS["class"][0]: ("class",),
+        _BASIC_PATTERNS["class"][1]: ("struct",),
+        _BASIC_PATTERNS["class"][2]: ("interface",),
+        _BASIC_PATTERNS["class"][3]: ("trait",),
+        _BASIC_PATTERNS["class"][4]: ("enum",),
+        _BASIC_PATTERNS["class"][5]: ("module",),
+        _BASIC_PATTERNS["class"][6]: ("namespace",),
+        _BASIC_PATTERNS["class"][7]: ("package",),
+        _BASIC_PATTERNS["class"][8]: ("type",),
+        _BASIC_PATTERNS["class"][9]: ("class",),
+        _BASIC_PATTERNS["method"][1]: ("function",),
+        _BASIC_PATTERNS["method"][2]: ("=>",),
+    }
+)
+
+# Import statements
+_PY_IMPORT_RES = (re.compile(r"from\s+(\S+)\s+import"), re.compile(r"import\s+(\S+)"))
+_JS_IMPORT_RES = (
+    re.compile(r'import.*from\s+[\'"]([^\'"]+)[\'"]'),
+    re.compile(r'require\([\'"]([^\'"]+)[\'"]\)'),
+)
+
+
+def _list_directory(path: str) -> Tuple[List[os.DirEntry], List[os.DirEntry]]:
+    """
+    File and subdirectory entries of a directory, as os.walk would split
+    them; pruned and symlinked subdirectories are left out
+    """
+    file_entries, dir_entries = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    file_entries.append(entry)
+                elif not (
+                    entry.name.startswith(".")
+                    or entry.name in _SKIP_DIRS
+                    or entry.is_symlink()
+                ):
+                    dir_entries.append(entry)
+    except OSError:
+        # Unreadable directories are skipped, as by os.walk
+        return [], []
+    return file_entries, dir_entries
+
+
+class _EntityCache:
+    """
+    Persistent SQLite store of the entities of analyzed files, keyed by the
+    file's relative path and the SHA-256 of its bytes
+    """
+
+    def __init__(self, path: str):
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != _ENTITY_CACHE_VERSION:
+            # Entities from another analyzer version may be stale
+            with self.connection:
+                self.connection.execute("DROP TABLE IF EXISTS entities")
+                self.connection.execute(
+                    f"PRAGMA user_version = {_ENTITY_CACHE_VERSION}"
+                )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            "path TEXT, sha BLOB, entities TEXT, PRIMARY KEY (path, sha))"
+        )
+
+    @classmethod
+    def open(cls, path: str) -> Optional["_EntityCache"]:
+        """The cache at path, or None if it cannot be opened (e.g. locked)"""
+        try:
+            return cls(path)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Entity cache unavailable, parsing all files: {e}")
+            return None
+
+    def get(self, path: str, sha: bytes) -> Optional[List[CodeEntity]]:
+        """Cached entities of a file, or None"""
+        try:
+            row = self.connection.execute(
+                "SELECT entities FROM entities WHERE path = ? AND sha = ?", (path, sha)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"Entity cache lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        return [CodeEntity(**_intern_entity(entity)) for entity in json.loads(row[0])]
+
+    def put_many(self, rows: Iterable[Tuple[str, bytes, List[CodeEntity]]]):
+        """Store the entities of files, in one transaction"""
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO entities VALUES (?, ?, ?)",
+                    (
+                        (path, sha, json.dumps([e.model_dump() for e in entities]))
+                        for path, sha, entities in rows
+                    ),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Entity cache update failed: {e}")
+
+    def close(self):
+        self.connection.close()
+
+
+def _intern_entity(entity: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A decoded entity with its schema strings interned. Every json.loads
+    makes its own copies of them, which analysis shares through literals.
+    """
+    entity["type"] = sys.intern(entity["type"])
+    metadata = {}
+    for key, value in entity["metadata"].items():
+        if key in _INTERNED_METADATA_VALUES and type(value) is str:
+            value = sys.intern(value)
+        metadata[sys.intern(key)] = value
+    entity["metadata"] = metadata
+    return entity
+
+
+# Worker processes by pool size, kept for later analyses
+_PROCESS_POOLS: Dict[int, ProcessPoolExecutor] = {}
+
+
+def _process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    A process pool of max_workers workers, started on first use and then
+    reused, so that workers start and import the analyzer only once
+    """
+    pool = _PROCESS_POOLS.get(max_workers)
+    if pool is None:
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=_process_context()
+        )
+        _PROCESS_POOLS[max_workers] = pool
+    return pool
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    """
+    Start method for worker processes. Forking the threaded server could copy
+    locks held by other threads into the workers, so they are started from a
+    fork server, or spawned where that is unavailable.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _discard_process_pool(max_workers: int):
+    """Shut down a failed pool, so that the next analysis starts a new one"""
+    pool = _PROCESS_POOLS.pop(max_workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_process_pools():
+    """Stop all worker processes when the interpreter exits"""
+    while _PROCESS_POOLS:
+        _, pool = _PROCESS_POOLS.popitem()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _picklable(analyzer: Any) -> bool:
+    """Whether an analyzer can be sent to worker processes"""
+    try:
+        pickle.dumps(analyzer)
+    except Exception as e:  # subclasses may hold locks, devices or clients
+        logger.debug(f"Analyzing in-process, analyzer cannot be pickled: {e}")
+        return False
+    return True
+
+
+def _suffix(name: str) -> str:
+    """Lowercased extension of a file name, as Path(name).suffix.lower()"""
+    dot = name.rfind(".")
+    return name[dot:].lower() if 0 < dot < len(name) - 1 else ""
+
+
+def _decode_source(raw: bytes) -> str:
+    """Text of a source file's bytes, ignoring undecodable bytes"""
+    # One bulk decode is cheaper than reading through a text wrapper
+    content = raw.decode("utf-8", errors="ignore")
+    # Universal newlines, as text mode reads them
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
+
+
+def _read_source(file_path: str) -> str:
+    """Text of a source file, ignoring undecodable bytes"""
+    with open(file_path, "rb") as f:
+        return _decode_source(f.read())
+
+
+def _read_source_digest(file_path: str) -> Tuple[str, bytes]:
+    """Text of a source file and the SHA-256 of its bytes, from one read"""
+    with open(file_path, "rb") as f:
+        raw = f.read()
+    return _decode_source(raw), hashlib.sha256(raw).digest()
+
+
+def _read_text_file(file_path: str, max_size: int) -> Optional[str]:
+    """
+    Text of a source file, or None if it is larger than max_size bytes or
+    looks binary (a NUL byte near its start)
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > max_size:
+            return None
+        raw = f.read()
+    if b"\0" in raw[:_BINARY_SNIFF_SIZE]:
+        return None
+    return _decode_source(raw)
+
+
+def _texts_containing(texts: List[str], keywords: List[str]) -> List[bool]:
+    """Per lowercase text, whether it contains any of ``keywords``"""
+    hits = [False] * len(texts)
+    for keyword in keywords:
+        hits = [hit or keyword in text for hit, text in zip(hits, texts)]
+    return hits
+
+
+def _iter_definitions(
+    tree: ast.AST, statements: FrozenSet[type] = frozenset()
+) -> Iterator[ast.stmt]:
+    """
+    ClassDef and FunctionDef nodes of a tree, and any other statements of
+    the given types, in ast.walk order, visiting only the statements that
+    can contain them instead of every node
+    """
+    queue = deque([tree])
+    while queue:
+        for child in ast.iter_child_nodes(queue.popleft()):
+            node_type = type(child)
+            if node_type is ast.ClassDef or node_type is ast.FunctionDef:
+                yield child
+                queue.append(child)
+            elif node_type in _AST_STATEMENT_CONTAINERS:
+                queue.append(child)
+            elif node_type in statements:
+                yield child
+
+
+def _line_index(content: str) -> List[int]:
+    """Offsets of every newline in content, in ascending order"""
+    return [match.start() for match in _NEWLINE_RE.finditer(content)]
+
+
+def _line_of(offset: int, newlines: List[int]) -> int:
+    """1-based line number of a character offset"""
+    return bisect_left(newlines, offset) + 1
 
 
 class CGMAnalyzer:
@@ -30,57 +927,16 @@ class CGMAnalyzer:
     graph building, and context extraction without requiring LLM calls.
     """
 
-    def __init__(self):
-        self.supported_extensions = {
-            # Python
-            ".py", ".pyx", ".pyi",
-            # JavaScript/TypeScript
-            ".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs",
-            # Java/Kotlin/Scala
-            ".java", ".kt", ".scala",
-            # C/C++
-            ".c", ".cpp", ".cc", ".cxx", ".h", ".hpp", ".hxx",
-            # Go
-            ".go",
-            # Rust
-            ".rs",
-            # PHP
-            ".php", ".php3", ".php4", ".php5", ".phtml",
-            # Ruby
-            ".rb", ".rbw",
-            # C#
-            ".cs",
-            # Swift
-            ".swift",
-            # Objective-C
-            ".m", ".mm",
-            # Dart
-            ".dart",
-            # Lua
-            ".lua",
-            # Shell
-            ".sh", ".bash", ".zsh", ".fish",
-            # SQL
-            ".sql",
-            # R
-            ".r", ".R",
-            # MATLAB
-            ".m",
-            # Perl
-            ".pl", ".pm",
-            # Haskell
-            ".hs",
-            # Erlang/Elixir
-            ".erl", ".ex", ".exs",
-            # Clojure
-            ".clj", ".cljs", ".cljc",
-            # F#
-            ".fs", ".fsx",
-            # Visual Basic
-            ".vb",
-            # PowerShell
-            ".ps1", ".psm1",
-        }
+    def __init__(self, cache_path: Optional[str] = None):
+        # SQLite file caching per-file entities across runs (None disables)
+        self.cache_path = cache_path
+        self.supported_extensions = _SUPPORTED_EXTENSIONS
+        # Worker processes for file analysis; 1 analyzes in-process
+        self.max_workers = os.cpu_count() or 1
+        # Threads overlapping directory listings
+        self.io_workers = 8
+        # Larger files are left out of detailed file analyses
+        self.max_file_size = 1024 * 1024
 
     async def analyze_repository(
         self, request: CodeAnalysisRequest
@@ -132,55 +988,212 @@ class CGMAnalyzer:
 
     async def _build_code_graph(self, repo_path: str) -> CodeGraph:
         """Build comprehensive code graph from repository"""
-        graph = nx.DiGraph()
+        graph = GraphArrays()
         files = []
         entities = []
 
-        for root, dirs, file_names in os.walk(repo_path):
-            # Skip common non-source directories
-            dirs[:] = [
-                d
-                for d in dirs
-                if not d.startswith(".")
-                and d not in {"node_modules", "__pycache__", "build", "dist", "target"}
-            ]
+        # Collect the files first, so that they can be analyzed in parallel
+        paths = [
+            (entry.path, relative_path)
+            for entry, relative_path in self._iter_source_files(repo_path)
+            if self._should_analyze_file(entry)
+        ]
 
-            for file_name in file_names:
-                file_path = os.path.join(root, file_name)
-                relative_path = os.path.relpath(file_path, repo_path)
+        for (_, relative_path), file_entities in zip(
+            paths, await self._analyze_file_structures(paths)
+        ):
+            files.append(relative_path)
+            entities.extend(file_entities)
 
-                if self._should_analyze_file(file_path):
-                    file_entities = await self._analyze_file_structure(
-                        file_path, relative_path
-                    )
-                    files.append(relative_path)
-                    entities.extend(file_entities)
-
-                    # Add to graph
-                    self._add_file_to_graph(graph, relative_path, file_entities)
+            # Add to graph
+            self._add_file_to_graph(graph, relative_path, file_entities)
 
         return CodeGraph(
             files=files, entities=entities, graph_data=self._serialize_graph(graph)
         )
 
-    def _should_analyze_file(self, file_path: str) -> bool:
-        """Check if file should be analyzed"""
-        ext = Path(file_path).suffix.lower()
-        return (
-            ext in self.supported_extensions
-            and os.path.getsize(file_path) < 1024 * 1024
-        )  # 1MB limit
+    def _iter_source_files(self, repo_path: str) -> List[Tuple[os.DirEntry, str]]:
+        """
+        (DirEntry, relative_path) of every file under repo_path, in os.walk
+        order, skipping hidden and common non-source directories
+        """
+        # List the directories a level at a time, overlapping the listings of
+        # a level on io_workers threads (slow on network filesystems)
+        listings = {}
+        level = [repo_path]
+        with ThreadPoolExecutor(max_workers=self.io_workers) as pool:
+            while level:
+                listings.update(zip(level, pool.map(_list_directory, level)))
+                level = [entry.path for path in level for entry in listings[path][1]]
+
+        # Then walk them depth-first, as os.walk does
+        paths = []
+        stack = [(repo_path, "")]
+        while stack:
+            path, prefix = stack.pop()
+            file_entries, dir_entries = listings[path]
+            paths.extend((entry, prefix + entry.name) for entry in file_entries)
+            stack.extend(
+                (entry.path, prefix + entry.name + os.sep)
+                for entry in reversed(dir_entries)
+            )
+        return paths
+
+    def _should_analyze_file(self, file: Union[str, os.DirEntry]) -> bool:
+        """Check if file (a path, or a DirEntry of the walk) should be analyzed"""
+        if isinstance(file, os.DirEntry):
+            # The walk's entries carry the name, and cache the stat
+            if _suffix(file.name) not in self.supported_extensions:
+                return False
+            size = file.stat().st_size
+        else:
+            if _suffix(os.path.basename(file)) not in self.supported_extensions:
+                return False
+            size = os.path.getsize(file)
+        return size < 1024 * 1024  # 1MB limit
+
+    async def _analyze_file_structures(
+        self, paths: List[Tuple[str, str]]
+    ) -> List[List[CodeEntity]]:
+        """Entities of (file_path, relative_path) pairs, reusing cached ones"""
+        cache = _EntityCache.open(self.cache_path) if self.cache_path else None
+        if cache is None:
+            return await self._parse_file_structures(paths)
+
+        with closing(cache):
+            results: List[Optional[List[CodeEntity]]] = [None] * len(paths)
+            digests: List[Optional[bytes]] = [None] * len(paths)
+            # Misses awaiting a parse, with the text already read to hash them
+            pending: List[Tuple[int, str]] = []
+            misses = 0
+
+            async def parse_pending():
+                parsed = await self._parse_file_structures(
+                    [paths[index] for index, _ in pending],
+                    [content for _, content in pending],
+                )
+                for (index, _), entities in zip(pending, parsed):
+                    results[index] = entities
+                cache.put_many(
+                    (paths[index][1], digests[index], results[index])
+                    for index, _ in pending
+                )
+                pending.clear()
+
+            for start in range(0, len(paths), _READ_BATCH_SIZE):
+                batch = range(start, min(start + _READ_BATCH_SIZE, len(paths)))
+                # Read and hash each file once, on threads
+                sources = await asyncio.gather(
+                    *(
+                        asyncio.to_thread(_read_source_digest, paths[i][0])
+                        for i in batch
+                    ),
+                    return_exceptions=True,
+                )
+                for index, source in zip(batch, sources):
+                    file_path, relative_path = paths[index]
+                    if isinstance(source, Exception):
+                        logger.warning(f"Failed to analyze file {file_path}: {source}")
+                        results[index] = []
+                        continue
+                    content, digests[index] = source
+                    results[index] = cache.get(relative_path, digests[index])
+                    if results[index] is None:
+                        pending.append((index, content))
+                        misses += 1
+
+                # Parse misses in batches large enough for worker processes,
+                # holding no more file text than that
+                if len(pending) >= _PARALLEL_MIN_FILES:
+                    await parse_pending()
+
+            if pending:
+                await parse_pending()
+            logger.debug(f"Entity cache: {len(paths) - misses} hits, {misses} misses")
+        return results
+
+    async def _parse_file_structures(
+        self, paths: List[Tuple[str, str]], contents: Optional[List[str]] = None
+    ) -> List[List[CodeEntity]]:
+        """
+        Analyze (file_path, relative_path) pairs, in worker processes if many.
+        Files are read unless their text is given in ``contents``.
+        """
+        if (
+            self.max_workers > 1
+            and len(paths) >= _PARALLEL_MIN_FILES
+            and _picklable(self)
+        ):
+            try:
+                pool = _process_pool(self.max_workers)
+                if contents is None:
+                    results = pool.map(
+                        self._analyze_file_structure_sync,
+                        *zip(*paths),
+                        chunksize=_PARALLEL_CHUNK_SIZE,
+                    )
+                else:
+                    results = pool.map(
+                        self._analyze_source,
+                        *zip(*paths),
+                        contents,
+                        chunksize=_PARALLEL_CHUNK_SIZE,
+                    )
+                # Wait for the workers off the event loop
+                return await asyncio.to_thread(list, results)
+            except (OSError, BrokenProcessPool) as e:
+                _discard_process_pool(self.max_workers)
+                logger.warning(f"Parallel file analysis failed, running serially: {e}")
+
+        if contents is not None:
+            return [
+                self._analyze_source(file_path, relative_path, content)
+                for (file_path, relative_path), content in zip(paths, contents)
+            ]
+
+        results = []
+        for start in range(0, len(paths), _READ_BATCH_SIZE):
+            batch = paths[start : start + _READ_BATCH_SIZE]
+            # Overlap the reads of a batch on threads, then analyze it
+            contents = await asyncio.gather(
+                *(asyncio.to_thread(_read_source, file_path) for file_path, _ in batch),
+                return_exceptions=True,
+            )
+            for (file_path, relative_path), content in zip(batch, contents):
+                if isinstance(content, Exception):
+                    logger.warning(f"Failed to analyze file {file_path}: {content}")
+                    results.append([])
+                else:
+                    results.append(
+                        self._analyze_source(file_path, relative_path, content)
+                    )
+        return results
 
     async def _analyze_file_structure(
         self, file_path: str, relative_path: str
     ) -> List[CodeEntity]:
         """Analyze file structure and extract entities"""
-        entities = []
+        return self._analyze_file_structure_sync(file_path, relative_path)
 
+    def _analyze_file_structure_sync(
+        self, file_path: str, relative_path: str
+    ) -> List[CodeEntity]:
+        """Analyze file structure and extract entities (picklable for workers)"""
         try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read()
+            content = _read_source(file_path)
+        except Exception as e:
+            logger.warning(f"Failed to analyze file {file_path}: {e}")
+            return []
+
+        return self._analyze_source(file_path, relative_path, content)
+
+    def _analyze_source(
+        self, file_path: str, relative_path: str, content: str
+    ) -> List[CodeEntity]:
+        """Extract entities from the content of a file"""
+        entities = []
 
+        try:
             if file_path.endswith(".py"):
                 entities = self._analyze_python_file(content, relative_path)
             elif file_path.endswith((".php", ".php3", ".php4", ".php5", ".phtml")):
@@ -189,7 +1202,9 @@ class CGMAnalyzer:
                 entities = self._analyze_javascript_file(content, relative_path)
             elif file_path.endswith((".java", ".kt", ".scala")):
                 entities = self._analyze_java_like_file(content, relative_path)
-            elif file_path.endswith((".c", ".cpp", ".cc", ".cxx", ".h", ".hpp", ".hxx")):
+            elif file_path.endswith(
+                (".c", ".cpp", ".cc", ".cxx", ".h", ".hpp", ".hxx")
+            ):
                 entities = self._analyze_c_like_file(content, relative_path)
             elif file_path.endswith(".go"):
                 entities = self._analyze_go_file(content, relative_path)
@@ -227,10 +1242,10 @@ class CGMAnalyzer:
             )
 
             # Extract classes and functions
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
+            for node in _iter_definitions(tree):
+                if type(node) is ast.ClassDef:
                     entities.append(self._create_class_entity(node, file_path))
-                elif isinstance(node, ast.FunctionDef):
+                else:
                     entities.append(self._create_function_entity(node, file_path))
 
         except SyntaxError as e:
@@ -246,215 +1261,240 @@ class CGMAnalyzer:
 
         try:
             # Add file entity
-            entities.append(CodeEntity(
-                id=f"file:{file_path}",
-                type="file",
-                name=os.path.basename(file_path),
-                file_path=file_path,
-                content_preview=content[:500],
-                metadata={"language": "php", "size": len(content)}
-            ))
+            entities.append(
+                CodeEntity(
+                    id=f"file:{file_path}",
+                    type="file",
+                    name=os.path.basename(file_path),
+                    file_path=file_path,
+                    content_preview=content[:500],
+                    metadata={"language": "php", "size": len(content)},
+                )
+            )
+
+            # Newline offsets, for line numbers of matches
+            newlines = _line_index(content)
+            # Skip the patterns that match nowhere in this file
+            finditer = _finditer(content, _PHP_FILTER)
+
+            # Method declarations of the whole file, attributed to classes by position
+            method_starts = None
+            method_names = None
 
             # Extract PHP classes
-            class_pattern = r'(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+(\w+))?(?:\s+implements\s+([\w,\s]+))?\s*\{'
-            for match in re.finditer(class_pattern, content, re.MULTILINE):
+            for match in finditer(_PHP_CLASS_RE):
                 class_name = match.group(1)
                 extends = match.group(2)
                 implements = match.group(3)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                # Extract methods for this class
+                # Find the brace closing this class
                 class_start = match.start()
                 brace_count = 0
                 class_end = class_start
-                for i, char in enumerate(content[class_start:], class_start):
-                    if char == '{':
+                for brace in _BRACE_RE.finditer(content, class_start):
+                    if brace.group() == "{":
                         brace_count += 1
-                    elif char == '}':
+                    else:
                         brace_count -= 1
                         if brace_count == 0:
-                            class_end = i
+                            class_end = brace.start()
                             break
 
-                class_content = content[class_start:class_end]
-                methods = self._extract_php_methods(class_content)
+                # Methods declared between the class keyword and its closing brace
+                if method_starts is None:
+                    method_starts = []
+                    method_names = []
+                    for method in _PHP_METHOD_RE.finditer(content):
+                        method_starts.append(method.start())
+                        method_names.append(method.group(1))
+                methods = method_names[
+                    bisect_left(method_starts, class_start) : bisect_left(
+                        method_starts, class_end
+                    )
+                ]
 
-                entities.append(CodeEntity(
-                    id=f"class:{file_path}:{class_name}",
-                    type="class",
-                    name=class_name,
-                    file_path=file_path,
-                    content_preview=class_content[:200],
-                    metadata={
-                        "extends": extends,
-                        "implements": implements.split(',') if implements else [],
-                        "methods": methods,
-                        "line_start": line_num,
-                        "visibility": "public"
-                    }
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"class:{file_path}:{class_name}",
+                        type="class",
+                        name=class_name,
+                        file_path=file_path,
+                        content_preview=content[
+                            class_start : min(class_end, class_start + 200)
+                        ],
+                        metadata={
+                            "extends": extends,
+                            "implements": implements.split(",") if implements else [],
+                            "methods": methods,
+                            "line_start": line_num,
+                            "visibility": "public",
+                        },
+                    )
+                )
 
             # Extract PHP functions (not in classes)
-            function_pattern = r'(?:public\s+|private\s+|protected\s+)?function\s+(\w+)\s*\([^)]*\)'
-            for match in re.finditer(function_pattern, content, re.MULTILINE):
+            class_count = 0
+            class_end_count = 0
+            counted = 0
+            for match in finditer(_PHP_FUNC_RE):
                 function_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                # Skip if this function is inside a class
-                before_function = content[:match.start()]
-                class_count = before_function.count('class ')
-                class_end_count = before_function.count('}')
+                # Skip if this function is inside a class. The counts over
+                # content[:start] carry on from the previous function, also
+                # taking 'class ' occurrences that straddle its start
+                start = match.start()
+                class_count += content.count("class ", max(counted - 5, 0), start)
+                class_end_count += content.count("}", counted, start)
+                counted = start
 
                 if class_count <= class_end_count:  # Function is not inside a class
-                    entities.append(CodeEntity(
-                        id=f"function:{file_path}:{function_name}",
-                        type="function",
-                        name=function_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={
-                            "line_start": line_num,
-                            "visibility": self._extract_php_visibility(match.group(0))
-                        }
-                    ))
+                    entities.append(
+                        CodeEntity(
+                            id=f"function:{file_path}:{function_name}",
+                            type="function",
+                            name=function_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={
+                                "line_start": line_num,
+                                "visibility": self._extract_php_visibility(
+                                    match.group(0)
+                                ),
+                            },
+                        )
+                    )
 
             # Extract PHP interfaces
-            interface_pattern = r'interface\s+(\w+)(?:\s+extends\s+([\w,\s]+))?\s*\{'
-            for match in re.finditer(interface_pattern, content, re.MULTILINE):
+            for match in finditer(_PHP_IFACE_RE):
                 interface_name = match.group(1)
                 extends = match.group(2)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"interface:{file_path}:{interface_name}",
-                    type="interface",
-                    name=interface_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={
-                        "extends": extends.split(',') if extends else [],
-                        "line_start": line_num
-                    }
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"interface:{file_path}:{interface_name}",
+                        type="interface",
+                        name=interface_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={
+                            "extends": extends.split(",") if extends else [],
+                            "line_start": line_num,
+                        },
+                    )
+                )
 
             # Extract PHP traits
-            trait_pattern = r'trait\s+(\w+)\s*\{'
-            for match in re.finditer(trait_pattern, content, re.MULTILINE):
+            for match in finditer(_PHP_TRAIT_RE):
                 trait_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"trait:{file_path}:{trait_name}",
-                    type="trait",
-                    name=trait_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"trait:{file_path}:{trait_name}",
+                        type="trait",
+                        name=trait_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
         except Exception as e:
             logger.warning(f"Error analyzing PHP file {file_path}: {e}")
 
         return entities
 
-    def _extract_php_methods(self, class_content: str) -> List[str]:
-        """Extract method names from PHP class content"""
-        methods = []
-        method_pattern = r'(?:public\s+|private\s+|protected\s+|static\s+)*function\s+(\w+)\s*\('
-        for match in re.finditer(method_pattern, class_content, re.MULTILINE):
-            methods.append(match.group(1))
-        return methods
-
     def _extract_php_visibility(self, function_declaration: str) -> str:
         """Extract visibility from PHP function declaration"""
-        if 'private' in function_declaration:
-            return 'private'
-        elif 'protected' in function_declaration:
-            return 'protected'
+        if "private" in function_declaration:
+            return "private"
+        elif "protected" in function_declaration:
+            return "protected"
         else:
-            return 'public'
+            return "public"
 
-    def _analyze_javascript_file(self, content: str, file_path: str) -> List[CodeEntity]:
+    def _analyze_javascript_file(
+        self, content: str, file_path: str
+    ) -> List[CodeEntity]:
         """Analyze JavaScript/TypeScript file using regex patterns"""
         entities = []
 
         try:
             # Add file entity
-            entities.append(CodeEntity(
-                id=f"file:{file_path}",
-                type="file",
-                name=os.path.basename(file_path),
-                file_path=file_path,
-                content_preview=content[:500],
-                metadata={"language": "javascript", "size": len(content)}
-            ))
+            entities.append(
+                CodeEntity(
+                    id=f"file:{file_path}",
+                    type="file",
+                    name=os.path.basename(file_path),
+                    file_path=file_path,
+                    content_preview=content[:500],
+                    metadata={"language": "javascript", "size": len(content)},
+                )
+            )
 
-            # Extract classes
-            class_patterns = [
-                r'class\s+(\w+)(?:\s+extends\s+(\w+))?\s*\{',  # ES6 classes
-                r'(\w+)\s*=\s*class(?:\s+extends\s+(\w+))?\s*\{',  # Class expressions
-            ]
+            # Newline offsets, for line numbers of matches
+            newlines = _line_index(content)
+            # Skip the patterns that match nowhere in this file
+            finditer = _finditer(content, _JS_FILTER)
 
-            for pattern in class_patterns:
-                for match in re.finditer(pattern, content, re.MULTILINE):
+            # Extract classes
+            for pattern in _JS_CLASS_RES:
+                for match in finditer(pattern):
                     class_name = match.group(1)
                     extends = match.group(2) if len(match.groups()) > 1 else None
-                    line_num = content[:match.start()].count('\n') + 1
+                    line_num = _line_of(match.start(), newlines)
 
-                    entities.append(CodeEntity(
-                        id=f"class:{file_path}:{class_name}",
-                        type="class",
-                        name=class_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={
-                            "extends": extends,
-                            "line_start": line_num
-                        }
-                    ))
+                    entities.append(
+                        CodeEntity(
+                            id=f"class:{file_path}:{class_name}",
+                            type="class",
+                            name=class_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={"extends": extends, "line_start": line_num},
+                        )
+                    )
 
             # Extract functions
-            function_patterns = [
-                r'function\s+(\w+)\s*\(',  # Function declarations
-                r'(\w+)\s*:\s*function\s*\(',  # Object method
-                r'(\w+)\s*=\s*function\s*\(',  # Function expressions
-                r'(\w+)\s*=\s*\([^)]*\)\s*=>', # Arrow functions
-                r'async\s+function\s+(\w+)\s*\(',  # Async functions
-            ]
-
-            for pattern in function_patterns:
-                for match in re.finditer(pattern, content, re.MULTILINE):
+            for pattern in _JS_FUNC_RES:
+                for match in finditer(pattern):
                     function_name = match.group(1)
-                    line_num = content[:match.start()].count('\n') + 1
+                    line_num = _line_of(match.start(), newlines)
 
-                    entities.append(CodeEntity(
-                        id=f"function:{file_path}:{function_name}",
-                        type="function",
-                        name=function_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={"line_start": line_num}
-                    ))
+                    entities.append(
+                        CodeEntity(
+                            id=f"function:{file_path}:{function_name}",
+                            type="function",
+                            name=function_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={"line_start": line_num},
+                        )
+                    )
 
             # Extract TypeScript interfaces (if .ts file)
-            if file_path.endswith(('.ts', '.tsx')):
-                interface_pattern = r'interface\s+(\w+)(?:\s+extends\s+([\w,\s]+))?\s*\{'
-                for match in re.finditer(interface_pattern, content, re.MULTILINE):
+            if file_path.endswith((".ts", ".tsx")):
+                for match in finditer(_TS_IFACE_RE):
                     interface_name = match.group(1)
                     extends = match.group(2)
-                    line_num = content[:match.start()].count('\n') + 1
+                    line_num = _line_of(match.start(), newlines)
 
-                    entities.append(CodeEntity(
-                        id=f"interface:{file_path}:{interface_name}",
-                        type="interface",
-                        name=interface_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={
-                            "extends": extends.split(',') if extends else [],
-                            "line_start": line_num
-                        }
-                    ))
+                    entities.append(
+                        CodeEntity(
+                            id=f"interface:{file_path}:{interface_name}",
+                            type="interface",
+                            name=interface_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={
+                                "extends": extends.split(",") if extends else [],
+                                "line_start": line_num,
+                            },
+                        )
+                    )
 
         except Exception as e:
             logger.warning(f"Error analyzing JavaScript file {file_path}: {e}")
@@ -473,61 +1513,65 @@ class CGMAnalyzer:
             elif file_path.endswith(".scala"):
                 language = "scala"
 
-            entities.append(CodeEntity(
-                id=f"file:{file_path}",
-                type="file",
-                name=os.path.basename(file_path),
-                file_path=file_path,
-                content_preview=content[:500],
-                metadata={"language": language, "size": len(content)}
-            ))
+            entities.append(
+                CodeEntity(
+                    id=f"file:{file_path}",
+                    type="file",
+                    name=os.path.basename(file_path),
+                    file_path=file_path,
+                    content_preview=content[:500],
+                    metadata={"language": language, "size": len(content)},
+                )
+            )
 
-            # Extract classes
-            class_patterns = [
-                r'(?:public\s+|private\s+|protected\s+)?(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+(\w+))?(?:\s+implements\s+([\w,\s]+))?\s*\{',
-                r'(?:public\s+|private\s+|protected\s+)?interface\s+(\w+)(?:\s+extends\s+([\w,\s]+))?\s*\{',
-                r'(?:public\s+|private\s+|protected\s+)?enum\s+(\w+)\s*\{',
-            ]
+            # Newline offsets, for line numbers of matches
+            newlines = _line_index(content)
+            # Skip the patterns that match nowhere in this file
+            finditer = _finditer(content, _JAVA_FILTER)
 
-            for pattern in class_patterns:
-                for match in re.finditer(pattern, content, re.MULTILINE):
+            # Extract classes
+            for pattern in _JAVA_CLASS_RES:
+                for match in finditer(pattern):
                     class_name = match.group(1)
-                    line_num = content[:match.start()].count('\n') + 1
+                    line_num = _line_of(match.start(), newlines)
 
                     # Determine type
                     declaration = match.group(0)
-                    if 'interface' in declaration:
-                        entity_type = 'interface'
-                    elif 'enum' in declaration:
-                        entity_type = 'enum'
+                    if "interface" in declaration:
+                        entity_type = "interface"
+                    elif "enum" in declaration:
+                        entity_type = "enum"
                     else:
-                        entity_type = 'class'
+                        entity_type = "class"
 
-                    entities.append(CodeEntity(
-                        id=f"{entity_type}:{file_path}:{class_name}",
-                        type=entity_type,
-                        name=class_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={"line_start": line_num}
-                    ))
+                    entities.append(
+                        CodeEntity(
+                            id=f"{entity_type}:{file_path}:{class_name}",
+                            type=entity_type,
+                            name=class_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={"line_start": line_num},
+                        )
+                    )
 
             # Extract methods
-            method_pattern = r'(?:public\s+|private\s+|protected\s+|static\s+)*(?:\w+\s+)*(\w+)\s*\([^)]*\)\s*\{'
-            for match in re.finditer(method_pattern, content, re.MULTILINE):
-                method_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
-
-                # Skip constructors and common keywords
-                if method_name not in ['if', 'for', 'while', 'switch', 'try', 'catch']:
-                    entities.append(CodeEntity(
-                        id=f"method:{file_path}:{method_name}",
-                        type="method",
-                        name=method_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={"line_start": line_num}
-                    ))
+            for match in finditer(_JAVA_METHOD_RE):
+                method_name = match.group(1)
+                line_num = _line_of(match.start(), newlines)
+
+                # Skip constructors and common keywords
+                if method_name not in ["if", "for", "while", "switch", "try", "catch"]:
+                    entities.append(
+                        CodeEntity(
+                            id=f"method:{file_path}:{method_name}",
+                            type="method",
+                            name=method_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={"line_start": line_num},
+                        )
+                    )
 
         except Exception as e:
             logger.warning(f"Error analyzing Java-like file {file_path}: {e}")
@@ -540,67 +1584,74 @@ class CGMAnalyzer:
 
         try:
             # Add file entity
-            language = "c" if file_path.endswith(('.c', '.h')) else "cpp"
-            entities.append(CodeEntity(
-                id=f"file:{file_path}",
-                type="file",
-                name=os.path.basename(file_path),
-                file_path=file_path,
-                content_preview=content[:500],
-                metadata={"language": language, "size": len(content)}
-            ))
+            language = "c" if file_path.endswith((".c", ".h")) else "cpp"
+            entities.append(
+                CodeEntity(
+                    id=f"file:{file_path}",
+                    type="file",
+                    name=os.path.basename(file_path),
+                    file_path=file_path,
+                    content_preview=content[:500],
+                    metadata={"language": language, "size": len(content)},
+                )
+            )
+
+            # Newline offsets, for line numbers of matches
+            newlines = _line_index(content)
+            # Skip the patterns that match nowhere in this file
+            finditer = _finditer(content, _C_FILTER)
 
             # Extract functions
-            function_pattern = r'(?:static\s+|inline\s+|extern\s+)*(?:\w+\s+\*?\s*)+(\w+)\s*\([^)]*\)\s*\{'
-            for match in re.finditer(function_pattern, content, re.MULTILINE):
+            for match in finditer(_C_FUNC_RE):
                 function_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
                 # Skip common keywords
-                if function_name not in ['if', 'for', 'while', 'switch', 'return']:
-                    entities.append(CodeEntity(
-                        id=f"function:{file_path}:{function_name}",
-                        type="function",
-                        name=function_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={"line_start": line_num}
-                    ))
+                if function_name not in ["if", "for", "while", "switch", "return"]:
+                    entities.append(
+                        CodeEntity(
+                            id=f"function:{file_path}:{function_name}",
+                            type="function",
+                            name=function_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={"line_start": line_num},
+                        )
+                    )
 
             # Extract structs/classes (C++)
             if language == "cpp":
-                class_pattern = r'(?:class|struct)\s+(\w+)(?:\s*:\s*(?:public|private|protected)\s+(\w+))?\s*\{'
-                for match in re.finditer(class_pattern, content, re.MULTILINE):
+                for match in finditer(_CPP_CLASS_RE):
                     class_name = match.group(1)
                     base_class = match.group(2)
-                    line_num = content[:match.start()].count('\n') + 1
+                    line_num = _line_of(match.start(), newlines)
 
-                    entities.append(CodeEntity(
-                        id=f"class:{file_path}:{class_name}",
-                        type="class",
-                        name=class_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={
-                            "base_class": base_class,
-                            "line_start": line_num
-                        }
-                    ))
+                    entities.append(
+                        CodeEntity(
+                            id=f"class:{file_path}:{class_name}",
+                            type="class",
+                            name=class_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={"base_class": base_class, "line_start": line_num},
+                        )
+                    )
             else:
                 # C structs
-                struct_pattern = r'typedef\s+struct\s+(?:\w+\s+)?\{[^}]*\}\s*(\w+);|struct\s+(\w+)\s*\{'
-                for match in re.finditer(struct_pattern, content, re.MULTILINE):
+                for match in finditer(_C_STRUCT_RE):
                     struct_name = match.group(1) or match.group(2)
-                    line_num = content[:match.start()].count('\n') + 1
+                    line_num = _line_of(match.start(), newlines)
 
-                    entities.append(CodeEntity(
-                        id=f"struct:{file_path}:{struct_name}",
-                        type="struct",
-                        name=struct_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={"line_start": line_num}
-                    ))
+                    entities.append(
+                        CodeEntity(
+                            id=f"struct:{file_path}:{struct_name}",
+                            type="struct",
+                            name=struct_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={"line_start": line_num},
+                        )
+                    )
 
         except Exception as e:
             logger.warning(f"Error analyzing C/C++ file {file_path}: {e}")
@@ -613,59 +1664,69 @@ class CGMAnalyzer:
 
         try:
             # Add file entity
-            entities.append(CodeEntity(
-                id=f"file:{file_path}",
-                type="file",
-                name=os.path.basename(file_path),
-                file_path=file_path,
-                content_preview=content[:500],
-                metadata={"language": "go", "size": len(content)}
-            ))
+            entities.append(
+                CodeEntity(
+                    id=f"file:{file_path}",
+                    type="file",
+                    name=os.path.basename(file_path),
+                    file_path=file_path,
+                    content_preview=content[:500],
+                    metadata={"language": "go", "size": len(content)},
+                )
+            )
+
+            # Newline offsets, for line numbers of matches
+            newlines = _line_index(content)
+            # Skip the patterns that match nowhere in this file
+            finditer = _finditer(content, _GO_FILTER)
 
             # Extract functions
-            function_pattern = r'func\s+(?:\([^)]*\)\s+)?(\w+)\s*\([^)]*\)(?:\s*\([^)]*\))?\s*\{'
-            for match in re.finditer(function_pattern, content, re.MULTILINE):
+            for match in finditer(_GO_FUNC_RE):
                 function_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"function:{file_path}:{function_name}",
-                    type="function",
-                    name=function_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"function:{file_path}:{function_name}",
+                        type="function",
+                        name=function_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
             # Extract structs
-            struct_pattern = r'type\s+(\w+)\s+struct\s*\{'
-            for match in re.finditer(struct_pattern, content, re.MULTILINE):
+            for match in finditer(_GO_STRUCT_RE):
                 struct_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"struct:{file_path}:{struct_name}",
-                    type="struct",
-                    name=struct_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"struct:{file_path}:{struct_name}",
+                        type="struct",
+                        name=struct_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
             # Extract interfaces
-            interface_pattern = r'type\s+(\w+)\s+interface\s*\{'
-            for match in re.finditer(interface_pattern, content, re.MULTILINE):
+            for match in finditer(_GO_IFACE_RE):
                 interface_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"interface:{file_path}:{interface_name}",
-                    type="interface",
-                    name=interface_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"interface:{file_path}:{interface_name}",
+                        type="interface",
+                        name=interface_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
         except Exception as e:
             logger.warning(f"Error analyzing Go file {file_path}: {e}")
@@ -678,74 +1739,85 @@ class CGMAnalyzer:
 
         try:
             # Add file entity
-            entities.append(CodeEntity(
-                id=f"file:{file_path}",
-                type="file",
-                name=os.path.basename(file_path),
-                file_path=file_path,
-                content_preview=content[:500],
-                metadata={"language": "rust", "size": len(content)}
-            ))
+            entities.append(
+                CodeEntity(
+                    id=f"file:{file_path}",
+                    type="file",
+                    name=os.path.basename(file_path),
+                    file_path=file_path,
+                    content_preview=content[:500],
+                    metadata={"language": "rust", "size": len(content)},
+                )
+            )
+
+            # Newline offsets, for line numbers of matches
+            newlines = _line_index(content)
+            # Skip the patterns that match nowhere in this file
+            finditer = _finditer(content, _RUST_FILTER)
 
             # Extract functions
-            function_pattern = r'(?:pub\s+)?(?:async\s+)?fn\s+(\w+)\s*\([^)]*\)(?:\s*->\s*[^{]+)?\s*\{'
-            for match in re.finditer(function_pattern, content, re.MULTILINE):
+            for match in finditer(_RUST_FN_RE):
                 function_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"function:{file_path}:{function_name}",
-                    type="function",
-                    name=function_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"function:{file_path}:{function_name}",
+                        type="function",
+                        name=function_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
             # Extract structs
-            struct_pattern = r'(?:pub\s+)?struct\s+(\w+)(?:<[^>]*>)?\s*\{'
-            for match in re.finditer(struct_pattern, content, re.MULTILINE):
+            for match in finditer(_RUST_STRUCT_RE):
                 struct_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"struct:{file_path}:{struct_name}",
-                    type="struct",
-                    name=struct_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"struct:{file_path}:{struct_name}",
+                        type="struct",
+                        name=struct_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
             # Extract enums
-            enum_pattern = r'(?:pub\s+)?enum\s+(\w+)(?:<[^>]*>)?\s*\{'
-            for match in re.finditer(enum_pattern, content, re.MULTILINE):
+            for match in finditer(_RUST_ENUM_RE):
                 enum_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"enum:{file_path}:{enum_name}",
-                    type="enum",
-                    name=enum_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"enum:{file_path}:{enum_name}",
+                        type="enum",
+                        name=enum_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
             # Extract traits
-            trait_pattern = r'(?:pub\s+)?trait\s+(\w+)(?:<[^>]*>)?\s*\{'
-            for match in re.finditer(trait_pattern, content, re.MULTILINE):
+            for match in finditer(_RUST_TRAIT_RE):
                 trait_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"trait:{file_path}:{trait_name}",
-                    type="trait",
-                    name=trait_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"trait:{file_path}:{trait_name}",
+                        type="trait",
+                        name=trait_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
         except Exception as e:
             logger.warning(f"Error analyzing Rust file {file_path}: {e}")
@@ -758,63 +1830,70 @@ class CGMAnalyzer:
 
         try:
             # Add file entity
-            entities.append(CodeEntity(
-                id=f"file:{file_path}",
-                type="file",
-                name=os.path.basename(file_path),
-                file_path=file_path,
-                content_preview=content[:500],
-                metadata={"language": "ruby", "size": len(content)}
-            ))
+            entities.append(
+                CodeEntity(
+                    id=f"file:{file_path}",
+                    type="file",
+                    name=os.path.basename(file_path),
+                    file_path=file_path,
+                    content_preview=content[:500],
+                    metadata={"language": "ruby", "size": len(content)},
+                )
+            )
+
+            # Newline offsets, for line numbers of matches
+            newlines = _line_index(content)
+            # Skip the patterns that match nowhere in this file
+            finditer = _finditer(content, _RUBY_FILTER)
 
             # Extract classes
-            class_pattern = r'class\s+(\w+)(?:\s*<\s*(\w+))?\s*$'
-            for match in re.finditer(class_pattern, content, re.MULTILINE):
+            for match in finditer(_RUBY_CLASS_RE):
                 class_name = match.group(1)
                 superclass = match.group(2)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"class:{file_path}:{class_name}",
-                    type="class",
-                    name=class_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={
-                        "superclass": superclass,
-                        "line_start": line_num
-                    }
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"class:{file_path}:{class_name}",
+                        type="class",
+                        name=class_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"superclass": superclass, "line_start": line_num},
+                    )
+                )
 
             # Extract modules
-            module_pattern = r'module\s+(\w+)\s*$'
-            for match in re.finditer(module_pattern, content, re.MULTILINE):
+            for match in finditer(_RUBY_MODULE_RE):
                 module_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"module:{file_path}:{module_name}",
-                    type="module",
-                    name=module_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"module:{file_path}:{module_name}",
+                        type="module",
+                        name=module_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
             # Extract methods
-            method_pattern = r'def\s+(\w+)(?:\([^)]*\))?\s*$'
-            for match in re.finditer(method_pattern, content, re.MULTILINE):
+            for match in finditer(_RUBY_METHOD_RE):
                 method_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"method:{file_path}:{method_name}",
-                    type="method",
-                    name=method_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={"line_start": line_num}
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"method:{file_path}:{method_name}",
+                        type="method",
+                        name=method_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={"line_start": line_num},
+                    )
+                )
 
         except Exception as e:
             logger.warning(f"Error analyzing Ruby file {file_path}: {e}")
@@ -827,69 +1906,83 @@ class CGMAnalyzer:
 
         try:
             # Add file entity
-            entities.append(CodeEntity(
-                id=f"file:{file_path}",
-                type="file",
-                name=os.path.basename(file_path),
-                file_path=file_path,
-                content_preview=content[:500],
-                metadata={"language": "csharp", "size": len(content)}
-            ))
+            entities.append(
+                CodeEntity(
+                    id=f"file:{file_path}",
+                    type="file",
+                    name=os.path.basename(file_path),
+                    file_path=file_path,
+                    content_preview=content[:500],
+                    metadata={"language": "csharp", "size": len(content)},
+                )
+            )
+
+            # Newline offsets, for line numbers of matches
+            newlines = _line_index(content)
+            # Skip the patterns that match nowhere in this file
+            finditer = _finditer(content, _CS_FILTER)
 
             # Extract classes
-            class_pattern = r'(?:public\s+|private\s+|protected\s+|internal\s+)?(?:abstract\s+|sealed\s+)?class\s+(\w+)(?:\s*:\s*([\w,\s]+))?\s*\{'
-            for match in re.finditer(class_pattern, content, re.MULTILINE):
+            for match in finditer(_CS_CLASS_RE):
                 class_name = match.group(1)
                 inheritance = match.group(2)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"class:{file_path}:{class_name}",
-                    type="class",
-                    name=class_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={
-                        "inheritance": inheritance.split(',') if inheritance else [],
-                        "line_start": line_num
-                    }
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"class:{file_path}:{class_name}",
+                        type="class",
+                        name=class_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={
+                            "inheritance": (
+                                inheritance.split(",") if inheritance else []
+                            ),
+                            "line_start": line_num,
+                        },
+                    )
+                )
 
             # Extract interfaces
-            interface_pattern = r'(?:public\s+|private\s+|protected\s+|internal\s+)?interface\s+(\w+)(?:\s*:\s*([\w,\s]+))?\s*\{'
-            for match in re.finditer(interface_pattern, content, re.MULTILINE):
+            for match in finditer(_CS_IFACE_RE):
                 interface_name = match.group(1)
                 inheritance = match.group(2)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
-                entities.append(CodeEntity(
-                    id=f"interface:{file_path}:{interface_name}",
-                    type="interface",
-                    name=interface_name,
-                    file_path=file_path,
-                    content_preview="",
-                    metadata={
-                        "inheritance": inheritance.split(',') if inheritance else [],
-                        "line_start": line_num
-                    }
-                ))
+                entities.append(
+                    CodeEntity(
+                        id=f"interface:{file_path}:{interface_name}",
+                        type="interface",
+                        name=interface_name,
+                        file_path=file_path,
+                        content_preview="",
+                        metadata={
+                            "inheritance": (
+                                inheritance.split(",") if inheritance else []
+                            ),
+                            "line_start": line_num,
+                        },
+                    )
+                )
 
             # Extract methods
-            method_pattern = r'(?:public\s+|private\s+|protected\s+|internal\s+)?(?:static\s+|virtual\s+|override\s+|abstract\s+)*(?:\w+\s+)+(\w+)\s*\([^)]*\)\s*\{'
-            for match in re.finditer(method_pattern, content, re.MULTILINE):
+            for match in finditer(_CS_METHOD_RE):
                 method_name = match.group(1)
-                line_num = content[:match.start()].count('\n') + 1
+                line_num = _line_of(match.start(), newlines)
 
                 # Skip common keywords
-                if method_name not in ['if', 'for', 'while', 'switch', 'using', 'return']:
-                    entities.append(CodeEntity(
-                        id=f"method:{file_path}:{method_name}",
-                        type="method",
-                        name=method_name,
-                        file_path=file_path,
-                        content_preview="",
-                        metadata={"line_start": line_num}
-                    ))
+                if method_name not in _CS_KEYWORDS:
+                    entities.append(
+                        CodeEntity(
+                            id=f"method:{file_path}:{method_name}",
+                            type="method",
+                            name=method_name,
+                            file_path=file_path,
+                            content_preview="",
+                            metadata={"line_start": line_num},
+                        )
+                    )
 
         except Exception as e:
             logger.warning(f"Error analyzing C# file {file_path}: {e}")
@@ -968,45 +2061,22 @@ class CGMAnalyzer:
     def _extract_basic_patterns(self, content: str, file_path: str) -> List[CodeEntity]:
         """Extract basic code patterns using regex"""
         entities = []
+        # Overlapping patterns (class and abstract class, function and
+        # method) match the same definition; emit it once
+        seen = set()
 
-        # Function patterns for different languages
-        patterns = {
-            "function": [
-                r"function\s+(\w+)\s*\(",  # JavaScript
-                r"def\s+(\w+)\s*\(",  # Python, Ruby
-                r"func\s+(?:\([^)]*\)\s+)?(\w+)\s*\(",  # Go
-                r"fn\s+(\w+)\s*\(",  # Rust
-                r"(?:public\s+|private\s+|protected\s+)?function\s+(\w+)\s*\(",  # PHP
-                r"(?:public\s+|private\s+|protected\s+|static\s+)*(?:\w+\s+)+(\w+)\s*\([^)]*\)\s*\{",  # Java, C#, C++
-                r"(?:static\s+|inline\s+|extern\s+)*(?:\w+\s+\*?\s*)+(\w+)\s*\([^)]*\)\s*\{",  # C/C++
-                r"sub\s+(\w+)\s*\{",  # Perl
-                r"(\w+)\s*::\s*proc\s*\{",  # Tcl
-            ],
-            "class": [
-                r"class\s+(\w+)",  # Python, JavaScript, Java, C#, PHP, Ruby
-                r"struct\s+(\w+)",  # Go, Rust, C++, C
-                r"interface\s+(\w+)",  # Go, TypeScript, Java, C#
-                r"trait\s+(\w+)",  # Rust, PHP
-                r"enum\s+(\w+)",  # Java, C#, Rust, Swift
-                r"module\s+(\w+)",  # Ruby, Elixir
-                r"namespace\s+(\w+)",  # C#, C++
-                r"package\s+(\w+)",  # Java, Go
-                r"type\s+(\w+)\s+(?:struct|interface)",  # Go
-                r"(?:abstract\s+)?class\s+(\w+)",  # PHP, Java
-            ],
-            "method": [
-                r"(?:public\s+|private\s+|protected\s+)?(?:static\s+)?(?:function\s+)?(\w+)\s*\([^)]*\)\s*\{",  # General
-                r"(\w+)\s*:\s*function\s*\(",  # JavaScript object methods
-                r"(\w+)\s*=\s*\([^)]*\)\s*=>",  # Arrow functions
-            ]
-        }
-
-        for entity_type, pattern_list in patterns.items():
+        newlines = _line_index(content)
+        finditer = _finditer(content, None)
+        for entity_type, pattern_list in _BASIC_PATTERNS.items():
             for pattern in pattern_list:
-                matches = re.finditer(pattern, content, re.MULTILINE)
-                for match in matches:
+                for match in finditer(pattern):
                     name = match.group(1)
-                    line_num = content[: match.start()].count("\n") + 1
+                    line_num = _line_of(match.start(), newlines)
+
+                    key = (entity_type, name, line_num)
+                    if key in seen:
+                        continue
+                    seen.add(key)
 
                     entities.append(
                         CodeEntity(
@@ -1025,70 +2095,45 @@ class CGMAnalyzer:
         self, code_graph: CodeGraph, query: str, focus_files: Optional[List[str]] = None
     ) -> List[CodeEntity]:
         """Extract entities relevant to the query"""
-        relevant = []
-        query_lower = query.lower()
-
         # Extract keywords from query
         keywords = self._extract_keywords(query)
 
-        for entity in code_graph.entities:
-            relevance_score = 0
-
-            # File filtering
-            if focus_files and entity.file_path not in focus_files:
-                continue
-
-            # If we have focus_files, include all entities from those files
-            if focus_files and entity.file_path in focus_files:
-                relevance_score += 1  # Base score for being in focus files
-
-            # Name matching
-            if any(keyword in entity.name.lower() for keyword in keywords):
-                relevance_score += 3
+        # File filtering
+        entities = code_graph.entities
+        if focus_files:
+            entities = [
+                entity for entity in entities if entity.file_path in focus_files
+            ]
 
-            # Content matching
-            if entity.content_preview and any(
-                keyword in entity.content_preview.lower() for keyword in keywords
-            ):
-                relevance_score += 2
+        # If we have focus_files, include all entities from those files
+        scores = [1 if focus_files else 0] * len(entities)
 
-            # File path matching
-            if any(keyword in entity.file_path.lower() for keyword in keywords):
-                relevance_score += 1
+        if keywords:
+            # Name, content and file path matching, each field one scan
+            names = [entity.name.lower() for entity in entities]
+            previews = [(entity.content_preview or "").lower() for entity in entities]
+            paths = [entity.file_path.lower() for entity in entities]
+            for weight, texts in ((3, names), (2, previews), (1, paths)):
+                hits = _texts_containing(texts, keywords)
+                scores = [score + weight * hit for score, hit in zip(scores, hits)]
 
-            # Include entity if it has any relevance score or if no keywords were found
+        # Include entity if it has any relevance score or if no keywords were found
+        relevant = []
+        for entity, relevance_score in zip(entities, scores):
             if relevance_score > 0 or (not keywords and not focus_files):
                 entity.metadata["relevance_score"] = relevance_score
                 relevant.append(entity)
 
-        # Sort by relevance score
-        relevant.sort(key=lambda x: x.metadata.get("relevance_score", 0), reverse=True)
-
-        return relevant[:50]  # Limit to top 50 entities
+        # Top 50 by relevance score, ties in graph order
+        return heapq.nlargest(
+            50, relevant, key=lambda x: x.metadata.get("relevance_score", 0)
+        )
 
     def _extract_keywords(self, query: str) -> List[str]:
         """Extract keywords from query"""
-        # Remove common stop words
-        stop_words = {
-            "the",
-            "a",
-            "an",
-            "and",
-            "or",
-            "but",
-            "in",
-            "on",
-            "at",
-            "to",
-            "for",
-            "of",
-            "with",
-            "by",
-        }
-
         # Extract words
-        words = re.findall(r"\b\w+\b", query.lower())
-        keywords = [word for word in words if word not in stop_words and len(word) > 2]
+        words = _WORD_RE.findall(query.lower())
+        keywords = [word for word in words if word not in _STOP_WORDS and len(word) > 2]
 
         return keywords
 
@@ -1097,31 +2142,49 @@ class CGMAnalyzer:
     ) -> List[FileAnalysis]:
         """Analyze specific files in detail"""
         file_analyses = []
-        processed_files = set()
-
-        for entity in entities:
-            if len(file_analyses) >= max_files:
+        # Each file once, in entity order
+        remaining = iter(dict.fromkeys(entity.file_path for entity in entities))
+
+        while len(file_analyses) < max_files:
+            # The next files in entity order, as many as analyses are missing
+            batch = []
+            for relative_path in remaining:
+                file_path = os.path.join(repo_path, relative_path)
+                if os.path.exists(file_path):
+                    batch.append((file_path, relative_path))
+                    if len(file_analyses) + len(batch) >= max_files:
+                        break
+            if not batch:
                 break
 
-            if entity.file_path in processed_files:
-                continue
-
-            file_path = os.path.join(repo_path, entity.file_path)
-            if os.path.exists(file_path):
-                analysis = await self._analyze_single_file(file_path, entity.file_path)
-                if analysis:
-                    file_analyses.append(analysis)
-                    processed_files.add(entity.file_path)
+            # Read and analyze the batch's files concurrently
+            analyses = await asyncio.gather(
+                *(
+                    self._analyze_single_file(file_path, relative_path)
+                    for file_path, relative_path in batch
+                )
+            )
+            file_analyses.extend(analysis for analysis in analyses if analysis)
 
         return file_analyses
 
     async def _analyze_single_file(
         self, file_path: str, relative_path: str
+    ) -> Optional[FileAnalysis]:
+        """Analyze a single file in detail, on a worker thread"""
+        return await asyncio.to_thread(
+            self._analyze_single_file_sync, file_path, relative_path
+        )
+
+    def _analyze_single_file_sync(
+        self, file_path: str, relative_path: str
     ) -> Optional[FileAnalysis]:
         """Analyze a single file in detail"""
         try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read()
+            content = _read_text_file(file_path, self.max_file_size)
+            if content is None:
+                logger.debug(f"Skipping large or binary file {relative_path}")
+                return None
 
             # Extract structure
             structure = self._extract_file_structure(content, relative_path)
@@ -1152,7 +2215,7 @@ class CGMAnalyzer:
         if file_path.endswith(".py"):
             try:
                 tree = ast.parse(content)
-                for node in ast.walk(tree):
+                for node in _iter_definitions(tree, _AST_IMPORTS):
                     if isinstance(node, ast.ClassDef):
                         structure["classes"].append(
                             {
@@ -1186,22 +2249,17 @@ class CGMAnalyzer:
 
         # Python imports
         if file_path.endswith(".py"):
-            import_patterns = [r"from\s+(\S+)\s+import", r"import\s+(\S+)"]
-            for pattern in import_patterns:
-                matches = re.findall(pattern, content)
+            for pattern in _PY_IMPORT_RES:
+                matches = pattern.findall(content)
                 dependencies.extend(matches)
 
         # JavaScript/TypeScript imports
         elif file_path.endswith((".js", ".ts")):
-            import_patterns = [
-                r'import.*from\s+[\'"]([^\'"]+)[\'"]',
-                r'require\([\'"]([^\'"]+)[\'"]\)',
-            ]
-            for pattern in import_patterns:
-                matches = re.findall(pattern, content)
+            for pattern in _JS_IMPORT_RES:
+                matches = pattern.findall(content)
                 dependencies.extend(matches)
 
-        return list(set(dependencies))  # Remove duplicates
+        return list(dict.fromkeys(dependencies))  # Remove duplicates, keeping order
 
     def _extract_relations(
         self, code_graph: CodeGraph, entities: List[CodeEntity]
@@ -1248,7 +2306,7 @@ class CGMAnalyzer:
         # File types
         file_types = {}
         for file_path in code_graph.files:
-            ext = Path(file_path).suffix
+            ext = os.path.splitext(file_path)[1]
             file_types[ext] = file_types.get(ext, 0) + 1
 
         if file_types:
@@ -1295,77 +2353,33 @@ class CGMAnalyzer:
 
     def _detect_language(self, file_path: str) -> str:
         """Detect programming language from file extension"""
-        ext = Path(file_path).suffix.lower()
-        language_map = {
-            # Python
-            ".py": "python", ".pyx": "python", ".pyi": "python",
-            # JavaScript/TypeScript
-            ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
-            ".ts": "typescript", ".tsx": "typescript",
-            # Java/Kotlin/Scala
-            ".java": "java", ".kt": "kotlin", ".scala": "scala",
-            # C/C++
-            ".c": "c", ".h": "c",
-            ".cpp": "cpp", ".cc": "cpp", ".cxx": "cpp", ".hpp": "cpp", ".hxx": "cpp",
-            # Go
-            ".go": "go",
-            # Rust
-            ".rs": "rust",
-            # PHP
-            ".php": "php", ".php3": "php", ".php4": "php", ".php5": "php", ".phtml": "php",
-            # Ruby
-            ".rb": "ruby", ".rbw": "ruby",
-            # C#
-            ".cs": "csharp",
-            # Swift
-            ".swift": "swift",
-            # Objective-C
-            ".m": "objective-c", ".mm": "objective-c",
-            # Dart
-            ".dart": "dart",
-            # Lua
-            ".lua": "lua",
-            # Shell
-            ".sh": "shell", ".bash": "shell", ".zsh": "shell", ".fish": "shell",
-            # SQL
-            ".sql": "sql",
-            # R
-            ".r": "r", ".R": "r",
-            # Perl
-            ".pl": "perl", ".pm": "perl",
-            # Haskell
-            ".hs": "haskell",
-            # Erlang/Elixir
-            ".erl": "erlang", ".ex": "elixir", ".exs": "elixir",
-            # Clojure
-            ".clj": "clojure", ".cljs": "clojure", ".cljc": "clojure",
-            # F#
-            ".fs": "fsharp", ".fsx": "fsharp",
-            # Visual Basic
-            ".vb": "vb",
-            # PowerShell
-            ".ps1": "powershell", ".psm1": "powershell",
-        }
-        return language_map.get(ext, "unknown")
+        return _LANGUAGE_MAP.get(_suffix(os.path.basename(file_path)), "unknown")
 
     def _add_file_to_graph(
-        self, graph: nx.DiGraph, file_path: str, entities: List[CodeEntity]
+        self, graph: GraphArrays, file_path: str, entities: List[CodeEntity]
     ):
         """Add file and its entities to the graph"""
         file_node = f"file:{file_path}"
         graph.add_node(file_node, type="file", name=os.path.basename(file_path))
 
-        for entity in entities:
-            if entity.id != file_node:  # Don't add file to itself
-                graph.add_node(entity.id, **entity.metadata)
-                graph.add_edge(file_node, entity.id, type="contains")
+        # Don't add file to itself
+        contained = [entity for entity in entities if entity.id != file_node]
+        graph.add_nodes_from((entity.id, entity.metadata) for entity in contained)
+        contains = {"type": "contains"}
+        graph.add_edges_from((file_node, entity.id, contains) for entity in contained)
 
-    def _serialize_graph(self, graph: nx.DiGraph) -> Dict[str, Any]:
-        """Serialize NetworkX graph to dictionary"""
+    def _serialize_graph(self, graph: GraphArrays) -> Dict[str, Any]:
+        """Serialize graph arrays to dictionary, ids leading each record"""
+        node_ids = graph.node_ids
         return {
-            "nodes": [{"id": node, **data} for node, data in graph.nodes(data=True)],
+            "nodes": [
+                {"id": node_id, **attrs}
+                for node_id, attrs in zip(node_ids, graph.node_attrs)
+            ],
             "edges": [
-                {"source": u, "target": v, **data}
-                for u, v, data in graph.edges(data=True)
+                {"source": node_ids[src], "target": node_ids[dst], **attrs}
+                for src, dst, attrs in zip(
+                    graph.edge_src, graph.edge_dst, graph.edge_attrs
+                )
             ],
         }
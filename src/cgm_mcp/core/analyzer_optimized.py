@@ -4,14 +4,13 @@ Optimized CGM Analyzer with async I/O and enhanced caching
 
 import asyncio
 import os
-from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Union
 
-import aiofiles
 from loguru import logger
 
-from .analyzer import CGMAnalyzer
 from ..models import FileAnalysis
+from ..utils.graph_arrays import GraphArrays
+from .analyzer import _SKIP_DIRS, CGMAnalyzer, _read_text_file, _suffix
 
 
 class OptimizedCGMAnalyzer(CGMAnalyzer):
@@ -19,8 +18,8 @@ class OptimizedCGMAnalyzer(CGMAnalyzer):
     Enhanced CGM analyzer with async file I/O and performance optimizations
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, cache_path: Optional[str] = None):
+        super().__init__(cache_path)
         self.max_file_size = 2 * 1024 * 1024  # 2MB limit (increased from 1MB)
         self.max_concurrent_files = 10  # Limit concurrent file operations
 
@@ -30,17 +29,23 @@ class OptimizedCGMAnalyzer(CGMAnalyzer):
         """Async version of single file analysis"""
         try:
             # Check file size first
-            if not os.path.exists(file_path):
+            try:
+                file_size = os.stat(file_path).st_size
+            except FileNotFoundError:
                 return None
-                
-            file_size = os.path.getsize(file_path)
+
             if file_size > self.max_file_size:
-                logger.warning(f"Skipping large file {relative_path} ({file_size} bytes)")
+                logger.warning(
+                    f"Skipping large file {relative_path} ({file_size} bytes)"
+                )
                 return None
 
-            # Read file asynchronously
-            async with aiofiles.open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = await f.read()
+            # Read and decode the file in one go, off the event loop
+            content = await asyncio.to_thread(
+                _read_text_file, file_path, self.max_file_size
+            )
+            if content is None:
+                return None
 
             # Extract structure
             structure = self._extract_file_structure(content, relative_path)
@@ -70,34 +75,32 @@ class OptimizedCGMAnalyzer(CGMAnalyzer):
     ) -> List[FileAnalysis]:
         """Analyze files concurrently with semaphore to limit concurrent operations"""
         file_analyses = []
-        processed_files = set()
-        
+
+        # Each file once, in entity order
+        unique_files = list(dict.fromkeys(entity.file_path for entity in entities))[
+            :max_files
+        ]
+
         # Create semaphore to limit concurrent file operations
         semaphore = asyncio.Semaphore(self.max_concurrent_files)
-        
-        async def analyze_file_with_semaphore(entity):
+
+        async def analyze_file_with_semaphore(relative_path):
             async with semaphore:
-                if entity.file_path in processed_files:
-                    return None
-                    
-                file_path = os.path.join(repo_path, entity.file_path)
+                file_path = os.path.join(repo_path, relative_path)
                 if os.path.exists(file_path):
-                    analysis = await self._analyze_single_file_async(file_path, entity.file_path)
-                    if analysis:
-                        processed_files.add(entity.file_path)
-                        return analysis
+                    return await self._analyze_single_file_async(
+                        file_path, relative_path
+                    )
                 return None
 
         # Create tasks for concurrent execution
-        tasks = []
-        for entity in entities:
-            if len(tasks) >= max_files:
-                break
-            tasks.append(analyze_file_with_semaphore(entity))
+        tasks = [
+            analyze_file_with_semaphore(relative_path) for relative_path in unique_files
+        ]
 
         # Execute tasks concurrently
         results = await asyncio.gather(*tasks, return_exceptions=True)
-        
+
         # Filter out None results and exceptions
         for result in results:
             if isinstance(result, FileAnalysis):
@@ -109,17 +112,16 @@ class OptimizedCGMAnalyzer(CGMAnalyzer):
 
     async def _build_code_graph_async(self, repo_path: str):
         """Async version of code graph building with concurrent file processing"""
-        import networkx as nx
         from ..models import CodeGraph
-        
-        graph = nx.DiGraph()
+
+        graph = GraphArrays()
         files = []
         entities = []
 
         # Collect all files first
         file_tasks = []
         semaphore = asyncio.Semaphore(self.max_concurrent_files)
-        
+
         async def process_file_with_semaphore(file_path, relative_path):
             async with semaphore:
                 if self._should_analyze_file(file_path):
@@ -132,12 +134,7 @@ class OptimizedCGMAnalyzer(CGMAnalyzer):
         # Walk through directory and create tasks
         for root, dirs, file_names in os.walk(repo_path):
             # Skip common non-source directories
-            dirs[:] = [
-                d
-                for d in dirs
-                if not d.startswith(".")
-                and d not in {"node_modules", "__pycache__", "build", "dist", "target"}
-            ]
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d not in _SKIP_DIRS]
 
             for file_name in file_names:
                 file_path = os.path.join(root, file_name)
@@ -146,14 +143,14 @@ class OptimizedCGMAnalyzer(CGMAnalyzer):
 
         # Process files concurrently
         results = await asyncio.gather(*file_tasks, return_exceptions=True)
-        
+
         # Process results
         for result in results:
             if isinstance(result, tuple) and result[0] is not None:
                 relative_path, file_entities = result
                 files.append(relative_path)
                 entities.extend(file_entities)
-                
+
                 # Add to graph
                 self._add_file_to_graph(graph, relative_path, file_entities)
             elif isinstance(result, Exception):
@@ -175,8 +172,11 @@ class OptimizedCGMAnalyzer(CGMAnalyzer):
             if file_size > self.max_file_size:
                 return entities
 
-            async with aiofiles.open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = await f.read()
+            content = await asyncio.to_thread(
+                _read_text_file, file_path, self.max_file_size
+            )
+            if content is None:
+                return entities
 
             if file_path.endswith(".py"):
                 entities = self._analyze_python_file(content, relative_path)
@@ -188,11 +188,16 @@ class OptimizedCGMAnalyzer(CGMAnalyzer):
 
         return entities
 
-    def _should_analyze_file(self, file_path: str) -> bool:
+    def _should_analyze_file(self, file_path: Union[str, os.DirEntry]) -> bool:
         """Enhanced file filtering with size check"""
-        ext = Path(file_path).suffix.lower()
         try:
-            file_size = os.path.getsize(file_path)
+            if isinstance(file_path, os.DirEntry):
+                # The walk's entries carry the name, and cache the stat
+                ext = _suffix(file_path.name)
+                file_size = file_path.stat().st_size
+            else:
+                ext = _suffix(os.path.basename(file_path))
+                file_size = os.path.getsize(file_path)
             return (
                 ext in self.supported_extensions
                 and file_size < self.max_file_size
@@ -135,6 +135,9 @@ class RetrieverRequest(BaseModel):
     keywords: List[str] = Field(..., description="Keywords from rewriter")
     queries: Optional[List[str]] = Field(None, description="Queries from rewriter")
     repository_graph: Dict[str, Any] = Field(..., description="Repository code graph")
+    force_refresh: bool = Field(
+        False, description="Rebuild the cached graph and indices for this request"
+    )
 
 
 class RetrieverResponse(BaseModel):
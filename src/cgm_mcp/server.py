@@ -13,8 +13,8 @@ from typing import Any, Dict, List, Optional
 
 from loguru import logger
 from mcp.server import Server
-from mcp.server.models import InitializationOptions
 from mcp.server.lowlevel.server import NotificationOptions
+from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
 from mcp.types import (
     EmbeddedResource,
@@ -55,9 +55,16 @@ class CGMServer:
         self.llm_client = LLMClient(config.llm_config)
 
         # Initialize components
-        self.rewriter = RewriterComponent(self.llm_client)
+        self.rewriter = RewriterComponent(
+            self.llm_client,
+            structured_output=self.llm_client.supports_structured_output(),
+        )
         self.retriever = RetrieverComponent()
-        self.reranker = RerankerComponent(self.llm_client)
+        self.reranker = RerankerComponent(
+            self.llm_client,
+            structured_output=self.llm_client.supports_structured_output(),
+            batch_stage_2=self.llm_client.supports_structured_output(),
+        )
         self.reader = ReaderComponent(self.llm_client)
         self.graph_builder = GraphBuilder()
 
@@ -130,32 +137,45 @@ class CGMServer:
                                     "repository_name": {"type": "string"},
                                     "issue_description": {"type": "string"},
                                 },
-                                "required": ["task_type", "repository_name", "issue_description"],
+                                "required": [
+                                    "task_type",
+                                    "repository_name",
+                                    "issue_description",
+                                ],
+                            },
+                            "example_input": {
+                                "task_type": "issue_resolution",
+                                "repository_name": "myrepo",
+                                "issue_description": "Fix bug in X",
                             },
-                            "example_input": {"task_type": "issue_resolution", "repository_name": "myrepo", "issue_description": "Fix bug in X"},
-                            "example_call": "{\"name\": \"cgm_process_issue\", \"input\": {\"task_type\": \"issue_resolution\", \"repository_name\": \"myrepo\", \"issue_description\": \"Fix bug in X\"}}",
-                            "parse_instructions": "Return a JSON object with keys: task_id (string), status (string), summary (string)."
+                            "example_call": '{"name": "cgm_process_issue", "input": {"task_type": "issue_resolution", "repository_name": "myrepo", "issue_description": "Fix bug in X"}}',
+                            "parse_instructions": "Return a JSON object with keys: task_id (string), status (string), summary (string).",
                         },
                         {
                             "name": "cgm_get_task_status",
                             "description": "Get the status of a CGM task",
-                            "input_schema": {"type": "object", "properties": {"task_id": {"type": "string"}}, "required": ["task_id"]},
+                            "input_schema": {
+                                "type": "object",
+                                "properties": {"task_id": {"type": "string"}},
+                                "required": ["task_id"],
+                            },
                             "example_input": {"task_id": "<task-id>"},
-                            "example_call": "{\"name\": \"cgm_get_task_status\", \"input\": {\"task_id\": \"<task-id>\"}}",
-                            "parse_instructions": "Return a JSON object representing the task with its current status."
-                        }
+                            "example_call": '{"name": "cgm_get_task_status", "input": {"task_id": "<task-id>"}}',
+                            "parse_instructions": "Return a JSON object representing the task with its current status.",
+                        },
                     ],
                     "how_to_call": [
                         "Call list_resources() on the MCP server to discover cgm://agent_tooling.",
                         "Call read_resource('cgm://agent_tooling') to retrieve this JSON payload.",
                         "Find the tool by name and format a call matching the 'example_call' field.",
-                        "Send the call using the server's call_tool method and parse the result per parse_instructions."
+                        "Send the call using the server's call_tool method and parse the result per parse_instructions.",
                     ],
-                    "polling_guidance": "If a tool returns a task id for long-running work, poll the cgm://tasks resource for status updates."
+                    "polling_guidance": "If a tool returns a task id for long-running work, poll the cgm://tasks resource for status updates.",
                 }
                 return json.dumps(payload, indent=2)
             else:
                 raise ValueError(f"Unknown resource: {uri}")
+
         @self.server.list_tools()
         async def handle_list_tools() -> List[Tool]:
             """List available tools"""
@@ -165,8 +185,6 @@ class CGMServer:
                     description="Process a repository issue using CGM framework",
                     inputSchema={
                         "type": "object",
-
-            
                         "properties": {
                             "task_type": {
                                 "type": "string",
@@ -403,7 +421,9 @@ class CGMServer:
                     server_name="cgm-mcp",
                     server_version="0.1.0",
                     capabilities=self.server.get_capabilities(
-                        notification_options=NotificationOptions(resources_changed=True),
+                        notification_options=NotificationOptions(
+                            resources_changed=True
+                        ),
                         experimental_capabilities=None,
                     ),
                 ),
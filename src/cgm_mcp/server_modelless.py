@@ -6,21 +6,22 @@ It serves as a tool and context provider for external models.
 """
 
 import asyncio
-import json
-import uuid
 import hashlib
+import json
 import time
+import uuid
 from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+import numpy as np
 import psutil
-from cachetools import TTLCache, LRUCache
+from cachetools import LRUCache, TTLCache
 from loguru import logger
 from mcp.server import Server
+from mcp.server.lowlevel import NotificationOptions
 from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
-from mcp.server.lowlevel import NotificationOptions
 from mcp.types import (
     EmbeddedResource,
     ImageContent,
@@ -30,10 +31,17 @@ from mcp.types import (
 )
 from pydantic import ValidationError
 
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 from .core.analyzer import CGMAnalyzer
 from .core.analyzer_optimized import OptimizedCGMAnalyzer
-from .core.gpu_enhanced_analyzer import GPUEnhancedAnalyzer
 from .core.gpu_accelerator import GPUAcceleratorConfig
+from .core.gpu_enhanced_analyzer import GPUEnhancedAnalyzer
 from .models import (
     CodeAnalysisRequest,
     CodeAnalysisResponse,
@@ -44,6 +52,29 @@ from .models import (
 from .utils.config import Config
 
 
+def _json_default(value: Any) -> Any:
+    """Encode values JSON lacks: numpy scalars and arrays as numbers, others as str"""
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.item() if isinstance(value, np.generic) else value.tolist()
+    return str(value)
+
+
+def _to_json(data: Any) -> str:
+    """Indented JSON text of a tool result, using orjson when available"""
+    if ORJSON_AVAILABLE:
+        # Datetimes and dataclasses go through the default as with json.dumps
+        return orjson.dumps(
+            data,
+            default=_json_default,
+            option=orjson.OPT_INDENT_2
+            | orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_SERIALIZE_NUMPY
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS,
+        ).decode("utf-8")
+    return json.dumps(data, indent=2, default=_json_default)
+
+
 class ModellessCGMServer:
     """
     Model-agnostic CGM MCP Server that provides code analysis tools
@@ -56,30 +87,31 @@ class ModellessCGMServer:
 
         # Initialize analyzer with GPU support if available
         gpu_config = GPUAcceleratorConfig(
-            use_gpu=getattr(config, 'use_gpu', True),
-            batch_size=getattr(config, 'gpu_batch_size', 1024),
-            similarity_threshold=getattr(config, 'similarity_threshold', 0.1)
+            use_gpu=getattr(config, "use_gpu", True),
+            batch_size=getattr(config, "gpu_batch_size", 1024),
+            similarity_threshold=getattr(config, "similarity_threshold", 0.1),
         )
 
         try:
-            self.analyzer = GPUEnhancedAnalyzer(gpu_config)
+            self.analyzer = GPUEnhancedAnalyzer(
+                gpu_config, cache_path=config.graph_config.entity_cache_path
+            )
             logger.info("GPU-enhanced analyzer initialized")
         except Exception as e:
-            logger.warning(f"Failed to initialize GPU analyzer, falling back to optimized: {e}")
-            self.analyzer = OptimizedCGMAnalyzer()
+            logger.warning(
+                f"Failed to initialize GPU analyzer, falling back to optimized: {e}"
+            )
+            self.analyzer = OptimizedCGMAnalyzer(
+                cache_path=config.graph_config.entity_cache_path
+            )
 
         # Enhanced caching system
         self.analysis_cache = TTLCache(maxsize=100, ttl=3600)  # 1 hour TTL
         self.file_cache = LRUCache(maxsize=500)  # File-level cache
-        self.ast_cache = LRUCache(maxsize=200)   # AST parsing cache
+        self.ast_cache = LRUCache(maxsize=200)  # AST parsing cache
 
         # Performance monitoring
-        self.cache_stats = {
-            "hits": 0,
-            "misses": 0,
-            "file_hits": 0,
-            "file_misses": 0
-        }
+        self.cache_stats = {"hits": 0, "misses": 0, "file_hits": 0, "file_misses": 0}
 
         self._setup_handlers()
 
@@ -95,20 +127,24 @@ class ModellessCGMServer:
         return {
             "rss_mb": memory_info.rss / 1024 / 1024,
             "vms_mb": memory_info.vms / 1024 / 1024,
-            "percent": process.memory_percent()
+            "percent": process.memory_percent(),
         }
 
     def _cleanup_caches_if_needed(self):
         """Clean up caches if memory usage is too high"""
         memory_usage = self._get_memory_usage()
         if memory_usage["percent"] > 80:  # If using more than 80% memory
-            logger.warning(f"High memory usage ({memory_usage['percent']:.1f}%), clearing caches")
+            logger.warning(
+                f"High memory usage ({memory_usage['percent']:.1f}%), clearing caches"
+            )
             self.file_cache.clear()
             self.ast_cache.clear()
             # Keep analysis cache but reduce size
             if len(self.analysis_cache) > 50:
                 # Remove oldest entries
-                keys_to_remove = list(self.analysis_cache.keys())[:len(self.analysis_cache)//2]
+                keys_to_remove = list(self.analysis_cache.keys())[
+                    : len(self.analysis_cache) // 2
+                ]
                 for key in keys_to_remove:
                     self.analysis_cache.pop(key, None)
 
@@ -149,7 +185,6 @@ class ModellessCGMServer:
                     description="Machine-readable tool schemas and recommended usage for external LLM/agents",
                     mimeType="application/json",
                 ),
-
             ]
 
         @self.server.read_resource()
@@ -168,8 +203,10 @@ class ModellessCGMServer:
                     "analysis_cache": {
                         "size": len(self.analysis_cache),
                         "maxsize": self.analysis_cache.maxsize,
-                        "ttl": getattr(self.analysis_cache, 'ttl', None),
-                        "keys": list(self.analysis_cache.keys())[:10]  # Show first 10 keys
+                        "ttl": getattr(self.analysis_cache, "ttl", None),
+                        "keys": list(self.analysis_cache.keys())[
+                            :10
+                        ],  # Show first 10 keys
                     },
                     "file_cache": {
                         "size": len(self.file_cache),
@@ -179,7 +216,7 @@ class ModellessCGMServer:
                         "size": len(self.ast_cache),
                         "maxsize": self.ast_cache.maxsize,
                     },
-                    "stats": self.cache_stats
+                    "stats": self.cache_stats,
                 }
                 return json.dumps(cache_info, indent=2)
             elif uri == "cgm://performance":
@@ -187,26 +224,30 @@ class ModellessCGMServer:
                     "memory_usage": self._get_memory_usage(),
                     "cache_stats": self.cache_stats,
                     "cache_hit_rate": (
-                        self.cache_stats["hits"] /
-                        max(1, self.cache_stats["hits"] + self.cache_stats["misses"])
+                        self.cache_stats["hits"]
+                        / max(1, self.cache_stats["hits"] + self.cache_stats["misses"])
                     ),
                     "file_cache_hit_rate": (
-                        self.cache_stats["file_hits"] /
-                        max(1, self.cache_stats["file_hits"] + self.cache_stats["file_misses"])
+                        self.cache_stats["file_hits"]
+                        / max(
+                            1,
+                            self.cache_stats["file_hits"]
+                            + self.cache_stats["file_misses"],
+                        )
                     ),
                     "timestamp": datetime.now().isoformat(),
                 }
                 return json.dumps(perf_info, indent=2)
             elif uri == "cgm://gpu":
                 # GPU statistics (if available)
-                if hasattr(self.analyzer, 'get_gpu_stats'):
+                if hasattr(self.analyzer, "get_gpu_stats"):
                     gpu_info = self.analyzer.get_gpu_stats()
                     gpu_info["timestamp"] = datetime.now().isoformat()
                 else:
                     gpu_info = {
                         "gpu_available": False,
                         "message": "GPU acceleration not available",
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": datetime.now().isoformat(),
                     }
                 return json.dumps(gpu_info, indent=2)
             elif uri == "cgm://tool_instructions":
@@ -221,80 +262,86 @@ class ModellessCGMServer:
                                 "query": "string",
                                 "analysis_scope": "minimal|focused|full",
                                 "focus_files": "array[string]",
-                                "max_files": "int"
+                                "max_files": "int",
                             },
                             "description": "Analyze repository structure and extract context for external models. Use when you need code lists, file analysis, or context generation.",
                             "example_input": {
                                 "repository_path": "/workspace/my-repo",
                                 "query": "authentication",
                                 "analysis_scope": "focused",
-                                "max_files": 5
+                                "max_files": 5,
                             },
-                            "example_call": "call_tool(name=\"cgm_analyze_repository\", arguments=<example_input>)",
-                            "parse_instructions": "Response is TextContent.text (JSON). Parse first TextContent.text as JSON and use fields: analysis, summary, file_count."
+                            "example_call": 'call_tool(name="cgm_analyze_repository", arguments=<example_input>)',
+                            "parse_instructions": "Response is TextContent.text (JSON). Parse first TextContent.text as JSON and use fields: analysis, summary, file_count.",
                         },
                         {
                             "name": "cgm_get_file_content",
                             "input_schema": {
                                 "repository_path": "string",
-                                "file_paths": "array[string]"
+                                "file_paths": "array[string]",
                             },
                             "description": "Return file contents and lightweight analysis.",
                             "example_input": {
                                 "repository_path": "/workspace/my-repo",
-                                "file_paths": ["auth/models.py", "auth/views.py"]
+                                "file_paths": ["auth/models.py", "auth/views.py"],
                             },
-                            "example_call": "call_tool(name=\"cgm_get_file_content\", arguments=<example_input>)",
-                            "parse_instructions": "Response is TextContent.text (JSON). Parse files array and inspect file.content or file.structure for previews."
+                            "example_call": 'call_tool(name="cgm_get_file_content", arguments=<example_input>)',
+                            "parse_instructions": "Response is TextContent.text (JSON). Parse files array and inspect file.content or file.structure for previews.",
                         },
                         {
                             "name": "cgm_find_related_code",
                             "input_schema": {
                                 "repository_path": "string",
                                 "entity_name": "string",
-                                "relation_types": "array[string]"
+                                "relation_types": "array[string]",
                             },
                             "description": "Find code entities related to an entity.",
                             "example_input": {
                                 "repository_path": "/workspace/my-repo",
                                 "entity_name": "User.authenticate",
-                                "relation_types": ["calls", "imports"]
+                                "relation_types": ["calls", "imports"],
                             },
-                            "example_call": "call_tool(name=\"cgm_find_related_code\", arguments=<example_input>)",
-                            "parse_instructions": "Response is TextContent.text (JSON). Look for target_entity and related_entities arrays."
+                            "example_call": 'call_tool(name="cgm_find_related_code", arguments=<example_input>)',
+                            "parse_instructions": "Response is TextContent.text (JSON). Look for target_entity and related_entities arrays.",
                         },
                         {
                             "name": "cgm_extract_context",
                             "input_schema": {
                                 "repository_path": "string",
                                 "query": "string",
-                                "format": "structured|markdown|prompt"
+                                "format": "structured|markdown|prompt",
                             },
                             "description": "Extract structured context; prefer 'prompt' format for LLM consumption.",
                             "example_input": {
                                 "repository_path": "/workspace/my-repo",
                                 "query": "Describe authentication flow",
-                                "format": "prompt"
+                                "format": "prompt",
                             },
-                            "example_call": "call_tool(name=\"cgm_extract_context\", arguments=<example_input>)",
-                            "parse_instructions": "If format=\"prompt\" or \"markdown\" the TextContent.text is plain text ready for model input. If format=\"structured\" it is JSON."
+                            "example_call": 'call_tool(name="cgm_extract_context", arguments=<example_input>)',
+                            "parse_instructions": 'If format="prompt" or "markdown" the TextContent.text is plain text ready for model input. If format="structured" it is JSON.',
                         },
                         {
                             "name": "clear_gpu_cache",
                             "input_schema": {},
                             "description": "Clear GPU caches to free memory (no arguments).",
                             "example_input": {},
-                            "example_call": "call_tool(name=\"clear_gpu_cache\", arguments={})",
-                            "parse_instructions": "Response is JSON with before_stats and after_stats."
-                        }
+                            "example_call": 'call_tool(name="clear_gpu_cache", arguments={})',
+                            "parse_instructions": "Response is JSON with before_stats and after_stats.",
+                        },
+                    ],
+                    "resources": [
+                        "cgm://health",
+                        "cgm://cache",
+                        "cgm://performance",
+                        "cgm://gpu",
+                        "cgm://tool_instructions",
                     ],
-                    "resources": ["cgm://health", "cgm://cache", "cgm://performance", "cgm://gpu", "cgm://tool_instructions"],
                     "polling_guidance": {
                         "recommended_backoff_seconds": [1, 2, 4, 8],
                         "max_attempts": 10,
-                        "note": "If a call returns status=\"processing\", poll cgm_get_task_status with task_id following these intervals."
+                        "note": 'If a call returns status="processing", poll cgm_get_task_status with task_id following these intervals.',
                     },
-                    "how_to_call": "Use list_tools() or read_resource(\"cgm://tool_instructions\") to discover tool schemas. Use call_tool(name, arguments) to invoke. Parse first TextContent.text; prefer JSON unless tool documents plain-text formats."
+                    "how_to_call": 'Use list_tools() or read_resource("cgm://tool_instructions") to discover tool schemas. Use call_tool(name, arguments) to invoke. Parse first TextContent.text; prefer JSON unless tool documents plain-text formats.',
                 }
                 return json.dumps(instructions, indent=2)
             else:
@@ -419,27 +466,15 @@ class ModellessCGMServer:
             try:
                 if name == "cgm_analyze_repository":
                     result = await self._analyze_repository(arguments)
-                    return [
-                        TextContent(
-                            type="text", text=json.dumps(result, indent=2, default=str)
-                        )
-                    ]
+                    return [TextContent(type="text", text=_to_json(result))]
 
                 elif name == "cgm_get_file_content":
                     result = await self._get_file_content(arguments)
-                    return [
-                        TextContent(
-                            type="text", text=json.dumps(result, indent=2, default=str)
-                        )
-                    ]
+                    return [TextContent(type="text", text=_to_json(result))]
 
                 elif name == "cgm_find_related_code":
                     result = await self._find_related_code(arguments)
-                    return [
-                        TextContent(
-                            type="text", text=json.dumps(result, indent=2, default=str)
-                        )
-                    ]
+                    return [TextContent(type="text", text=_to_json(result))]
 
                 elif name == "cgm_extract_context":
                     result = await self._extract_context(arguments)
@@ -447,11 +482,7 @@ class ModellessCGMServer:
 
                 elif name == "clear_gpu_cache":
                     result = await self._clear_gpu_cache(arguments)
-                    return [
-                        TextContent(
-                            type="text", text=json.dumps(result, indent=2, default=str)
-                        )
-                    ]
+                    return [TextContent(type="text", text=_to_json(result))]
 
                 else:
                     raise ValueError(f"Unknown tool: {name}")
@@ -471,7 +502,7 @@ class ModellessCGMServer:
                 request.query,
                 request.analysis_scope,
                 str(sorted(request.focus_files or [])),
-                request.max_files
+                request.max_files,
             )
 
             # Check cache
@@ -480,7 +511,9 @@ class ModellessCGMServer:
                 self.cache_stats["hits"] += 1
                 response = self.analysis_cache[cache_key]
             else:
-                logger.info(f"Cache miss - analyzing repository: {request.repository_path}")
+                logger.info(
+                    f"Cache miss - analyzing repository: {request.repository_path}"
+                )
                 self.cache_stats["misses"] += 1
 
                 # Clean up caches if needed before heavy operation
@@ -532,8 +565,8 @@ class ModellessCGMServer:
                 "file_count": len(valid_analyses),
                 "cache_stats": {
                     "file_hits": self.cache_stats["file_hits"],
-                    "file_misses": self.cache_stats["file_misses"]
-                }
+                    "file_misses": self.cache_stats["file_misses"],
+                },
             }
 
         except Exception as e:
@@ -556,7 +589,9 @@ class ModellessCGMServer:
 
             # Cache miss - analyze file using optimized async method
             self.cache_stats["file_misses"] += 1
-            analysis = await self.analyzer._analyze_single_file_async(full_path, relative_path)
+            analysis = await self.analyzer._analyze_single_file_async(
+                full_path, relative_path
+            )
 
             if analysis:
                 self.file_cache[cache_key] = analysis
@@ -584,7 +619,9 @@ class ModellessCGMServer:
             else:
                 # Analyze the repository to get the graph
                 request = CodeAnalysisRequest(
-                    repository_path=repo_path, query=entity_name, analysis_scope="focused"
+                    repository_path=repo_path,
+                    query=entity_name,
+                    analysis_scope="focused",
                 )
                 self.cache_stats["misses"] += 1
                 response = await self.analyzer.analyze_repository(request)
@@ -595,8 +632,9 @@ class ModellessCGMServer:
             target_entity = None
 
             # Find the target entity
+            entity_name_lower = entity_name.lower()
             for entity in response.relevant_entities:
-                if entity_name.lower() in entity.name.lower():
+                if entity_name_lower in entity.name.lower():
                     target_entity = entity
                     break
 
@@ -668,7 +706,7 @@ class ModellessCGMServer:
             elif format_type == "prompt":
                 return self._format_as_prompt(response)
             else:  # structured
-                return json.dumps(response.dict(), indent=2, default=str)
+                return _to_json(response.dict())
 
         except Exception as e:
             logger.error(f"Error extracting context: {e}")
@@ -767,28 +805,36 @@ class ModellessCGMServer:
     async def _clear_gpu_cache(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Clear GPU caches to free memory"""
         try:
-            if hasattr(self.analyzer, 'clear_gpu_caches'):
+            if hasattr(self.analyzer, "clear_gpu_caches"):
                 # Get memory stats before clearing
-                before_stats = self.analyzer.get_gpu_stats() if hasattr(self.analyzer, 'get_gpu_stats') else {}
+                before_stats = (
+                    self.analyzer.get_gpu_stats()
+                    if hasattr(self.analyzer, "get_gpu_stats")
+                    else {}
+                )
 
                 # Clear GPU caches
                 self.analyzer.clear_gpu_caches()
 
                 # Get memory stats after clearing
-                after_stats = self.analyzer.get_gpu_stats() if hasattr(self.analyzer, 'get_gpu_stats') else {}
+                after_stats = (
+                    self.analyzer.get_gpu_stats()
+                    if hasattr(self.analyzer, "get_gpu_stats")
+                    else {}
+                )
 
                 return {
                     "status": "success",
                     "message": "GPU caches cleared successfully",
                     "before_stats": before_stats.get("memory", {}),
                     "after_stats": after_stats.get("memory", {}),
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": datetime.now().isoformat(),
                 }
             else:
                 return {
                     "status": "info",
                     "message": "GPU acceleration not available - no caches to clear",
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": datetime.now().isoformat(),
                 }
 
         except Exception as e:
@@ -796,7 +842,7 @@ class ModellessCGMServer:
             return {
                 "status": "error",
                 "error": str(e),
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now().isoformat(),
             }
 
     async def run(self):
@@ -3,9 +3,11 @@ Utility modules for CGM MCP Server
 """
 
 from .config import Config
+from .graph_arrays import GraphArrays
 from .llm_client import LLMClient
 
 __all__ = [
     "Config",
+    "GraphArrays",
     "LLMClient",
 ]
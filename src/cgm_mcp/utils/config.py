@@ -22,6 +22,7 @@ class LLMConfig:
     temperature: float = 0.1
     max_tokens: int = 4000
     timeout: int = 60
+    structured_output: bool = False  # Request JSON-schema constrained responses
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "LLMConfig":
@@ -36,6 +37,7 @@ class GraphConfig:
     max_edges: int = 50000
     cache_enabled: bool = True
     cache_ttl: int = 3600  # seconds
+    entity_cache_path: Optional[str] = None  # SQLite file of per-file entities
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "GraphConfig":
@@ -107,6 +109,11 @@ class Config:
                 "timeout": int(
                     os.getenv("CGM_LLM_TIMEOUT", llm_config_data.get("timeout", 60))
                 ),
+                "structured_output": os.getenv(
+                    "CGM_LLM_STRUCTURED_OUTPUT",
+                    str(llm_config_data.get("structured_output", False)),
+                ).lower()
+                == "true",
             }
         )
 
@@ -133,6 +140,11 @@ class Config:
                         "CGM_GRAPH_CACHE_TTL", graph_config_data.get("cache_ttl", 3600)
                     )
                 ),
+                "entity_cache_path": os.getenv(
+                    "CGM_GRAPH_ENTITY_CACHE",
+                    graph_config_data.get("entity_cache_path"),
+                )
+                or None,
             }
         )
 
@@ -178,12 +190,14 @@ class Config:
                 "temperature": self.llm_config.temperature,
                 "max_tokens": self.llm_config.max_tokens,
                 "timeout": self.llm_config.timeout,
+                "structured_output": self.llm_config.structured_output,
             },
             "graph": {
                 "max_nodes": self.graph_config.max_nodes,
                 "max_edges": self.graph_config.max_edges,
                 "cache_enabled": self.graph_config.cache_enabled,
                 "cache_ttl": self.graph_config.cache_ttl,
+                "entity_cache_path": self.graph_config.entity_cache_path,
             },
             "server": {
                 "host": self.server_config.host,
@@ -0,0 +1,147 @@
+"""
+Compact graph storage for CGM
+
+Append-only structure-of-arrays representation of a directed code graph.
+Used while building repository graphs, where the graph is only written to
+and then serialized, so NetworkX's dict-of-dicts adjacency is not needed.
+"""
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+import networkx as nx
+
+
+class GraphArrays:
+    """
+    Directed graph stored as parallel node and edge arrays
+
+    Nodes are addressed by string id and mapped to a dense integer index;
+    edges are stored as (source index, target index, attributes) triples.
+    Adding an existing node or edge merges its attributes, mirroring
+    ``nx.DiGraph.add_node`` / ``nx.DiGraph.add_edge``.
+    """
+
+    __slots__ = (
+        "node_ids",
+        "node_attrs",
+        "node_id_to_index",
+        "edge_src",
+        "edge_dst",
+        "edge_attrs",
+        "_edge_index",
+    )
+
+    def __init__(self):
+        self.node_ids: List[str] = []
+        self.node_attrs: List[Dict[str, Any]] = []
+        self.node_id_to_index: Dict[str, int] = {}
+        self.edge_src: List[int] = []
+        self.edge_dst: List[int] = []
+        self.edge_attrs: List[Dict[str, Any]] = []
+        self._edge_index: Dict[Tuple[int, int], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.node_id_to_index
+
+    def has_node(self, node_id: str) -> bool:
+        """Check if a node exists"""
+        return node_id in self.node_id_to_index
+
+    def number_of_nodes(self) -> int:
+        """Number of nodes in the graph"""
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        """Number of edges in the graph"""
+        return len(self.edge_src)
+
+    def add_node(self, node_id: str, **attrs: Any) -> int:
+        """Add a node (or update its attributes) and return its index"""
+        index = self.node_id_to_index.get(node_id)
+        if index is None:
+            index = len(self.node_ids)
+            self.node_id_to_index[node_id] = index
+            self.node_ids.append(node_id)
+            self.node_attrs.append(attrs)
+        elif attrs:
+            self.node_attrs[index].update(attrs)
+        return index
+
+    def add_edge(self, source: str, target: str, **attrs: Any) -> None:
+        """Add a directed edge, creating missing endpoints"""
+        src = self.add_node(source)
+        dst = self.add_node(target)
+
+        edge = self._edge_index.get((src, dst))
+        if edge is None:
+            self._edge_index[(src, dst)] = len(self.edge_src)
+            self.edge_src.append(src)
+            self.edge_dst.append(dst)
+            self.edge_attrs.append(attrs)
+        elif attrs:
+            self.edge_attrs[edge].update(attrs)
+
+    def add_nodes_from(self, nodes: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Add (id, attributes) pairs, as repeated ``add_node`` calls would"""
+        node_ids = self.node_ids
+        node_attrs = self.node_attrs
+        node_id_to_index = self.node_id_to_index
+        for node_id, attrs in nodes:
+            index = node_id_to_index.get(node_id)
+            if index is None:
+                node_id_to_index[node_id] = len(node_ids)
+                node_ids.append(node_id)
+                node_attrs.append(dict(attrs))
+            elif attrs:
+                node_attrs[index].update(attrs)
+
+    def add_edges_from(self, edges: Iterable[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """Add (source, target, attributes) triples, as repeated ``add_edge`` would"""
+        node_id_to_index = self.node_id_to_index
+        edge_index = self._edge_index
+        for source, target, attrs in edges:
+            src = node_id_to_index.get(source)
+            if src is None:
+                src = self.add_node(source)
+            dst = node_id_to_index.get(target)
+            if dst is None:
+                dst = self.add_node(target)
+
+            edge = edge_index.get((src, dst))
+            if edge is None:
+                edge_index[(src, dst)] = len(self.edge_src)
+                self.edge_src.append(src)
+                self.edge_dst.append(dst)
+                self.edge_attrs.append(dict(attrs))
+            elif attrs:
+                self.edge_attrs[edge].update(attrs)
+
+    def to_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Serialize nodes and edges in a single pass over the arrays"""
+        node_ids = self.node_ids
+        return {
+            "nodes": [
+                {**attrs, "id": node_id}
+                for node_id, attrs in zip(node_ids, self.node_attrs)
+            ],
+            "edges": [
+                {**attrs, "source": node_ids[src], "target": node_ids[dst]}
+                for src, dst, attrs in zip(
+                    self.edge_src, self.edge_dst, self.edge_attrs
+                )
+            ],
+        }
+
+    def to_networkx(self) -> nx.DiGraph:
+        """Build an equivalent NetworkX graph using bulk inserts"""
+        graph = nx.DiGraph()
+        graph.add_nodes_from(zip(self.node_ids, self.node_attrs))
+        node_ids = self.node_ids
+        graph.add_edges_from(
+            (node_ids[src], node_ids[dst], attrs)
+            for src, dst, attrs in zip(self.edge_src, self.edge_dst, self.edge_attrs)
+        )
+        return graph
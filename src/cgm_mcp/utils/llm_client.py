@@ -5,8 +5,9 @@ Supports multiple LLM providers (OpenAI, Anthropic, etc.)
 """
 
 import asyncio
+import json
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import httpx
 from loguru import logger
@@ -14,17 +15,51 @@ from loguru import logger
 from .config import LLMConfig
 
 
+def _chat_messages(prompt: str, system: Optional[str] = None) -> List[Dict[str, str]]:
+    """Chat messages with the static system prompt first, for prefix caching"""
+    messages = [{"role": "user", "content": prompt}]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    return messages
+
+
+async def _iter_chat_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    """Text deltas of an OpenAI-style server-sent chat completion stream"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        choices = json.loads(data).get("choices") or [{}]
+        content = choices[0].get("delta", {}).get("content")
+        if content:
+            yield content
+
+
 class BaseLLMClient(ABC):
     """Base class for LLM clients"""
 
+    # Whether generate() honours a ``response_format`` JSON schema kwarg
+    supports_response_format = False
+
     def __init__(self, config: LLMConfig):
         self.config = config
 
     @abstractmethod
     async def generate(self, prompt: str, **kwargs) -> str:
-        """Generate text from prompt"""
+        """
+        Generate text from prompt
+
+        A ``system`` kwarg carries static instructions separately from the
+        prompt, ahead of it, so providers can reuse a cached prefix.
+        """
         pass
 
+    async def stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream generated text; providers without streaming yield it whole"""
+        yield await self.generate(prompt, **kwargs)
+
     @abstractmethod
     async def health_check(self) -> bool:
         """Check if the LLM service is healthy"""
@@ -34,6 +69,8 @@ class BaseLLMClient(ABC):
 class OpenAIClient(BaseLLMClient):
     """OpenAI API client"""
 
+    supports_response_format = True
+
     def __init__(self, config: LLMConfig):
         super().__init__(config)
         self.base_url = config.api_base or "https://api.openai.com/v1"
@@ -42,21 +79,26 @@ class OpenAIClient(BaseLLMClient):
             "Content-Type": "application/json",
         }
 
+    def _payload(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Chat completion request body"""
+        payload = {
+            "model": self.config.model,
+            "messages": _chat_messages(prompt, kwargs.get("system")),
+            "temperature": kwargs.get("temperature", self.config.temperature),
+            "max_tokens": kwargs.get("max_tokens", self.config.max_tokens),
+        }
+        if kwargs.get("response_format"):
+            payload["response_format"] = kwargs["response_format"]
+        return payload
+
     async def generate(self, prompt: str, **kwargs) -> str:
         """Generate text using OpenAI API"""
         try:
             async with httpx.AsyncClient(timeout=self.config.timeout) as client:
-                payload = {
-                    "model": self.config.model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": kwargs.get("temperature", self.config.temperature),
-                    "max_tokens": kwargs.get("max_tokens", self.config.max_tokens),
-                }
-
                 response = await client.post(
                     f"{self.base_url}/chat/completions",
                     headers=self.headers,
-                    json=payload,
+                    json=self._payload(prompt, **kwargs),
                 )
                 response.raise_for_status()
 
@@ -67,6 +109,24 @@ class OpenAIClient(BaseLLMClient):
             logger.error(f"OpenAI API error: {e}")
             raise
 
+    async def stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream text using OpenAI API"""
+        try:
+            async with httpx.AsyncClient(timeout=self.config.timeout) as client:
+                async with client.stream(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    headers=self.headers,
+                    json={**self._payload(prompt, **kwargs), "stream": True},
+                ) as response:
+                    response.raise_for_status()
+                    async for content in _iter_chat_deltas(response):
+                        yield content
+
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            raise
+
     async def health_check(self) -> bool:
         """Check OpenAI API health"""
         try:
@@ -101,6 +161,15 @@ class AnthropicClient(BaseLLMClient):
                     "messages": [{"role": "user", "content": prompt}],
                     "temperature": kwargs.get("temperature", self.config.temperature),
                 }
+                if kwargs.get("system"):
+                    # Mark the static instructions as a cacheable prompt prefix
+                    payload["system"] = [
+                        {
+                            "type": "text",
+                            "text": kwargs["system"],
+                            "cache_control": {"type": "ephemeral"},
+                        }
+                    ]
 
                 response = await client.post(
                     f"{self.base_url}/v1/messages", headers=self.headers, json=payload
@@ -140,6 +209,9 @@ class MockLLMClient(BaseLLMClient):
         """Generate mock response"""
         await asyncio.sleep(0.1)  # Simulate API delay
 
+        if kwargs.get("system"):
+            prompt = f"{kwargs['system']}\n\n{prompt}"
+
         if "analysis" in prompt.lower() and "extraction" in prompt.lower():
             return """
 [start_of_analysis]
@@ -214,28 +286,37 @@ Fixed authentication bug by adding proper password validation checks.
 class OllamaClient(BaseLLMClient):
     """Ollama local model client"""
 
+    supports_response_format = True
+
     def __init__(self, config: LLMConfig):
         super().__init__(config)
         self.base_url = config.api_base or "http://localhost:11434"
 
+    def _payload(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Generate request body"""
+        payload = {
+            "model": self.config.model or "codellama:7b",
+            "prompt": prompt,
+            "stream": False,
+            "options": {
+                "temperature": kwargs.get("temperature", self.config.temperature),
+                "num_predict": kwargs.get("max_tokens", self.config.max_tokens),
+            },
+        }
+        if kwargs.get("system"):
+            payload["system"] = kwargs["system"]
+        if kwargs.get("response_format"):
+            # Ollama takes the bare JSON schema as its output format
+            payload["format"] = kwargs["response_format"]["json_schema"]["schema"]
+        return payload
+
     async def generate(self, prompt: str, **kwargs) -> str:
         """Generate text using Ollama API"""
         try:
             async with httpx.AsyncClient(timeout=self.config.timeout) as client:
-                payload = {
-                    "model": self.config.model or "codellama:7b",
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": kwargs.get(
-                            "temperature", self.config.temperature
-                        ),
-                        "num_predict": kwargs.get("max_tokens", self.config.max_tokens),
-                    },
-                }
-
                 response = await client.post(
-                    f"{self.base_url}/api/generate", json=payload
+                    f"{self.base_url}/api/generate",
+                    json=self._payload(prompt, **kwargs),
                 )
                 response.raise_for_status()
 
@@ -246,6 +327,30 @@ class OllamaClient(BaseLLMClient):
             logger.error(f"Ollama API error: {e}")
             raise
 
+    async def stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream text using Ollama API"""
+        try:
+            async with httpx.AsyncClient(timeout=self.config.timeout) as client:
+                async with client.stream(
+                    "POST",
+                    f"{self.base_url}/api/generate",
+                    json={**self._payload(prompt, **kwargs), "stream": True},
+                ) as response:
+                    response.raise_for_status()
+                    # One JSON object per line until "done"
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        data = json.loads(line)
+                        if data.get("response"):
+                            yield data["response"]
+                        if data.get("done"):
+                            break
+
+        except Exception as e:
+            logger.error(f"Ollama API error: {e}")
+            raise
+
     async def health_check(self) -> bool:
         """Check Ollama API health"""
         try:
@@ -259,23 +364,31 @@ class OllamaClient(BaseLLMClient):
 class LMStudioClient(BaseLLMClient):
     """LM Studio local model client"""
 
+    supports_response_format = True
+
     def __init__(self, config: LLMConfig):
         super().__init__(config)
         self.base_url = config.api_base or "http://localhost:1234/v1"
 
+    def _payload(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Chat completion request body"""
+        payload = {
+            "model": self.config.model or "local-model",
+            "messages": _chat_messages(prompt, kwargs.get("system")),
+            "temperature": kwargs.get("temperature", self.config.temperature),
+            "max_tokens": kwargs.get("max_tokens", self.config.max_tokens),
+        }
+        if kwargs.get("response_format"):
+            payload["response_format"] = kwargs["response_format"]
+        return payload
+
     async def generate(self, prompt: str, **kwargs) -> str:
         """Generate text using LM Studio API"""
         try:
             async with httpx.AsyncClient(timeout=self.config.timeout) as client:
-                payload = {
-                    "model": self.config.model or "local-model",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": kwargs.get("temperature", self.config.temperature),
-                    "max_tokens": kwargs.get("max_tokens", self.config.max_tokens),
-                }
-
                 response = await client.post(
-                    f"{self.base_url}/chat/completions", json=payload
+                    f"{self.base_url}/chat/completions",
+                    json=self._payload(prompt, **kwargs),
                 )
                 response.raise_for_status()
 
@@ -286,6 +399,23 @@ class LMStudioClient(BaseLLMClient):
             logger.error(f"LM Studio API error: {e}")
             raise
 
+    async def stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream text using LM Studio API"""
+        try:
+            async with httpx.AsyncClient(timeout=self.config.timeout) as client:
+                async with client.stream(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    json={**self._payload(prompt, **kwargs), "stream": True},
+                ) as response:
+                    response.raise_for_status()
+                    async for content in _iter_chat_deltas(response):
+                        yield content
+
+        except Exception as e:
+            logger.error(f"LM Studio API error: {e}")
+            raise
+
     async def health_check(self) -> bool:
         """Check LM Studio API health"""
         try:
@@ -319,10 +449,19 @@ class LLMClient:
         """Generate text from prompt"""
         return await self.client.generate(prompt, **kwargs)
 
+    async def stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream generated text as it arrives"""
+        async for chunk in self.client.stream(prompt, **kwargs):
+            yield chunk
+
     async def health_check(self) -> bool:
         """Check if the LLM service is healthy"""
         return await self.client.health_check()
 
+    def supports_structured_output(self) -> bool:
+        """Whether JSON-schema constrained responses are enabled and supported"""
+        return self.config.structured_output and self.client.supports_response_format
+
     async def batch_generate(self, prompts: List[str], **kwargs) -> List[str]:
         """Generate text for multiple prompts concurrently"""
         tasks = [self.generate(prompt, **kwargs) for prompt in prompts]
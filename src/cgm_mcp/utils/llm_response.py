@@ -0,0 +1,47 @@
+"""
+LLM response parsing helpers for CGM
+
+Shared by the components that read delimited sections or structured JSON
+out of LLM responses, so both formats are handled the same way everywhere.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def section_text(text: str, start: str, end: str) -> str:
+    """Return the text between the first ``start`` marker and the next ``end`` marker"""
+    # Same result as searching r"start(.*?)end" with re.DOTALL, without a regex
+    i = text.find(start)
+    if i < 0:
+        return ""
+    i += len(start)
+    j = text.find(end, i)
+    if j < 0:
+        return ""
+    return text[i:j]
+
+
+def load_json_object(response: str) -> Optional[Dict[str, Any]]:
+    """Decode a structured (JSON object) response, or return None"""
+    response = response.strip()
+    if response.startswith("```"):
+        # Tolerate a fenced ```json block around the object
+        response = response.strip("`").strip()
+        if response.startswith("json"):
+            response = response[4:]
+        response = response.strip()
+    if not response.startswith("{"):
+        return None
+    try:
+        data = orjson.loads(response) if ORJSON_AVAILABLE else json.loads(response)
+    except ValueError:  # orjson.JSONDecodeError is a ValueError too
+        return None
+    return data if isinstance(data, dict) else None
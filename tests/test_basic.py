@@ -4,7 +4,9 @@ Basic tests for CGM components
 
 import pytest
 import asyncio
+import os
 import sys
+import threading
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
@@ -25,6 +27,15 @@ class TestBasicFunctionality:
         assert config.graph_config is not None
         assert config.server_config is not None
         
+    def test_entity_cache_config(self, monkeypatch):
+        """Test that the entity cache path is read from the environment"""
+        monkeypatch.delenv("CGM_GRAPH_ENTITY_CACHE", raising=False)
+        assert Config.load().graph_config.entity_cache_path is None
+
+        monkeypatch.setenv("CGM_GRAPH_ENTITY_CACHE", "~/.cache/cgm-mcp/entities.sqlite")
+        config = Config.load()
+        assert config.graph_config.entity_cache_path == "~/.cache/cgm-mcp/entities.sqlite"
+
     def test_llm_config(self):
         """Test LLM configuration"""
         llm_config = LLMConfig(provider="mock")
@@ -67,7 +78,251 @@ class TestBasicFunctionality:
         except Exception as e:
             # If analysis fails, that's okay for basic test
             pytest.skip(f"Analysis failed (expected in some environments): {e}")
-            
+
+    def test_analyzer_line_numbers(self):
+        """Test line numbers of regex-extracted entities"""
+        analyzer = CGMAnalyzer()
+        content = "package main\n\ntype User struct {\n}\n\nfunc main() {\n}\n"
+
+        entities = analyzer._analyze_go_file(content, "main.go")
+        lines = {entity.name: entity.metadata.get("line_start") for entity in entities}
+
+        assert lines["User"] == 3
+        assert lines["main"] == 6
+
+    def test_analyzer_ascii_scan(self):
+        """Test that ASCII and non-ASCII files yield the same entities"""
+        analyzer = CGMAnalyzer()
+        content = "public class User {\n    public void save(int id) {\n    }\n}\n"
+
+        ascii_entities = analyzer._analyze_java_like_file(content, "User.java")
+        unicode_entities = analyzer._analyze_java_like_file(content + "// café\n", "User.java")
+
+        assert [e.id for e in ascii_entities] == [e.id for e in unicode_entities]
+        assert [e.metadata.get("line_start") for e in ascii_entities[1:]] == [1, 2]
+        assert all(isinstance(e.name, str) for e in ascii_entities)
+
+    def test_analyzer_pattern_literals(self):
+        """Test that files without a pattern's keywords skip only that pattern"""
+        from cgm_mcp.core.analyzer import _PATTERN_LITERALS
+
+        for pattern, literals in _PATTERN_LITERALS.items():
+            assert all(literal in pattern.pattern for literal in literals)
+
+        analyzer = CGMAnalyzer()
+        content = "const data = {\n  handler: function (event) {\n  },\n};\n"
+        entities = analyzer._analyze_javascript_file(content, "data.js")
+
+        assert [e.id for e in entities] == ["file:data.js", "function:data.js:handler"]
+
+    def test_analyzer_basic_patterns_dedup(self):
+        """Test that overlapping basic patterns emit each definition once"""
+        analyzer = CGMAnalyzer()
+        content = "abstract class Shape {\n}\n\nfunction area(shape) {\n}\n"
+
+        entities = analyzer._extract_basic_patterns(content, "shape.txt")
+        keys = [(e.type, e.name, e.metadata["line_start"]) for e in entities]
+
+        assert len(keys) == len(set(keys))
+        assert keys.count(("class", "Shape", 1)) == 1
+        assert keys.count(("function", "area", 4)) == 1
+
+    def test_analyzer_dependencies(self):
+        """Test that dependencies are deduplicated in first-seen order"""
+        analyzer = CGMAnalyzer()
+        content = "from os import path\nimport sys\nimport os\nimport sys\n"
+
+        assert analyzer._extract_dependencies(content, "a.py") == ["os", "path", "sys"]
+
+    @pytest.mark.asyncio
+    async def test_analyzer_skips_large_and_binary_files(self, tmp_path):
+        """Test that detailed analysis leaves out large and binary files"""
+        (tmp_path / "a.py").write_text("import os\n")
+        (tmp_path / "b.py").write_bytes(b"import os\n\0\0\0")
+        (tmp_path / "c.py").write_text("import os\n" * 100)
+
+        analyzer = CGMAnalyzer()
+        analyzer.max_file_size = 500
+
+        assert await analyzer._analyze_single_file(str(tmp_path / "a.py"), "a.py")
+        assert await analyzer._analyze_single_file(str(tmp_path / "b.py"), "b.py") is None
+        assert await analyzer._analyze_single_file(str(tmp_path / "c.py"), "c.py") is None
+
+    @pytest.mark.asyncio
+    async def test_analyzer_files_deduplicated(self, tmp_path):
+        """Test that files shared by several entities are analyzed once"""
+        from cgm_mcp.core.analyzer_optimized import OptimizedCGMAnalyzer
+        from cgm_mcp.models import CodeEntity
+
+        for name in ("a.py", "b.py", "c.py"):
+            (tmp_path / name).write_text("import os\n")
+        entities = [
+            CodeEntity(id=f"function:{path}:{i}", type="function", name=str(i), file_path=path)
+            for i, path in enumerate(["a.py", "a.py", "missing.py", "b.py", "a.py", "c.py"])
+        ]
+
+        analyses = await CGMAnalyzer()._analyze_files(str(tmp_path), entities, max_files=2)
+        assert [a.file_path for a in analyses] == ["a.py", "b.py"]
+
+        analyzer = OptimizedCGMAnalyzer()
+        analyses = await analyzer._analyze_files_concurrent(str(tmp_path), entities, max_files=2)
+        assert [a.file_path for a in analyses] == ["a.py"]
+        analyses = await analyzer._analyze_files_concurrent(str(tmp_path), entities, max_files=4)
+        assert [a.file_path for a in analyses] == ["a.py", "b.py", "c.py"]
+
+    def test_analyzer_relevant_entities(self):
+        """Test relevance scores and the order of ties"""
+        from cgm_mcp.models import CodeEntity, CodeGraph
+
+        entities = [
+            CodeEntity(id="a", type="function", name="load", file_path="cache.py"),
+            CodeEntity(id="b", type="function", name="CacheGet", file_path="util.py",
+                       content_preview="return self.cache[key]"),
+            CodeEntity(id="c", type="function", name="save", file_path="cache.py"),
+            CodeEntity(id="d", type="function", name="run", file_path="main.py"),
+        ]
+        graph = CodeGraph(files=["cache.py", "util.py", "main.py"], entities=entities, graph_data={})
+        analyzer = CGMAnalyzer()
+
+        relevant = analyzer._extract_relevant_entities(graph, "the cache")
+        assert [(e.id, e.metadata["relevance_score"]) for e in relevant] == [
+            ("b", 5), ("a", 1), ("c", 1)
+        ]
+
+        relevant = analyzer._extract_relevant_entities(graph, "run", ["main.py", "util.py"])
+        assert [(e.id, e.metadata["relevance_score"]) for e in relevant] == [("d", 4), ("b", 1)]
+
+    def test_analyzer_source_files(self, tmp_path):
+        """Test the repository walk order and skipped directories"""
+        for path in ["a.py", "pkg/b.py", "pkg/sub/c.go", "z/d.rs", ".git/e.py", "node_modules/f.js"]:
+            (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / path).write_text("")
+
+        analyzer = CGMAnalyzer()
+        found = analyzer._iter_source_files(str(tmp_path))
+
+        expected = []
+        for root, dirs, names in os.walk(tmp_path):
+            dirs[:] = [d for d in dirs if d not in (".git", "node_modules")]
+            expected += [os.path.relpath(os.path.join(root, n), tmp_path) for n in names]
+        assert [relative_path for _, relative_path in found] == expected
+        assert len(found) == 4
+
+    @pytest.mark.asyncio
+    async def test_analyzer_parallel_graph(self, tmp_path, monkeypatch):
+        """Test that worker processes build the same graph as serial analysis"""
+        from cgm_mcp.core import analyzer as analyzer_module
+
+        for i in range(4):
+            (tmp_path / f"mod{i}.py").write_text(f"class A{i}:\n    def run(self):\n        pass\n")
+            (tmp_path / f"main{i}.go").write_text(f"package main\n\nfunc f{i}() {{\n}}\n")
+
+        analyzer = CGMAnalyzer()
+        analyzer.max_workers = 1
+        serial = await analyzer._build_code_graph(str(tmp_path))
+
+        monkeypatch.setattr(analyzer_module, "_PARALLEL_MIN_FILES", 1)
+        analyzer.max_workers = 2
+        parallel = await analyzer._build_code_graph(str(tmp_path))
+
+        assert parallel.model_dump() == serial.model_dump()
+        assert len(parallel.files) == 8
+
+        # Workers are not forked from the threaded server, and stop at exit
+        pool = analyzer_module._PROCESS_POOLS[2]
+        assert pool._mp_context.get_start_method() != "fork"
+        analyzer_module._shutdown_process_pools()
+        assert not analyzer_module._PROCESS_POOLS
+
+        # Analyzers that cannot be pickled stay in-process
+        analyzer.lock = threading.Lock()
+        fallback = await analyzer._build_code_graph(str(tmp_path))
+        assert fallback.model_dump() == serial.model_dump()
+
+    @pytest.mark.asyncio
+    async def test_analyzer_entity_cache(self, tmp_path):
+        """Test that unchanged files are served from the entity cache"""
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        (repo / "a.py").write_text("class A:\n    pass\n")
+        (repo / "b.go").write_text("package b\n\nfunc B() {\n}\n")
+
+        analyzer = CGMAnalyzer(cache_path=str(tmp_path / "cache" / "entities.sqlite"))
+        first = await analyzer._build_code_graph(str(repo))
+
+        (repo / "b.go").write_text("package b\n\nfunc C() {\n}\n")
+        parsed = []
+        analyze_source = analyzer._analyze_source
+        analyzer._analyze_source = lambda *args: parsed.append(args[1]) or analyze_source(*args)
+        second = await analyzer._build_code_graph(str(repo))
+
+        assert parsed == ["b.go"]
+        assert second.entities[:2] == first.entities[:2]
+        assert "function:b.go:C" in [entity.id for entity in second.entities]
+
+    @pytest.mark.asyncio
+    async def test_analyzer_entity_cache_degrades(self, tmp_path, monkeypatch):
+        """Test that misses are read once and a broken cache falls back to parsing"""
+        from cgm_mcp.core import analyzer as analyzer_module
+
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        for i in range(4):
+            (repo / f"mod{i}.py").write_text(f"class A{i}:\n    pass\n")
+
+        serial = await CGMAnalyzer()._build_code_graph(str(repo))
+
+        # Cache misses are parsed from the text read to hash them,
+        # in-process and in worker processes
+        def read_again(file_path):
+            raise AssertionError(f"{file_path} read twice")
+
+        monkeypatch.setattr(analyzer_module, "_read_source", read_again)
+        monkeypatch.setattr(analyzer_module, "_PARALLEL_MIN_FILES", 1)
+        for max_workers, name in ((1, "serial.sqlite"), (2, "parallel.sqlite")):
+            analyzer = CGMAnalyzer(cache_path=str(tmp_path / name))
+            analyzer.max_workers = max_workers
+            cached = await analyzer._build_code_graph(str(repo))
+            assert cached.model_dump() == serial.model_dump()
+        analyzer_module._shutdown_process_pools()
+
+        # A cache that cannot be opened is skipped
+        monkeypatch.undo()
+        (tmp_path / "broken.sqlite").write_bytes(b"not a database" * 100)
+        analyzer = CGMAnalyzer(cache_path=str(tmp_path / "broken.sqlite"))
+        degraded = await analyzer._build_code_graph(str(repo))
+        assert degraded.model_dump() == serial.model_dump()
+
+    def test_server_to_json(self, monkeypatch):
+        """Test that orjson and json encode tool results the same way"""
+        import json
+        from datetime import datetime
+
+        import numpy as np
+
+        try:
+            from cgm_mcp import server_modelless
+        except Exception as e:
+            pytest.skip(f"Server unavailable (expected in some environments): {e}")
+
+        payload = {
+            "score": np.float32(0.5),
+            "count": np.int64(3),
+            "embedding": np.arange(2, dtype=np.float64),
+            "created": datetime(2024, 1, 2, 3, 4, 5),
+        }
+        expected = {
+            "score": 0.5,
+            "count": 3,
+            "embedding": [0.0, 1.0],
+            "created": "2024-01-02 03:04:05",
+        }
+
+        encoded = server_modelless._to_json(payload)
+        monkeypatch.setattr(server_modelless, "ORJSON_AVAILABLE", False)
+        assert server_modelless._to_json(payload) == encoded
+        assert json.loads(encoded) == expected
+
     def test_model_creation(self):
         """Test model creation"""
         from cgm_mcp.models import CodeEntity, CodeRelation
@@ -3,21 +3,26 @@ Tests for CGM components
 """
 
 import asyncio
+import os
 import sys
 from pathlib import Path
 from unittest.mock import AsyncMock, Mock
 
+import numpy as np
 import pytest
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from cgm_mcp.components import (
+    GraphBuilder,
     ReaderComponent,
     RerankerComponent,
     RetrieverComponent,
     RewriterComponent,
 )
+from cgm_mcp.components.rewriter import SemanticCache
 from cgm_mcp.models import (
+    CodePatch,
     ReaderRequest,
     RerankerRequest,
     RetrieverRequest,
@@ -112,6 +117,305 @@ class TestRewriterComponent:
         assert response.analysis
         assert response.queries is not None
 
+    @pytest.mark.asyncio
+    async def test_rewriter_process_both(self):
+        """Test running extraction and inference together"""
+
+        async def generate(prompt, system=None, **kwargs):
+            if "[start_of_related_queries]" in system:
+                return (
+                    "[start_of_analysis]Inferred[end_of_analysis]\n"
+                    "[start_of_related_queries]\nquery 1: Login views\n"
+                    "[end_of_related_queries]"
+                )
+            return (
+                "[start_of_analysis]Extracted[end_of_analysis]\n"
+                "[start_of_related_code_entities]\nauth/views.py\n"
+                "[end_of_related_code_entities]\n"
+                "[start_of_related_keywords]\nlogin\n[end_of_related_keywords]"
+            )
+
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(side_effect=generate)
+        rewriter = RewriterComponent(llm_client)
+
+        request = RewriterRequest(
+            problem_statement="Login fails", repo_name="test-repo"
+        )
+        response = await rewriter.process_both(request)
+
+        assert llm_client.generate.await_count == 2
+        assert response.analysis == "Extracted\n\nInferred"
+        assert response.related_entities == ["auth/views.py"]
+        assert response.keywords == ["login"]
+        assert response.queries == ["Login views"]
+
+    @pytest.mark.asyncio
+    async def test_rewriter_process_many(self):
+        """Test batched rewriting with bounded concurrency"""
+        inflight = 0
+        peak = 0
+
+        async def generate(prompt, **kwargs):
+            nonlocal inflight, peak
+            inflight += 1
+            peak = max(peak, inflight)
+            await asyncio.sleep(0.01)
+            inflight -= 1
+            if "broken" in prompt:
+                raise RuntimeError("LLM unavailable")
+            return "[start_of_analysis]ok[end_of_analysis]"
+
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(side_effect=generate)
+        rewriter = RewriterComponent(llm_client)
+
+        requests = [
+            RewriterRequest(problem_statement=f"Issue {i}", repo_name="test-repo")
+            for i in range(5)
+        ]
+        requests[2].problem_statement = "broken issue"
+
+        results = await rewriter.process_many(requests, max_inflight=2)
+
+        assert peak == 2
+        assert isinstance(results[2], RuntimeError)
+        assert [r.analysis for i, r in enumerate(results) if i != 2] == ["ok"] * 4
+
+    @pytest.mark.asyncio
+    async def test_rewriter_process_stream(self):
+        """Test streamed rewriting yields a snapshot per closed section"""
+        response_text = (
+            "[start_of_analysis]Login bug[end_of_analysis]\n"
+            "[start_of_related_code_entities]\nauth/views.py\n"
+            "[end_of_related_code_entities]\n"
+            "[start_of_related_keywords]\nlogin\n[end_of_related_keywords]"
+        )
+
+        async def stream(prompt, **kwargs):
+            # Small chunks, so markers are split across chunks
+            for i in range(0, len(response_text), 7):
+                yield response_text[i : i + 7]
+
+        llm_client = Mock()
+        llm_client.stream = stream
+        rewriter = RewriterComponent(llm_client)
+
+        request = RewriterRequest(problem_statement="Login fails", repo_name="repo")
+        snapshots = [r async for r in rewriter.process_stream(request)]
+
+        assert [(s.analysis, s.related_entities, s.keywords) for s in snapshots] == [
+            ("Login bug", [], []),
+            ("Login bug", ["auth/views.py"], []),
+            ("Login bug", ["auth/views.py"], ["login"]),
+            ("Login bug", ["auth/views.py"], ["login"]),
+        ]
+
+        # The complete response is cached for later requests
+        assert (await rewriter.process(request)) == snapshots[-1]
+
+    @pytest.mark.asyncio
+    async def test_rewriter_process_stream_matches_process(self):
+        """Test that streamed responses are reformatted and cached as by process"""
+        stream_calls = []
+
+        async def stream(prompt, **kwargs):
+            stream_calls.append(kwargs)
+            yield '{"analysis": "Login bug", "entities": ["auth/views.py"], '
+            yield '"keywords": ["login"]}'
+
+        llm_client = Mock()
+        llm_client.stream = stream
+        llm_client.generate = AsyncMock(return_value="No idea.")
+        rewriter = RewriterComponent(
+            llm_client, structured_output=True, semantic_cache=SemanticCache(Mock())
+        )
+        rewriter.semantic_cache.embed = lambda text: np.ones(2) / np.sqrt(2)
+
+        request = RewriterRequest(problem_statement="Login fails", repo_name="repo")
+        snapshots = [r async for r in rewriter.process_stream(request)]
+
+        assert "response_format" in stream_calls[0]
+        assert [(s.related_entities, s.keywords) for s in snapshots] == [
+            (["auth/views.py"], ["login"])
+        ]
+
+        # A reworded issue is served from the semantic cache
+        request.problem_statement = "Login breaks"
+        assert [r async for r in rewriter.process_stream(request)] == snapshots
+        assert len(stream_calls) == 1
+
+        # A malformed stream is reformatted, and left uncached when that fails
+        async def malformed_stream(prompt, **kwargs):
+            stream_calls.append(kwargs)
+            yield "The login view is broken."
+
+        llm_client.stream = malformed_stream
+        rewriter = RewriterComponent(llm_client)
+        stream_calls.clear()
+        for expected_calls in (1, 2):
+            snapshots = [r async for r in rewriter.process_stream(request)]
+            assert snapshots[-1].analysis == "" and snapshots[-1].keywords == []
+            assert len(stream_calls) == expected_calls
+        assert llm_client.generate.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_rewriter_reformat_malformed_response(self):
+        """Test that a response without sections is reformatted once"""
+
+        async def generate(prompt, **kwargs):
+            if "<response>" in prompt:
+                return (
+                    "[start_of_analysis]Login bug[end_of_analysis]\n"
+                    "[start_of_related_code_entities]\nauth/views.py\n"
+                    "[end_of_related_code_entities]\n"
+                    "[start_of_related_keywords]\nlogin\n[end_of_related_keywords]"
+                )
+            return "The login view in auth/views.py is broken."
+
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(side_effect=generate)
+        rewriter = RewriterComponent(llm_client)
+
+        request = RewriterRequest(problem_statement="Login fails", repo_name="repo")
+        response = await rewriter.process(request)
+
+        assert llm_client.generate.await_count == 2
+        assert response.related_entities == ["auth/views.py"]
+        assert response.keywords == ["login"]
+
+        # The same malformed output for another issue reuses the reformat
+        request.problem_statement = "Login breaks"
+        await rewriter.process(request)
+        assert llm_client.generate.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_rewriter_empty_response_not_cached(self):
+        """Test that a response left without sections is not cached"""
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(return_value="No idea.")
+        rewriter = RewriterComponent(llm_client)
+
+        request = RewriterRequest(problem_statement="Login fails", repo_name="repo")
+        response = await rewriter.process(request)
+
+        assert response.related_entities == [] and response.keywords == []
+        assert llm_client.generate.await_count == 2
+
+        # The issue reaches the LLM again; the failed reformat is reused
+        await rewriter.process(request)
+        assert llm_client.generate.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_rewriter_response_cache(self, mock_llm_client):
+        """Test that repeated rewrites of an issue are served from the cache"""
+        mock_llm_client.generate = AsyncMock(wraps=mock_llm_client.generate)
+        rewriter = RewriterComponent(mock_llm_client)
+
+        request = RewriterRequest(
+            problem_statement="Authentication fails with special characters",
+            repo_name="test-repo",
+            extraction_mode=True,
+        )
+
+        first = await rewriter.process(request)
+        second = await rewriter.process(request)
+        assert mock_llm_client.generate.await_count == 1
+        assert second == first
+
+        # The cached response is not shared with callers
+        second.keywords.append("mutated")
+        assert (await rewriter.process(request)).keywords == first.keywords
+
+        # A different mode is a different rewrite
+        request.extraction_mode = False
+        await rewriter.process(request)
+        assert mock_llm_client.generate.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_rewriter_semantic_cache(self, mock_llm_client):
+        """Test that reworded issues reuse the response of a similar issue"""
+
+        class WordEncoder:
+            """Bag-of-words encoder over a fixed vocabulary"""
+
+            vocabulary = ["authentication", "fails", "special", "characters", "login"]
+
+            def encode(self, texts, normalize_embeddings=False):
+                vectors = np.array(
+                    [
+                        [text.lower().count(word) for word in self.vocabulary]
+                        for text in texts
+                    ],
+                    dtype=float,
+                )
+                return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        mock_llm_client.generate = AsyncMock(wraps=mock_llm_client.generate)
+        rewriter = RewriterComponent(
+            mock_llm_client, semantic_cache=SemanticCache(WordEncoder())
+        )
+
+        request = RewriterRequest(
+            problem_statement="Authentication fails with special characters",
+            repo_name="test-repo",
+        )
+        first = await rewriter.process(request)
+
+        request.problem_statement = "Authentication FAILS for special characters!"
+        assert await rewriter.process(request) == first
+        assert mock_llm_client.generate.await_count == 1
+
+        # Unrelated issues and other repositories still reach the LLM
+        request.problem_statement = "Login page crashes"
+        await rewriter.process(request)
+        request.repo_name = "other-repo"
+        request.problem_statement = "Authentication fails with special characters"
+        await rewriter.process(request)
+        assert mock_llm_client.generate.await_count == 3
+
+    def test_rewriter_prompt_split(self, mock_llm_client):
+        """Test that static instructions are kept apart from the issue"""
+        rewriter = RewriterComponent(mock_llm_client)
+
+        for generate_prompt in (
+            rewriter.generate_prompt_for_extractor,
+            rewriter.generate_prompt_for_inferer,
+        ):
+            system_a, user_a = generate_prompt("Login fails", "repo-a")
+            system_b, user_b = generate_prompt("Export crashes", "repo-b")
+
+            assert system_a == system_b
+            assert "Login fails" in user_a and "repo-a" in user_a
+            assert "Login fails" not in system_a and "repo-a" not in system_a
+
+    @pytest.mark.asyncio
+    async def test_rewriter_structured_output(self):
+        """Test JSON-schema requests and structured response parsing"""
+        calls = []
+
+        async def generate(prompt, **kwargs):
+            calls.append(kwargs)
+            if kwargs["response_format"]["json_schema"]["name"] == "issue_queries":
+                return '{"analysis": "Login", "queries": ["query 1: Login views"]}'
+            return (
+                '```json\n{"analysis": "Login bug", "entities": '
+                '["auth/views.py", "auth/views.py"], "keywords": ["login"]}\n```'
+            )
+
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(side_effect=generate)
+        rewriter = RewriterComponent(llm_client, structured_output=True)
+
+        request = RewriterRequest(problem_statement="Login fails", repo_name="repo")
+        response = await rewriter.process_both(request)
+
+        assert len(calls) == 2
+        assert response.analysis == "Login bug\n\nLogin"
+        assert response.related_entities == ["auth/views.py"]
+        assert response.keywords == ["login"]
+        assert response.queries == ["Login views"]
+
     def test_parse_extractor_response(self, mock_llm_client):
         """Test parsing extractor response"""
         rewriter = RewriterComponent(mock_llm_client)
@@ -123,6 +427,7 @@ class TestRewriterComponent:
         [start_of_related_code_entities]
         auth/models.py
         auth/views.py
+        auth/models.py
         [end_of_related_code_entities]
         [start_of_related_keywords]
         authentication
@@ -133,11 +438,56 @@ class TestRewriterComponent:
         analysis, entities, keywords = rewriter.parse_extractor_response(response_text)
 
         assert "test analysis" in analysis
-        assert "auth/models.py" in entities
-        assert "auth/views.py" in entities
+        assert entities == ["auth/models.py", "auth/views.py"]
         assert "authentication" in keywords
         assert "password" in keywords
 
+    def test_parse_extractor_response_out_of_order(self, mock_llm_client):
+        """Test parsing extractor sections that are not in the prompted order"""
+        rewriter = RewriterComponent(mock_llm_client)
+
+        response_text = """
+        [start_of_related_keywords]
+        authentication
+        [end_of_related_keywords]
+        [start_of_analysis]
+        Out of order analysis
+        [end_of_analysis]
+        [start_of_related_code_entities]
+        auth/models.py
+        [end_of_related_code_entities]
+        """
+
+        analysis, entities, keywords = rewriter.parse_extractor_response(response_text)
+
+        assert analysis == "Out of order analysis"
+        assert entities == ["auth/models.py"]
+        assert keywords == ["authentication"]
+
+    def test_parse_inferer_response(self, mock_llm_client):
+        """Test parsing inferer response"""
+        rewriter = RewriterComponent(mock_llm_client)
+
+        response_text = """
+        [start_of_analysis]
+        Login analysis
+        [end_of_analysis]
+        [start_of_related_queries]
+        query 1: Functions that validate passwords
+        Query 2:Files handling user login
+        query: Code without a query number
+        [end_of_related_queries]
+        """
+
+        analysis, queries = rewriter.parse_inferer_response(response_text)
+
+        assert analysis == "Login analysis"
+        assert queries == [
+            "Functions that validate passwords",
+            "Files handling user login",
+            "query: Code without a query number",
+        ]
+
 
 class TestRetrieverComponent:
     """Test Retriever component"""
@@ -160,6 +510,42 @@ class TestRetrieverComponent:
         assert response.subgraph
         assert response.relevant_files
 
+    @pytest.mark.asyncio
+    async def test_retriever_graph_cache(self, sample_graph):
+        """Test that built graphs are reused across requests"""
+        retriever = RetrieverComponent()
+
+        request = RetrieverRequest(
+            entities=["User"], keywords=[], repository_graph=sample_graph
+        )
+
+        await retriever.process(request)
+        graph = next(iter(retriever.graph_cache.values()))[0]
+
+        await retriever.process(request)
+        assert len(retriever.graph_cache) == 1
+        assert next(iter(retriever.graph_cache.values()))[0] is graph
+
+        request.force_refresh = True
+        await retriever.process(request)
+        assert len(retriever.graph_cache) == 1
+        assert next(iter(retriever.graph_cache.values()))[0] is not graph
+
+    def test_retriever_graph_cache_edit(self, sample_graph):
+        """Test that editing any node of a graph misses the graph cache"""
+        retriever = RetrieverComponent()
+        graph, _ = retriever._get_graph(sample_graph)
+
+        # Same counts and first/last ids, different middle node
+        sample_graph["nodes"][1]["docstring"] = "Account model"
+        edited, index = retriever._get_graph(sample_graph)
+
+        assert edited is not graph
+        assert len(retriever.graph_cache) == 2
+        assert retriever._find_nodes_by_keyword("account", index) == [
+            "class:auth/models.py:User"
+        ]
+
     def test_locate_anchor_nodes(self, sample_graph):
         """Test anchor node location"""
         retriever = RetrieverComponent()
@@ -176,6 +562,35 @@ class TestRetrieverComponent:
 
         assert len(anchor_nodes) > 0
 
+    def test_graph_index_lookups(self, sample_graph):
+        """Test index-backed entity and keyword matching"""
+        retriever = RetrieverComponent()
+
+        graph = retriever._dict_to_networkx(sample_graph)
+        index = retriever._build_indices(graph)
+
+        # Substring match on node id and file path, fuzzy match on name
+        assert retriever._find_matching_nodes("User", index) == [
+            "class:auth/models.py:User"
+        ]
+        assert retriever._find_matching_nodes("auth/models.py", index) == [
+            "file:auth/models.py",
+            "class:auth/models.py:User",
+        ]
+        # Keywords are searched case-insensitively in content and docstring
+        assert retriever._find_nodes_by_keyword("AUTHENTICATION", index) == [
+            "class:auth/models.py:User"
+        ]
+        assert retriever._find_nodes_by_keyword("validate_password", index) == [
+            "file:auth/views.py"
+        ]
+        # An empty keyword matches every node, like a plain substring test
+        assert len(retriever._find_nodes_by_keyword("", index)) == 3
+        # Queries need at least 30% of their key terms to match a node
+        assert retriever._find_nodes_by_query(
+            "Find user authentication code", index
+        ) == ["class:auth/models.py:User"]
+
     def test_extract_subgraph(self, sample_graph):
         """Test subgraph extraction"""
         retriever = RetrieverComponent()
@@ -183,12 +598,38 @@ class TestRetrieverComponent:
         # Convert to NetworkX graph
         graph = retriever._dict_to_networkx(sample_graph)
 
-        anchor_nodes = ["file:auth/models.py"]
+        anchor_nodes = {"file:auth/models.py"}
         subgraph = retriever.extract_subgraph(anchor_nodes, graph)
 
         assert subgraph["nodes"]
         assert "metadata" in subgraph
 
+        # Only metadata attributes are serialized unless content is requested
+        node = next(
+            n for n in subgraph["nodes"] if n["id"] == "class:auth/models.py:User"
+        )
+        assert node["name"] == "User" and node["file_path"] == "auth/models.py"
+        assert "content" not in node and "docstring" not in node
+
+        subgraph = retriever.extract_subgraph(anchor_nodes, graph, include_content=True)
+        node = next(
+            n for n in subgraph["nodes"] if n["id"] == "class:auth/models.py:User"
+        )
+        assert node["docstring"] == "User model for authentication"
+
+    def test_extract_subgraph_max_nodes(self):
+        """Test that the size limit also applies when anchors alone exceed it"""
+        import networkx as nx
+
+        retriever = RetrieverComponent()
+        graph = nx.cycle_graph(300)
+
+        subgraph = retriever.extract_subgraph(set(graph.nodes), graph, max_nodes=100)
+        assert len(subgraph["nodes"]) == 100
+
+        subgraph = retriever.extract_subgraph({0, 1, 2}, graph, max_depth=0, max_nodes=2)
+        assert len(subgraph["nodes"]) == 2
+
 
 class TestRerankerComponent:
     """Test Reranker component"""
@@ -214,6 +655,52 @@ class TestRerankerComponent:
         assert response.top_files
         assert response.file_scores
 
+    @pytest.mark.asyncio
+    async def test_reranker_stage_2_failure_falls_back(self):
+        """Test that a failed stage 2 call falls back to a default score"""
+        stage_1_response = """
+        [start_of_analysis]
+        Analysis
+        [end_of_analysis]
+        [start_of_relevant_files]
+        1. auth/models.py
+        2. auth/views.py
+        [end_of_relevant_files]
+        """
+        stage_2_response = """
+        [start_of_analysis]
+        Relevant
+        [end_of_analysis]
+        [start_of_score]
+        Score 5
+        [end_of_score]
+        """
+
+        async def generate(prompt, **kwargs):
+            if "<file_name>\nauth/views.py" in prompt:
+                raise RuntimeError("LLM unavailable")
+            if "<file_name>" in prompt:
+                return stage_2_response
+            return stage_1_response
+
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(side_effect=generate)
+        reranker = RerankerComponent(llm_client, max_workers=1)
+
+        request = RerankerRequest(
+            problem_statement="Authentication fails",
+            repo_name="test-repo",
+            python_files=["auth/models.py", "auth/views.py"],
+            other_files=[],
+            file_contents={},
+        )
+
+        response = await reranker.process(request)
+
+        scores = {fs.file_path: fs.score for fs in response.file_scores}
+        assert scores == {"auth/models.py": 5, "auth/views.py": 3}
+        assert response.top_files == ["auth/models.py", "auth/views.py"]
+
     def test_parse_stage_1_response(self, mock_llm_client):
         """Test parsing stage 1 response"""
         reranker = RerankerComponent(mock_llm_client)
@@ -234,6 +721,212 @@ class TestRerankerComponent:
         assert "auth/models.py" in files
         assert "auth/views.py" in files
 
+    def test_parse_stage_2_response(self, mock_llm_client):
+        """Test parsing stage 2 response"""
+        reranker = RerankerComponent(mock_llm_client)
+
+        response_text = """
+        [start_of_analysis]
+        Handles user authentication
+        [end_of_analysis]
+        [start_of_score]
+        Score 9
+        [end_of_score]
+        """
+
+        analysis, score = reranker.parse_stage_2_response(response_text)
+
+        assert analysis == "Handles user authentication"
+        assert score == 5  # Clamped to the 1-5 range
+
+        # Missing or unterminated blocks fall back to defaults
+        assert reranker.parse_stage_2_response("[start_of_score] Score 4") == ("", 3)
+
+    @pytest.mark.asyncio
+    async def test_reranker_stage_2_cache(self):
+        """Test that repeated stage 2 scoring is served from the cache"""
+        stage_1_response = """
+        [start_of_relevant_files]
+        1. auth/models.py
+        2. auth/views.py
+        [end_of_relevant_files]
+        """
+
+        async def generate(prompt, **kwargs):
+            if "<file_name>" in prompt:
+                return "[start_of_score]\nScore 4\n[end_of_score]"
+            return stage_1_response
+
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(side_effect=generate)
+        reranker = RerankerComponent(llm_client)
+
+        request = RerankerRequest(
+            problem_statement="Authentication fails",
+            repo_name="test-repo",
+            python_files=["auth/models.py", "auth/views.py"],
+            other_files=[],
+            file_contents={"auth/models.py": "class User:\n    pass\n"},
+        )
+
+        first = await reranker.process(request)
+        assert llm_client.generate.await_count == 3
+        assert len(reranker.score_cache) == 2
+
+        # Only the stage 1 call reaches the LLM the second time
+        second = await reranker.process(request)
+        assert llm_client.generate.await_count == 4
+        assert second.file_scores == first.file_scores
+
+        # A different issue is scored again
+        request.problem_statement = "Login page crashes"
+        await reranker.process(request)
+        assert llm_client.generate.await_count == 7
+        assert len(reranker.score_cache) == 4
+
+    @pytest.mark.asyncio
+    async def test_reranker_stage_2_fallback_not_cached(self):
+        """Test that default scores of unparsed replies are not cached"""
+        stage_1_response = """
+        [start_of_relevant_files]
+        1. auth/models.py
+        2. auth/views.py
+        [end_of_relevant_files]
+        """
+
+        async def generate(prompt, **kwargs):
+            if "<file_name>\nauth/models.py" in prompt:
+                return "The model looks relevant."
+            if "<file_name>" in prompt:
+                return "[start_of_score]\nScore 4\n[end_of_score]"
+            return stage_1_response
+
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(side_effect=generate)
+        reranker = RerankerComponent(llm_client)
+
+        request = RerankerRequest(
+            problem_statement="Authentication fails",
+            repo_name="test-repo",
+            python_files=["auth/models.py", "auth/views.py"],
+            other_files=[],
+            file_contents={},
+        )
+
+        response = await reranker.process(request)
+        scores = {fs.file_path: fs.score for fs in response.file_scores}
+        assert scores == {"auth/models.py": 3, "auth/views.py": 4}
+        assert len(reranker.score_cache) == 1
+
+        # The unparsed file is scored again
+        await reranker.process(request)
+        assert llm_client.generate.await_count == 5
+
+    @pytest.mark.asyncio
+    async def test_reranker_stage_2_batch(self):
+        """Test batched stage 2 scoring with per-file fallback"""
+        stage_1_response = """
+        [start_of_relevant_files]
+        1. auth/models.py
+        2. auth/views.py
+        3. auth/forms.py
+        [end_of_relevant_files]
+        """
+
+        async def generate(prompt, **kwargs):
+            if "<files>" in prompt:
+                # The batch omits auth/forms.py, which is scored on its own
+                return (
+                    '```json\n{"scores": ['
+                    '{"file": "auth/views.py", "analysis": "Login view", "score": 5},'
+                    '{"file": "auth/models.py", "analysis": "User model", "score": 9}'
+                    "]}\n```"
+                )
+            if "<file_name>" in prompt:
+                return "[start_of_score]\nScore 2\n[end_of_score]"
+            return stage_1_response
+
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(side_effect=generate)
+        reranker = RerankerComponent(llm_client, batch_stage_2=True)
+
+        request = RerankerRequest(
+            problem_statement="Authentication fails",
+            repo_name="test-repo",
+            python_files=["auth/models.py", "auth/views.py", "auth/forms.py"],
+            other_files=[],
+            file_contents={},
+        )
+
+        response = await reranker.process(request)
+
+        assert llm_client.generate.await_count == 3
+        scores = {s.file_path: s.score for s in response.file_scores}
+        assert scores == {"auth/views.py": 5, "auth/models.py": 5, "auth/forms.py": 2}
+        assert len(reranker.score_cache) == 3
+
+        # Everything is cached, so only stage 1 runs again
+        await reranker.process(request)
+        assert llm_client.generate.await_count == 4
+
+    @pytest.mark.asyncio
+    async def test_reranker_structured_output(self):
+        """Test JSON-schema requests and structured response parsing"""
+        calls = []
+
+        async def generate(prompt, **kwargs):
+            calls.append(kwargs)
+            if "<file_name>" in prompt:
+                return '{"analysis": "Defines the user model", "score": 4}'
+            return '{"analysis": "Auth files", "files": ["auth/models.py"]}'
+
+        llm_client = Mock()
+        llm_client.generate = AsyncMock(side_effect=generate)
+        reranker = RerankerComponent(llm_client, structured_output=True)
+
+        request = RerankerRequest(
+            problem_statement="Authentication fails",
+            repo_name="test-repo",
+            python_files=["auth/models.py", "auth/views.py"],
+            other_files=[],
+            file_contents={},
+        )
+
+        response = await reranker.process(request)
+
+        assert [call["response_format"]["json_schema"]["name"] for call in calls] == [
+            "relevant_files",
+            "file_score",
+        ]
+        assert response.top_files == ["auth/models.py"]
+        assert response.file_scores[0].score == 4
+        assert response.file_scores[0].analysis == "Defines the user model"
+
+    def test_get_file_structure(self, mock_llm_client):
+        """Test structure extraction for Python and non-Python files"""
+        reranker = RerankerComponent(mock_llm_client)
+
+        python_source = (
+            "class User(models.Model):\n"
+            '    """def not_a_method(): ..."""\n'
+            "    def save(\n"
+            "        self, *args, **kwargs\n"
+            "    ):\n"
+            "        pass\n"
+            "\n"
+            "async def login(request):\n"
+            "    pass\n"
+        )
+        assert reranker.get_file_structure(python_source) == (
+            "class User(models.Model):\n"
+            "def save(self, *args, **kwargs):\n"
+            "async def login(request):"
+        )
+
+        # Files that do not parse as Python use the line scan
+        js_source = "class Foo {\n  bar() {}\n}\n"
+        assert reranker.get_file_structure(js_source) == "class Foo {"
+
 
 class TestReaderComponent:
     """Test Reader component"""
@@ -266,6 +959,126 @@ class TestReaderComponent:
         assert "Total nodes: 3" in summary
         assert "Total edges: 1" in summary
 
+    def test_calculate_confidence(self, mock_llm_client):
+        """Test confidence with and without precomputed aggregates"""
+        reader = ReaderComponent(mock_llm_client)
+
+        patches = [
+            CodePatch(
+                file_path=file_path,
+                original_code="a",
+                modified_code="b",
+                line_start=1,
+                line_end=1,
+                explanation=explanation,
+            )
+            for file_path, explanation in [
+                ("auth/views.py", "Fix check"),
+                ("auth/models.py", ""),
+            ]
+        ]
+
+        confidence = reader.calculate_confidence(patches, "analysis")
+
+        assert confidence == pytest.approx(0.5 + 0.1 + 0.05 + 0.1)
+        assert reader.calculate_confidence(patches, "analysis", 1, 2) == confidence
+
+
+class TestGraphBuilder:
+    """Test GraphBuilder component"""
+
+    @pytest.mark.asyncio
+    async def test_build_graph(self, tmp_path):
+        """Test building a graph from a small repository"""
+        (tmp_path / "auth").mkdir()
+        (tmp_path / "auth" / "models.py").write_text(
+            "import os\n\n"
+            "class User:\n"
+            '    """User model"""\n\n'
+            "    def login(self, password):\n"
+            "        return password\n"
+        )
+        (tmp_path / "auth" / "helpers.js").write_text("function helper() {}\n")
+
+        builder = GraphBuilder()
+        graph = await builder.build_graph("test-repo", {"path": str(tmp_path)})
+
+        node_ids = {node["id"] for node in graph["nodes"]}
+        assert "file:auth/models.py" in node_ids
+        assert "class:auth/models.py:User" in node_ids
+        assert "method:auth/models.py:login" in node_ids
+        assert "import:os" in node_ids
+        assert "file:auth/helpers.js" in node_ids
+
+        edges = {(edge["source"], edge["target"]) for edge in graph["edges"]}
+        assert ("file:auth/models.py", "class:auth/models.py:User") in edges
+        assert ("class:auth/models.py:User", "method:auth/models.py:login") in edges
+        assert graph["metadata"]["total_nodes"] == len(graph["nodes"])
+        assert graph["metadata"]["total_edges"] == len(graph["edges"])
+
+        # File contents are not stored in the graph, only read on demand
+        assert all("content" not in node for node in graph["nodes"])
+        preview = builder.get_file_preview(
+            graph["metadata"]["repository_path"], "auth/models.py", size=9
+        )
+        assert preview == "import os"
+
+    @pytest.mark.asyncio
+    async def test_build_graph_relative_paths(self, tmp_path, monkeypatch):
+        """Test relative paths of repository roots with a trailing separator"""
+        (tmp_path / "auth").mkdir()
+        (tmp_path / "auth" / "models.py").write_text("class User:\n    pass\n")
+
+        builder = GraphBuilder()
+        graph = await builder.build_graph("test-repo", {"path": f"{tmp_path}/"})
+        assert "file:auth/models.py" in {node["id"] for node in graph["nodes"]}
+
+        # The filesystem root already ends with a separator
+        def walk(top):
+            assert top == "/"
+            yield "/", [], ["setup.py"]
+            yield "/src", [], ["main.py"]
+
+        analyzed = []
+
+        async def analyze_file(file_path, relative_path, graph):
+            analyzed.append((file_path, relative_path))
+
+        monkeypatch.setattr(os, "walk", walk)
+        builder._analyze_file = analyze_file
+        await builder._analyze_repository("/", None)
+        assert analyzed == [("/setup.py", "setup.py"), ("/src/main.py", "src/main.py")]
+
+    @pytest.mark.asyncio
+    async def test_build_graph_invalid_utf8(self, tmp_path):
+        """Test that Python files with undecodable bytes are still analyzed"""
+        (tmp_path / "legacy.py").write_bytes(
+            b"NAME = 'caf\xe9'\n\nclass Legacy:\n    def run(self):\n        pass\n"
+        )
+
+        graph = await GraphBuilder().build_graph("test-repo", {"path": str(tmp_path)})
+
+        node_ids = {node["id"] for node in graph["nodes"]}
+        assert "file:legacy.py" in node_ids
+        assert "class:legacy.py:Legacy" in node_ids
+        assert "method:legacy.py:run" in node_ids
+
+    @pytest.mark.asyncio
+    async def test_keyword_in_file_content(self, tmp_path):
+        """Test that keywords found only in file text still match the file node"""
+        (tmp_path / "helpers.js").write_text("function helper() { return checksumDigest(); }\n")
+
+        graph_dict = await GraphBuilder().build_graph("test-repo", {"path": str(tmp_path)})
+
+        retriever = RetrieverComponent()
+        graph, index = retriever._get_graph(graph_dict)
+        assert retriever._find_nodes_by_keyword("checksumdigest", index) == [
+            "file:helpers.js"
+        ]
+        assert "file:helpers.js" in retriever.locate_anchor_nodes(
+            entities=[], keywords=["checksumDigest"], queries=[], graph=graph
+        )
+
 
 if __name__ == "__main__":
     pytest.main([__file__])